@@ -0,0 +1,120 @@
+"""
+Savings rate lookups: recomputation vs the shared analytics cache.
+
+Run from project root:
+  python benchmarks/analytics_cache.py
+  python benchmarks/analytics_cache.py --groups 50 --rounds 20 --database /tmp/bench.db
+
+For each group of a seeded database, times computing the savings rate from
+its ledger (what a cache miss costs: the ledger query plus the pandas/scipy
+fit) and reading the stored rate and goal analytics back from each
+home.sharedcache backend. The SQLite hits are also timed from a second
+process, which is what a request landing on another worker sees.
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from home.analysis import analyse_goal, group_transactions_as_movements, rate_per_day  # noqa: E402
+from home.sharedcache import MISSING, MemoryBackend, SQLiteBackend  # noqa: E402
+
+MAX_BYTES = 64 * 1024 * 1024
+TTL = 3600.0
+
+
+def timed(fn: Callable[[], object], rounds: int) -> List[float]:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {'median': statistics.median(ordered), 'p95': ordered[int(0.95 * (len(ordered) - 1))]}
+
+
+def read_all(path: str, keys: list, rounds: int, results) -> None:
+    backend = SQLiteBackend(path, MAX_BYTES, TTL)
+    samples = []
+    for key in keys:
+        samples += timed(lambda: backend.get(key, MISSING), rounds)
+    results.put(samples)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare analytics cache hits with recomputing savings rates')
+    parser.add_argument('--database', help='Seeded SQLite file to read (default: seed a temporary one)')
+    parser.add_argument('--groups', type=int, default=20, help='Groups to time')
+    parser.add_argument('--rounds', type=int, default=10, help='Timed repetitions per group')
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix='fundflow-cache-bench-')
+    source = args.database
+    try:
+        if source is None:
+            source = os.path.join(tmpdir, 'seed.db')
+            subprocess.run([sys.executable, '-m', 'home.seed', '--database', f'sqlite:///{source}',
+                            '--users', str(max(100, args.groups * 10)), '--groups', str(args.groups),
+                            '--years', '1'],
+                           cwd=PROJECT_ROOT, check=True, stdout=subprocess.DEVNULL)
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(source)}'
+        os.environ.setdefault('MAIL_OUTBOX_WORKER', '0')
+        from home import create_app
+        from home.db_models import Group, GroupGoal
+
+        app = create_app(blueprints=False)
+        cache_path = os.path.join(tmpdir, 'analytics_cache.db')
+        backends = {'memory': MemoryBackend(4096, TTL), 'sqlite': SQLiteBackend(cache_path, MAX_BYTES, TTL)}
+        samples: Dict[str, List[float]] = {'recompute': [], 'memory hit': [], 'sqlite hit': []}
+        keys = []
+        with app.app_context():
+            for group in Group.query.order_by(Group.id).limit(args.groups).all():
+                goals = GroupGoal.query.filter_by(group_id=group.id).all()
+
+                def compute():
+                    rate = rate_per_day(group_transactions_as_movements(group.id, approved_only=True))
+                    return [rate, [[goal.id, analyse_goal(goal, group.balance or 0.0, rate)] for goal in goals]]
+
+                samples['recompute'] += timed(compute, args.rounds)
+                key = ('group_goals', group.id)
+                keys.append(key)
+                value = compute()
+                for name, backend in backends.items():
+                    backend.set(key, value)
+                    assert backend.get(key, MISSING) == value
+                    samples[f'{name} hit'] += timed(lambda: backend.get(key, MISSING), args.rounds)
+
+        results = mp.Queue()
+        reader = mp.Process(target=read_all, args=(cache_path, keys, args.rounds, results))
+        reader.start()
+        samples['sqlite hit, other process'] = results.get()
+        reader.join()
+
+        recompute = summary(samples['recompute'])['median']
+        print(f"{'lookup':<28}{'median ms':>12}{'p95 ms':>12}{'speedup':>10}")
+        for name, values in samples.items():
+            s = summary(values)
+            print(f"{name:<28}{s['median']:>12.3f}{s['p95']:>12.3f}{recompute / s['median']:>9.0f}x")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,381 @@
+"""
+End-to-end HTTP load test for FundFlow.
+
+Run from project root:
+  python benchmarks/loadtest.py --database instance/loadtest.db --vus 16 --duration 60
+  python benchmarks/loadtest.py --ci                       # small seeded db, short run, fails on thresholds
+  python benchmarks/loadtest.py --ci --baseline bench.json # also fail if p95 regressed against a saved run
+  python benchmarks/loadtest.py --ci --server serve --workers 4   # against serve.py instead of the dev server
+
+Boots the app on a local port against a seeded SQLite database (see
+``python -m home.seed``) and drives concurrent virtual users through realistic
+journeys: login, dashboard, goals, group pages, group analytics, submitting
+group transactions and approving pending ones as an admin. Reports request
+count, errors, p50/p95/p99 latency and throughput per route.
+
+Only the standard library is used for the load generator so it runs anywhere
+the app does.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CSRF_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+GROUP_RE = re.compile(r'href="/groups/(\d+)"')
+APPROVE_TX_RE = re.compile(r'action="(/groups/\d+/transactions/\d+/approve)"')
+LOGIN_ROUTES = ('login_form', 'login')
+
+CI_DEFAULTS = {'users': 200, 'groups': 20, 'vus': 4, 'duration': 15.0, 'max_p95_ms': 1500.0, 'max_error_rate': 0.01}
+# Login is dominated by bcrypt by design, so it gets its own budget.
+CI_ROUTE_P95_MS = {'login': 5000.0}
+
+
+class Stats:
+    """Thread-safe collector of per-route latencies."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, route: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.latencies[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for route, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            result[route] = {
+                'count': len(ordered),
+                'errors': self.errors.get(route, 0),
+                'rps': len(ordered) / elapsed if elapsed > 0 else 0.0,
+                'p50_ms': percentile(ordered, 50) * 1000.0,
+                'p95_ms': percentile(ordered, 95) * 1000.0,
+                'p99_ms': percentile(ordered, 99) * 1000.0,
+            }
+        return result
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class VirtualUser(threading.Thread):
+    """One logged-in browser session walking through the site until the deadline."""
+
+    def __init__(self, base_url: str, email: str, password: str, stats: Stats, deadline: float,
+                 think_time: float, seed: int):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.email = email
+        self.password = password
+        self.stats = stats
+        self.deadline = deadline
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.group_ids: List[str] = []
+
+    def request(self, route: str, path: str, data: Optional[Dict] = None, landed: Optional[str] = None) -> str:
+        """GET ``path``, or POST ``data`` to it; with ``landed``, ending up on any other path is an error."""
+        body = None if data is None else urllib.parse.urlencode(data).encode('utf-8')
+        started = time.perf_counter()
+        ok = True
+        text = ''
+        try:
+            with self.opener.open(self.base_url + path, data=body, timeout=60) as resp:
+                text = resp.read().decode('utf-8', 'replace')
+                ok = resp.status < 400 and (landed is None or urllib.parse.urlsplit(resp.geturl()).path == landed)
+        except urllib.error.HTTPError as e:
+            ok = False
+            e.close()
+        except (urllib.error.URLError, OSError):
+            ok = False
+        self.stats.record(route, time.perf_counter() - started, ok)
+        return text
+
+    def login(self) -> bool:
+        page = self.request('login_form', '/login')
+        token = CSRF_RE.search(page)
+        if not token:
+            return False
+        # A rejected login renders the form again with a 200; only the redirect home means it worked.
+        page = self.request('login', '/login', {
+            'csrf_token': token.group(1), 'email': self.email, 'password': self.password,
+        }, landed='/')
+        return 'Logout' in page
+
+    def submit_transaction(self, group_id: str) -> None:
+        page = self.request('new_transaction_form', f'/groups/{group_id}/transactions/new')
+        token = CSRF_RE.search(page)
+        if not token:
+            return
+        self.request('new_transaction', f'/groups/{group_id}/transactions/new', {
+            'csrf_token': token.group(1),
+            'amount': f'{self.rng.uniform(5, 200):.2f}',
+            'description': 'Load test contribution',
+        })
+
+    def step(self) -> None:
+        roll = self.rng.random()
+        if roll < 0.25:
+            self.request('dashboard', '/dashboard')
+        elif roll < 0.40:
+            self.request('goals', '/goals')
+        elif roll < 0.50 or not self.group_ids:
+            page = self.request('groups', '/groups')
+            self.group_ids = sorted(set(GROUP_RE.findall(page)))
+        elif roll < 0.75:
+            group_id = self.rng.choice(self.group_ids)
+            page = self.request('group_detail', f'/groups/{group_id}')
+            approvals = APPROVE_TX_RE.findall(page)
+            if approvals and self.rng.random() < 0.5:
+                self.request('approve_transaction', self.rng.choice(approvals), {})
+        elif roll < 0.90:
+            self.request('group_analytics', f'/groups/{self.rng.choice(self.group_ids)}/analytics')
+        else:
+            self.submit_transaction(self.rng.choice(self.group_ids))
+
+    def run(self) -> None:
+        if not self.login():
+            return
+        while time.time() < self.deadline:
+            self.step()
+            if self.think_time:
+                time.sleep(self.rng.uniform(0, self.think_time))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 60.0) -> bool:
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def wait_for_http(url: str, timeout: float = 60.0) -> bool:
+    """Wait until ``url`` answers; a pre-forking server listens before its workers are ready."""
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            with urllib.request.urlopen(url, timeout=5):
+                return True
+        except urllib.error.HTTPError:
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def start_server(database: str, port: int, env: Optional[Dict[str, str]] = None,
+                 serve_args: Optional[List[str]] = None) -> subprocess.Popen:
+    """The development server, or serve.py with ``serve_args`` when given."""
+    env = dict(os.environ, **(env or {}), DATABASE_URL=f'sqlite:///{os.path.abspath(database)}')
+    if serve_args is not None:
+        command = [sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}'] + serve_args
+    else:
+        code = ('from home import create_app; '
+                f'create_app().run(host="127.0.0.1", port={port}, threaded=True, debug=False, use_reloader=False)')
+        command = [sys.executable, '-c', code]
+    return subprocess.Popen(command, cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def seed_database(path: str, users: int, groups: int, seed: int) -> None:
+    subprocess.run([sys.executable, '-m', 'home.seed', '--database', f'sqlite:///{os.path.abspath(path)}',
+                    '--users', str(users), '--groups', str(groups), '--years', '1', '--seed', str(seed)],
+                   cwd=PROJECT_ROOT, check=True, stdout=subprocess.DEVNULL)
+
+
+def pending_admins(database: str) -> List[int]:
+    """Ids of users administering a group with pending transactions, i.e. who can approve some."""
+    with sqlite3.connect(f'file:{os.path.abspath(database)}?mode=ro', uri=True) as conn:
+        rows = conn.execute(
+            "SELECT DISTINCT m.user_id FROM group_member m "
+            "JOIN group_transaction t ON t.group_id = m.group_id AND t.status = 'pending' "
+            "WHERE m.role = 'admin' AND m.is_active ORDER BY m.user_id").fetchall()
+    return [row[0] for row in rows]
+
+
+def print_report(summary: Dict[str, Dict[str, float]], elapsed: float) -> None:
+    print(f"{'route':<24}{'count':>8}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, row in summary.items():
+        print(f"{route:<24}{row['count']:>8}{row['errors']:>8}{row['rps']:>9.1f}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+    total = sum(r['count'] for r in summary.values())
+    print(f"Total {total} requests in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.1f} req/s)")
+
+
+def check_thresholds(summary: Dict[str, Dict[str, float]], max_p95_ms: Optional[float],
+                     max_error_rate: Optional[float], baseline: Optional[Dict] = None,
+                     tolerance: float = 0.25, route_p95_ms: Optional[Dict[str, float]] = None) -> List[str]:
+    failures = []
+    route_p95_ms = route_p95_ms or {}
+    for route, row in summary.items():
+        limit = route_p95_ms.get(route, max_p95_ms)
+        if limit is not None and row['p95_ms'] > limit:
+            failures.append(f"{route}: p95 {row['p95_ms']:.1f}ms exceeds {limit:.1f}ms")
+        if max_error_rate is not None and row['count'] and row['errors'] / row['count'] > max_error_rate:
+            failures.append(f"{route}: error rate {row['errors'] / row['count']:.2%} exceeds {max_error_rate:.2%}")
+        if baseline and route in baseline:
+            # Ignore jitter on very fast routes: a regression must also cost real time.
+            allowed = max(baseline[route]['p95_ms'] * (1.0 + tolerance), baseline[route]['p95_ms'] + 25.0)
+            if row['p95_ms'] > allowed:
+                failures.append(f"{route}: p95 {row['p95_ms']:.1f}ms regressed past baseline "
+                                f"{baseline[route]['p95_ms']:.1f}ms (+{tolerance:.0%})")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Drive concurrent user journeys against a local FundFlow instance')
+    parser.add_argument('--database', help='Seeded SQLite database file to serve (seeded on the fly in --ci mode)')
+    parser.add_argument('--ci', action='store_true', help='Short run on a small freshly seeded database with thresholds')
+    parser.add_argument('--vus', type=int, default=8, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds to run the journeys for')
+    parser.add_argument('--think-time', type=float, default=0.0, help='Max random pause between steps, seconds')
+    parser.add_argument('--seeded-users', type=int, default=None,
+                        help='How many seeded users (user1..userN) to log in as (default: --vus)')
+    parser.add_argument('--password', default='password', help='Password the database was seeded with')
+    parser.add_argument('--url', help='Use an already running instance instead of booting one')
+    parser.add_argument('--max-p95-ms', type=float, default=None, help='Fail if any route p95 exceeds this')
+    parser.add_argument('--route-p95-ms', action='append', default=[], metavar='ROUTE=MS',
+                        help='Per-route p95 limit overriding --max-p95-ms (repeatable)')
+    parser.add_argument('--max-error-rate', type=float, default=None, help='Fail if any route error rate exceeds this')
+    parser.add_argument('--baseline', help='JSON report from an earlier run to compare p95 against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 regression against --baseline')
+    parser.add_argument('--json', dest='json_out', help='Write the per-route summary to this file')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for journeys (and the --ci database)')
+    parser.add_argument('--server', choices=('dev', 'serve'), default='dev',
+                        help='Boot the development server or serve.py (pre-forked, --preload)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='serve.py worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='serve.py threads per worker')
+    parser.add_argument('--rate-limits', action='store_true',
+                        help="Keep the booted server's RATE_LIMITS (off by default so journeys measure latency, not 429s)")
+    args = parser.parse_args(argv)
+
+    route_p95_ms: Dict[str, float] = {}
+    if args.ci:
+        route_p95_ms.update(CI_ROUTE_P95_MS)
+        if args.seeded_users is None:
+            args.seeded_users = CI_DEFAULTS['users']
+        args.duration = min(args.duration, CI_DEFAULTS['duration'])
+        args.vus = min(args.vus, CI_DEFAULTS['vus'])
+        if args.max_p95_ms is None:
+            args.max_p95_ms = CI_DEFAULTS['max_p95_ms']
+        if args.max_error_rate is None:
+            args.max_error_rate = CI_DEFAULTS['max_error_rate']
+    for item in args.route_p95_ms:
+        route, _, limit = item.partition('=')
+        route_p95_ms[route] = float(limit)
+
+    tmpdir = None
+    server = None
+    base_url = args.url
+    database = None
+    try:
+        if base_url is None:
+            database = args.database
+            if database is None:
+                if not args.ci:
+                    parser.error('--database is required unless --ci or --url is given')
+                tmpdir = tempfile.mkdtemp(prefix='fundflow-loadtest-')
+                database = os.path.join(tmpdir, 'loadtest.db')
+                seed_database(database, CI_DEFAULTS['users'], CI_DEFAULTS['groups'], args.seed)
+            port = free_port()
+            serve_args = None
+            if args.server == 'serve':
+                serve_args = ['--workers', str(args.workers), '--threads', str(args.threads), '--preload']
+            env = None if args.rate_limits else {'RATE_LIMITS': '', 'RATE_LIMITS_GLOBAL': ''}
+            server = start_server(database, port, env=env, serve_args=serve_args)
+            base_url = f'http://127.0.0.1:{port}'
+            if not wait_for_port(port) or not wait_for_http(f'{base_url}/login'):
+                print('Server did not start', file=sys.stderr)
+                return 2
+
+        stats = Stats()
+        seeded_users = args.seeded_users or args.vus
+        started = time.time()
+        deadline = started + args.duration
+        picker = random.Random(args.seed)
+        accounts = picker.sample(range(1, seeded_users + 1), min(args.vus, seeded_users))
+        if database is not None:
+            # Make sure one VU can approve, or the approval journey never runs.
+            approvers = [user_id for user_id in pending_admins(database) if user_id <= seeded_users]
+            if approvers and not set(accounts) & set(approvers):
+                accounts[0] = picker.choice(approvers)
+        vus = [VirtualUser(base_url, f'user{accounts[i % len(accounts)]}@example.com', args.password, stats,
+                           deadline, args.think_time, args.seed * 1000 + i) for i in range(args.vus)]
+        for vu in vus:
+            vu.start()
+        for vu in vus:
+            vu.join()
+        elapsed = time.time() - started
+
+        summary = stats.summary(elapsed)
+        print_report(summary, elapsed)
+        if args.json_out:
+            with open(args.json_out, 'w') as fh:
+                json.dump(summary, fh, indent=2, sort_keys=True)
+
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as fh:
+                baseline = json.load(fh)
+        failures = check_thresholds(summary, args.max_p95_ms, args.max_error_rate, baseline,
+                                    args.tolerance, route_p95_ms)
+        if not any(route not in LOGIN_ROUTES for route in summary):
+            failures.append('no requests completed after login (did login fail?)')
+        if args.ci and 'approve_transaction' not in summary:
+            failures.append('no transactions were approved')
+        for failure in failures:
+            print(f"FAIL {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        if tmpdir is not None:
+            for name in os.listdir(tmpdir):
+                os.remove(os.path.join(tmpdir, name))
+            os.rmdir(tmpdir)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Login throughput and site responsiveness during a login storm.
+
+Run from project root:
+  python benchmarks/login_throughput.py
+  python benchmarks/login_throughput.py --clients 32 --duration 20 --workers 4
+
+Boots the app once per profile against a copy of a seeded database and runs
+``--clients`` threads that log in (a fresh session each time) as fast as they
+can, while one bystander keeps loading the (cheap) home page. Profiles:
+
+  inline      bcrypt in the request thread (the default)
+  pool        PASSWORD_HASH_WORKERS=--workers with a short queue
+  rounds-N    inline with BCRYPT_LOG_ROUNDS=--rounds; users are rehashed to
+              the cheaper cost on their first login
+
+Reports successful logins/s, login p50/p95, logins shed with 503 and the
+bystander's p95. Reuses the HTTP helpers from benchmarks/loadtest.py.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.cookiejar
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import CSRF_RE, free_port, percentile, seed_database, start_server, wait_for_port  # noqa: E402
+
+
+def login_loop(base_url: str, user_no: int, users: int, deadline: float, results: Dict[str, List], lock) -> None:
+    ok_times: List[float] = []
+    busy = errors = 0
+    n = user_no
+    while time.time() < deadline:
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        try:
+            with opener.open(base_url + '/login', timeout=60) as resp:
+                token = CSRF_RE.search(resp.read().decode('utf-8', 'replace')).group(1)
+            body = urllib.parse.urlencode({'csrf_token': token, 'email': f'user{n}@example.com',
+                                           'password': 'password'}).encode('utf-8')
+            started = time.perf_counter()
+            with opener.open(base_url + '/login', data=body, timeout=60) as resp:
+                page = resp.read().decode('utf-8', 'replace')
+            if 'Logout' in page:
+                ok_times.append(time.perf_counter() - started)
+            else:
+                errors += 1
+        except urllib.error.HTTPError as e:
+            if e.code == 503:
+                busy += 1
+            else:
+                errors += 1
+            e.close()
+        except (urllib.error.URLError, OSError, AttributeError):
+            errors += 1
+        n = n % users + 1
+    with lock:
+        results['login'].extend(ok_times)
+        results['busy'].append(busy)
+        results['errors'].append(errors)
+
+
+def bystander(base_url: str, deadline: float, results: Dict[str, List]) -> None:
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base_url + '/', timeout=60) as resp:
+                resp.read()
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.05)
+            continue
+        results['bystander'].append(time.perf_counter() - started)
+        time.sleep(0.05)
+
+
+def run_profile(source: str, env: Dict[str, str], clients: int, users: int, duration: float) -> Dict[str, float]:
+    workdir = tempfile.mkdtemp(prefix='fundflow-login-bench-')
+    path = os.path.join(workdir, 'bench.db')
+    shutil.copy(source, path)
+    port = free_port()
+    server = start_server(path, port, env)
+    try:
+        if not wait_for_port(port):
+            raise SystemExit('app did not start')
+        base_url = f'http://127.0.0.1:{port}'
+        results: Dict[str, List] = {'login': [], 'busy': [], 'errors': [], 'bystander': []}
+        lock = threading.Lock()
+        deadline = time.time() + duration
+        threads = [threading.Thread(target=login_loop, args=(base_url, i + 1, users, deadline, results, lock))
+                   for i in range(clients)]
+        threads.append(threading.Thread(target=bystander, args=(base_url, deadline, results)))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        logins = sorted(results['login'])
+        home = sorted(results['bystander'])
+        return {
+            'logins_per_s': len(logins) / duration,
+            'login_p50_ms': percentile(logins, 50) * 1000.0,
+            'login_p95_ms': percentile(logins, 95) * 1000.0,
+            'busy': sum(results['busy']),
+            'errors': sum(results['errors']),
+            'home_p95_ms': percentile(home, 95) * 1000.0,
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark login throughput with different password hashing setups')
+    parser.add_argument('--database', help='Seeded SQLite file to copy (default: seed a temporary one)')
+    parser.add_argument('--users', type=int, default=200, help='Users to seed / log in as')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent login loops')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per profile')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Hashing pool size for "pool"')
+    parser.add_argument('--rounds', type=int, default=10, help='Cost for the rounds-N profile')
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    source = args.database
+    if source is None:
+        tmpdir = tempfile.mkdtemp(prefix='fundflow-login-seed-')
+        source = os.path.join(tmpdir, 'seed.db')
+        seed_database(source, args.users, 0, 1)
+    profiles = [
+        ('inline', {'PASSWORD_HASH_WORKERS': '0'}),
+        ('pool', {'PASSWORD_HASH_WORKERS': str(args.workers), 'PASSWORD_HASH_QUEUE': str(args.workers * 2),
+                  'PASSWORD_HASH_WAIT_SECONDS': '0.5'}),
+        (f'rounds-{args.rounds}', {'PASSWORD_HASH_WORKERS': '0', 'BCRYPT_LOG_ROUNDS': str(args.rounds)}),
+    ]
+    try:
+        print(f"{'profile':<12}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'503s':>8}{'errors':>8}{'home p95':>10}")
+        for name, env in profiles:
+            r = run_profile(source, env, args.clients, args.users, args.duration)
+            print(f"{name:<12}{r['logins_per_s']:>10.1f}{r['login_p50_ms']:>10.0f}{r['login_p95_ms']:>10.0f}"
+                  f"{r['busy']:>8}{r['errors']:>8}{r['home_p95_ms']:>10.0f}")
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
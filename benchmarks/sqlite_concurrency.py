@@ -0,0 +1,141 @@
+"""
+Read throughput under a concurrent writer: default SQLite settings vs the tuned profile.
+
+Run from project root:
+  python benchmarks/sqlite_concurrency.py
+  python benchmarks/sqlite_concurrency.py --readers 8 --duration 10 --database /tmp/bench.db
+
+For each profile a fresh copy of a seeded database is opened by one writer
+process (small commits, like users adjusting savings) and several reader
+processes (the dashboard's ledger query). Reports reads/s, writes/s and how
+many operations failed with "database is locked".
+
+The tuned profile is exactly what the app applies through home.database.
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from home.database import DEFAULTS, apply_sqlite_pragmas, engine_options  # noqa: E402
+
+READ_SQL = text('SELECT date_time, amount FROM saving_changes WHERE user_id = :uid ORDER BY date_time')
+WRITE_SQL = text('INSERT INTO saving_changes (amount, date_time, user_id) VALUES (:amount, CURRENT_TIMESTAMP, :uid)')
+SAVINGS_SQL = text('UPDATE user SET savings = savings + :amount WHERE id = :uid')
+
+
+def make_engine(path: str, tuned: bool):
+    uri = f'sqlite:///{path}'
+    if not tuned:
+        # Stock settings: rollback journal, default lock wait, no pragmas.
+        return create_engine(uri, connect_args={'timeout': 0.1})
+    engine = create_engine(uri, **engine_options(uri, DEFAULTS))
+    apply_sqlite_pragmas(engine, DEFAULTS)
+    return engine
+
+
+def reader(path: str, tuned: bool, users: int, deadline: float, results) -> None:
+    engine = make_engine(path, tuned)
+    rng = random.Random(os.getpid())
+    ok = locked = 0
+    while time.time() < deadline:
+        try:
+            with engine.connect() as conn:
+                conn.execute(READ_SQL, {'uid': rng.randint(1, users)}).fetchall()
+            ok += 1
+        except OperationalError:
+            locked += 1
+    results.put(('read', ok, locked))
+
+
+def writer(path: str, tuned: bool, users: int, deadline: float, results) -> None:
+    engine = make_engine(path, tuned)
+    rng = random.Random(1)
+    ok = locked = 0
+    while time.time() < deadline:
+        uid = rng.randint(1, users)
+        amount = round(rng.uniform(1, 50), 2)
+        try:
+            with engine.begin() as conn:
+                conn.execute(WRITE_SQL, {'uid': uid, 'amount': amount})
+                conn.execute(SAVINGS_SQL, {'uid': uid, 'amount': amount})
+            ok += 1
+        except OperationalError:
+            locked += 1
+    results.put(('write', ok, locked))
+
+
+def run_profile(source: str, tuned: bool, readers: int, users: int, duration: float) -> Dict[str, float]:
+    workdir = tempfile.mkdtemp(prefix='fundflow-sqlite-bench-')
+    path = os.path.join(workdir, 'bench.db')
+    shutil.copy(source, path)
+    try:
+        results = mp.Queue()
+        deadline = time.time() + 1.0 + duration
+        procs = [mp.Process(target=writer, args=(path, tuned, users, deadline, results))]
+        procs += [mp.Process(target=reader, args=(path, tuned, users, deadline, results)) for _ in range(readers)]
+        for p in procs:
+            p.start()
+        totals = {'read': 0, 'read_locked': 0, 'write': 0, 'write_locked': 0}
+        for _ in procs:
+            kind, ok, locked = results.get()
+            totals[kind] += ok
+            totals[f'{kind}_locked'] += locked
+        for p in procs:
+            p.join()
+        elapsed = duration + 1.0
+        return {
+            'reads_per_s': totals['read'] / elapsed,
+            'writes_per_s': totals['write'] / elapsed,
+            'read_locked': totals['read_locked'],
+            'write_locked': totals['write_locked'],
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark SQLite read throughput under a concurrent writer')
+    parser.add_argument('--database', help='Seeded SQLite file to copy (default: seed a temporary one)')
+    parser.add_argument('--users', type=int, default=500, help='Users to seed / query')
+    parser.add_argument('--readers', type=int, default=4, help='Reader processes')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per profile')
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    source = args.database
+    if source is None:
+        tmpdir = tempfile.mkdtemp(prefix='fundflow-sqlite-seed-')
+        source = os.path.join(tmpdir, 'seed.db')
+        subprocess.run([sys.executable, '-m', 'home.seed', '--database', f'sqlite:///{source}',
+                        '--users', str(args.users), '--groups', '0'],
+                       cwd=PROJECT_ROOT, check=True, stdout=subprocess.DEVNULL)
+    try:
+        print(f"{'profile':<10}{'reads/s':>12}{'writes/s':>12}{'read locked':>14}{'write locked':>14}")
+        for name, tuned in (('default', False), ('tuned', True)):
+            r = run_profile(source, tuned, args.readers, args.users, args.duration)
+            print(f"{name:<10}{r['reads_per_s']:>12.0f}{r['writes_per_s']:>12.0f}"
+                  f"{r['read_locked']:>14}{r['write_locked']:>14}")
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,30 +9,129 @@ from datetime import datetime
 from flask_mail import Mail
 from dotenv import load_dotenv
 from flask_migrate import Migrate
+from home.database import configure_app, configure_engines, init_replica_routing, RoutingSession
 load_dotenv()
 
 project_root = str(Path(__file__).parent.parent)
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-app = Flask(__name__,
-            template_folder=os.path.join(os.path.dirname(__file__), 'templates'),
-            static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = '5773526bb0b13ce0c676dfde280ba345'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db'
-db = SQLAlchemy(app)
-
-bcrypt = Bcrypt(app)
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+bcrypt = Bcrypt()
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
 login_manager.login_message_category = 'info'
-app.config['MAIL_SERVER'] = 'mail.gmx.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USE_SSL'] = False
-app.config['MAIL_USERNAME'] = os.environ.get('EMAIL_USER')
-app.config['MAIL_PASSWORD'] = os.environ.get('EMAIL_PASS')
-mail = Mail(app)
-migrate = Migrate(app, db)
-
-from home import routes
\ No newline at end of file
+mail = Mail()
+migrate = Migrate()
+
+
+def create_app(config=None, blueprints=True):
+    """
+    Build a configured app. ``config`` overrides the environment. With
+    blueprints=False only the database, mail and login extensions are set up,
+    which is all the command line tasks need; the web subsystems (routes,
+    fragment cache, profile pictures, static fingerprinting) are imported and
+    registered only for a full app.
+    """
+    app = Flask(__name__,
+                template_folder=os.path.join(os.path.dirname(__file__), 'templates'),
+                static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = '5773526bb0b13ce0c676dfde280ba345'
+    app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 4096))
+    app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 30))
+    app.config['MEMBERSHIP_CACHE_SIZE'] = int(os.environ.get('MEMBERSHIP_CACHE_SIZE', 8192))
+    app.config['MEMBERSHIP_CACHE_TTL'] = float(os.environ.get('MEMBERSHIP_CACHE_TTL', 60))
+    app.config['FRAGMENT_CACHE_SIZE'] = int(os.environ.get('FRAGMENT_CACHE_SIZE', 512))
+    app.config['FRAGMENT_CACHE_TTL'] = float(os.environ.get('FRAGMENT_CACHE_TTL', 300))
+    app.config['LEDGER_RETENTION_DAYS'] = int(os.environ.get('LEDGER_RETENTION_DAYS', 730))
+    app.config['LEDGER_ARCHIVE_DIR'] = os.environ.get('LEDGER_ARCHIVE_DIR', os.path.join(app.instance_path, 'archive'))
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    app.config['PASSWORD_HASH_POOL'] = os.environ.get('PASSWORD_HASH_POOL', 'thread')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+    app.config['PASSWORD_HASH_WAIT_SECONDS'] = float(os.environ.get('PASSWORD_HASH_WAIT_SECONDS', 2))
+    app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'mail.gmx.com')
+    app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+    app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', '1').lower() in ('1', 'true', 'yes')
+    app.config['MAIL_USE_SSL'] = False
+    app.config['MAIL_USERNAME'] = os.environ.get('EMAIL_USER')
+    app.config['MAIL_PASSWORD'] = os.environ.get('EMAIL_PASS')
+    app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER') or os.environ.get('EMAIL_USER') or 'noreply@fundflow.local'
+    app.config['MAIL_OUTBOX_WORKER'] = os.environ.get('MAIL_OUTBOX_WORKER', '1').lower() in ('1', 'true', 'yes')
+    app.config['MAIL_OUTBOX_BATCH_SIZE'] = int(os.environ.get('MAIL_OUTBOX_BATCH_SIZE', 50))
+    app.config['MAIL_OUTBOX_MAX_ATTEMPTS'] = int(os.environ.get('MAIL_OUTBOX_MAX_ATTEMPTS', 6))
+    app.config['MAIL_OUTBOX_BACKOFF_SECONDS'] = float(os.environ.get('MAIL_OUTBOX_BACKOFF_SECONDS', 30))
+    app.config['MAIL_OUTBOX_LEASE_SECONDS'] = int(os.environ.get('MAIL_OUTBOX_LEASE_SECONDS', 300))
+    app.config['MAIL_OUTBOX_POLL_SECONDS'] = float(os.environ.get('MAIL_OUTBOX_POLL_SECONDS', 5))
+    app.config['APP_BASE_URL'] = os.environ.get('APP_BASE_URL', 'http://localhost:5000')
+    app.config['DIGEST_INTERVAL_HOURS'] = int(os.environ.get('DIGEST_INTERVAL_HOURS', 24))
+    app.config['DIGEST_DEADLINE_DAYS'] = int(os.environ.get('DIGEST_DEADLINE_DAYS', 7))
+    app.config['DIGEST_BATCH_SIZE'] = int(os.environ.get('DIGEST_BATCH_SIZE', 500))
+    app.config['PROFILE_PICTURE_SIZES'] = [int(s) for s in os.environ.get('PROFILE_PICTURE_SIZES', '32,64,128,256').split(',')]
+    app.config['PROFILE_PICTURE_SPOOL'] = os.environ.get('PROFILE_PICTURE_SPOOL', os.path.join(app.instance_path, 'picture_queue'))
+    app.config['ASSET_FINGERPRINT'] = os.environ.get('ASSET_FINGERPRINT', '1').lower() in ('1', 'true', 'yes')
+    app.config['ASSET_MAX_AGE'] = int(os.environ.get('ASSET_MAX_AGE', 31536000))
+    app.config['API_BATCH_MAX_REQUESTS'] = int(os.environ.get('API_BATCH_MAX_REQUESTS', 20))
+    app.config['API_BULK_TRANSACTIONS_MAX'] = int(os.environ.get('API_BULK_TRANSACTIONS_MAX', 5000))
+    app.config['SSE_MAX_STREAMS'] = int(os.environ.get('SSE_MAX_STREAMS', 4))
+    app.config['SSE_HEARTBEAT_SECONDS'] = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
+    app.config['SSE_MAX_STREAM_SECONDS'] = float(os.environ.get('SSE_MAX_STREAM_SECONDS', 300))
+    app.config['SSE_RETRY_MS'] = int(os.environ.get('SSE_RETRY_MS', 3000))
+    app.config['SSE_HISTORY'] = int(os.environ.get('SSE_HISTORY', 200))
+    app.config['SSE_QUEUE_SIZE'] = int(os.environ.get('SSE_QUEUE_SIZE', 500))
+    app.config['ANALYTICS_LOCK_DIR'] = os.environ.get('ANALYTICS_LOCK_DIR', os.path.join(app.instance_path, 'analytics_locks'))
+    app.config['ANALYTICS_LOCK_TIMEOUT'] = float(os.environ.get('ANALYTICS_LOCK_TIMEOUT', 10))
+    app.config['RATE_LIMITS'] = os.environ.get(
+        'RATE_LIMITS', 'groups.group_analytics=30/60,personal.dashboard=60/60,api.user_analytics=60/60,'
+                       'api.group_analytics=60/60,api.goal_analytics=120/60,api.batch=60/60')
+    app.config['RATE_LIMITS_GLOBAL'] = os.environ.get('RATE_LIMITS_GLOBAL', '')
+    app.config['RATE_LIMIT_STORE'] = os.environ.get('RATE_LIMIT_STORE', 'memory')
+    app.config['RATE_LIMIT_DB'] = os.environ.get('RATE_LIMIT_DB', os.path.join(app.instance_path, 'ratelimit.db'))
+    app.config['LOAD_SHED_INFLIGHT'] = int(os.environ.get('LOAD_SHED_INFLIGHT', 6))
+    app.config['LOAD_SHED_QUEUE_MS'] = float(os.environ.get('LOAD_SHED_QUEUE_MS', 1000))
+    app.config['ANALYTICS_CACHE'] = os.environ.get('ANALYTICS_CACHE', 'sqlite')
+    app.config['ANALYTICS_CACHE_DB'] = os.environ.get('ANALYTICS_CACHE_DB', os.path.join(app.instance_path, 'analytics_cache.db'))
+    app.config['ANALYTICS_CACHE_MAX_BYTES'] = int(os.environ.get('ANALYTICS_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    app.config['ANALYTICS_CACHE_MAX_ENTRIES'] = int(os.environ.get('ANALYTICS_CACHE_MAX_ENTRIES', 4096))
+    app.config['ANALYTICS_CACHE_TTL'] = float(os.environ.get('ANALYTICS_CACHE_TTL', 2 * 24 * 3600))
+    app.config['ASSET_CACHE_DIR'] = os.environ.get('ASSET_CACHE_DIR', os.path.join(app.instance_path, 'assets'))
+    app.config.update(config or {})
+    configure_app(app)
+
+    db.init_app(app)
+    configure_engines(app, db)
+    init_replica_routing(app, db)
+    bcrypt.init_app(app)
+    login_manager.init_app(app)
+    mail.init_app(app)
+    migrate.init_app(app, db)
+
+    # live and permissions subscribe to change events when imported; their state is per app.
+    from home import db_models, live, permissions, sharedcache  # noqa: F401
+    db_models.init_app(app)
+    sharedcache.init_app(app)
+
+    if blueprints:
+        register_blueprints(app)
+    return app
+
+
+def register_blueprints(app):
+    from home import assets, fragments, mailer, pictures, ratelimit
+    from home.api import bp as api_bp
+    from home.auth import bp as auth_bp
+    from home.groups import bp as groups_bp
+    from home.personal import bp as personal_bp
+    from home.routes import bp as main_bp
+
+    fragments.init_app(app)
+    pictures.init_app(app)
+    ratelimit.init_app(app)
+    mailer.init_app(app)
+    app.register_blueprint(main_bp)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(personal_bp)
+    app.register_blueprint(groups_bp)
+    app.register_blueprint(api_bp)
+    if app.config['ASSET_FINGERPRINT']:
+        assets.init_app(app)
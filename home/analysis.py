@@ -12,7 +12,7 @@ except Exception:
     np = None
     linregress = None
 
-from home.db_models import GroupTransaction, Group, Goal, GroupGoal, SavingChanges, User
+from home.db_models import GroupTransaction, Group, Goal, GroupGoal, SavingChanges, User, SavingChangesRollup, GroupTransactionRollup
 
 
 def _to_dataframe(transactions: Iterable[Dict]) -> Optional["pd.Series"]:
@@ -120,14 +120,29 @@ def required_rate(remaining_amount: float, days: int) -> Optional[float]:
         return None
     return remaining_amount / float(days)
 
+def rollup_movements(rollups: Iterable) -> List[Dict]:
+    """
+    Turn monthly ledger rollup rows into movements dated at the start of their month.
+    """
+    return [{
+        "date": r.month,
+        "amount": float(r.amount),
+        "id": f"rollup:{r.id}",
+        "type": "rollup"
+    } for r in rollups if r.amount]
+
 def group_transactions_as_movements(group_id: int, approved_only: bool = True) -> List[Dict]:
     """
     Load group transactions as generic movements (positive=inflow, negative=outflow).
+
+    Months that have been rolled up by home.retention come first, one movement each.
     """
     q = GroupTransaction.query.filter_by(group_id=group_id)
+    rq = GroupTransactionRollup.query.filter_by(group_id=group_id)
     if approved_only:
         q = q.filter_by(status='approved')
-    movements: List[Dict] = []
+        rq = rq.filter_by(status='approved')
+    movements: List[Dict] = rollup_movements(rq.order_by(GroupTransactionRollup.month.asc()).all())
     for tx in q.order_by(GroupTransaction.occurred_at.asc()).all():
         movements.append({
             "date": tx.occurred_at,
@@ -161,12 +176,24 @@ def group_transactions_as_movements(group_id: int, approved_only: bool = True) -
 
     return movements
 
+def group_monthly_rollups(group_id: int) -> Dict[str, Dict[str, float]]:
+    """Approved group activity per month from rollups, shaped like the analytics monthly table."""
+    monthly: Dict[str, Dict[str, float]] = {}
+    rollups = GroupTransactionRollup.query.filter_by(group_id=group_id, status='approved')\
+        .order_by(GroupTransactionRollup.month.desc()).all()
+    for r in rollups:
+        monthly[r.month.strftime('%Y-%m')] = {'contributions': r.total_in, 'expenses': r.total_out}
+    return monthly
+
 def user_transactions_as_movements(user: User) -> List[Dict]:
     """
     Load user transactions as generic movements (positive=inflow, negative=outflow).
+
+    Months that have been rolled up by home.retention come first, one movement each.
     """
     q = SavingChanges.query.filter_by(user_id=user.id)
-    movements: List[Dict] = []
+    rollups = SavingChangesRollup.query.filter_by(user_id=user.id).order_by(SavingChangesRollup.month.asc()).all()
+    movements: List[Dict] = rollup_movements(rollups)
     for sc in q.order_by(SavingChanges.date_time.asc()).all():
         movements.append({
             "date": sc.date_time,
@@ -175,6 +202,55 @@ def user_transactions_as_movements(user: User) -> List[Dict]:
         })
     return movements
 
+def account_analytics(rate: Optional[float], goals: Iterable, balance: float) -> Dict[str, Optional[float]]:
+    """
+    Overall rate breakdown and the ETA to cover every goal in ``goals`` from ``balance``.
+    """
+    total_remaining = sum(max(0.0, float(g.target_amount) - float(balance or 0.0)) for g in goals)
+    eta = estimate_eta(total_remaining, rate)
+    rb = rate_breakdown(rate)
+    return {
+        "rate_per_day": rb["per_day"],
+        "rate_per_week": rb["per_week"],
+        "rate_per_month": rb["per_month"],
+        "eta_ts": None if eta is None else int(datetime.combine(eta, datetime.min.time()).timestamp()),
+    }
+
+def analyse_goal(goal, balance: float, rate: Optional[float]) -> Dict[str, Optional[float]]:
+    """
+    Remaining amount, ETA, rate breakdown and required daily saving for one goal
+    funded from ``balance`` at ``rate`` per day.
+    """
+    remaining = max(0.0, float(goal.target_amount) - float(balance))
+    days = 30
+    try:
+        if getattr(goal, 'deadline', None):
+            dl = goal.deadline
+            if isinstance(dl, datetime):
+                dl_date = dl.date()
+            else:
+                dl_date = dl
+            days_left = (dl_date - date.today()).days
+            days = max(1, days_left) if days_left is not None else 30
+    except Exception:
+        days = 30
+    required_daily_30 = required_rate(remaining, days)
+    eta = estimate_eta(remaining, rate)
+    rb = rate_breakdown(rate)
+    return {
+        "remaining": remaining,
+        "rate_per_day": rb["per_day"],
+        "rate_per_week": rb["per_week"],
+        "rate_per_month": rb["per_month"],
+        "eta_ts": None if eta is None else int(datetime.combine(eta, datetime.min.time()).timestamp()),
+        "required_daily_30": required_daily_30,
+        "progress_percent": (balance / goal.target_amount * 100) if goal.target_amount > 0 else 0
+    }
+
+def analyse_goals(goals: Iterable, balance: float, rate: Optional[float]) -> Dict[int, Dict[str, Optional[float]]]:
+    """analyse_goal for each of ``goals``, keyed by goal id."""
+    return {goal.id: analyse_goal(goal, balance, rate) for goal in goals}
+
 def analyse_group(group: Group, goals: Iterable[GroupGoal], group_balance: float) -> Dict[int, Dict[str, Optional[float]]]:
     """
     For a group and its goals, infer current daily savings rate from transactions and
@@ -182,70 +258,10 @@ def analyse_group(group: Group, goals: Iterable[GroupGoal], group_balance: float
 
     Returns mapping goal_id -> {"remaining", "eta_ts", "rate_per_day", "per_week", "per_month"}
     """
-    tx = group_transactions_as_movements(group.id, approved_only=True)
-    rate = rate_per_day(tx)
-    results: Dict[int, Dict[str, Optional[float]]] = {}
-    for g in goals:
-        remaining = max(0.0, float(g.target_amount) - float(group_balance))
-        eta = estimate_eta(remaining, rate)
-        rb = rate_breakdown(rate)
-        days = 30
-        try:
-            if getattr(g, 'deadline', None):
-                dl = g.deadline
-                if isinstance(dl, datetime):
-                    dl_date = dl.date()
-                else:
-                    dl_date = dl
-                days_left = (dl_date - date.today()).days
-                days = max(1, days_left) if days_left is not None else 30
-        except Exception:
-            days = 30
-        required_daily = required_rate(remaining, days)
-        required_daily_30 = required_daily
-        results[g.id] = {
-            "remaining": remaining,
-            "rate_per_day": rb["per_day"],
-            "rate_per_week": rb["per_week"],
-            "rate_per_month": rb["per_month"],
-            "eta_ts": None if eta is None else int(datetime.combine(eta, datetime.min.time()).timestamp()),
-            "required_daily_30": required_daily_30,
-            "progress_percent": (group_balance / g.target_amount * 100) if g.target_amount > 0 else 0
-        }
-    return results
+    return analyse_goals(goals, group_balance, rate_per_day(group_transactions_as_movements(group.id, approved_only=True)))
 
 def analyse_user(user: User, goals: Iterable[Goal], current_savings: float) -> Dict[int, Dict[str, Optional[float]]]:
     """
     Analyse a user's goals and transactions.
     """
-    tx = user_transactions_as_movements(user)
-    rate = rate_per_day(tx)
-    results: Dict[int, Dict[str, Optional[float]]] = {}
-    for g in goals:
-        remaining = max(0.0, float(g.target_amount) - float(current_savings))
-        days = 30
-        try:
-            if getattr(g, 'deadline', None):
-                dl = g.deadline
-                if isinstance(dl, datetime):
-                    dl_date = dl.date()
-                else:
-                    dl_date = dl
-                days_left = (dl_date - date.today()).days
-                days = max(1, days_left) if days_left is not None else 30
-        except Exception:
-            days = 30
-        required_daily = required_rate(remaining, days)
-        required_daily_30 = required_daily
-        eta = estimate_eta(remaining, rate)
-        rb = rate_breakdown(rate)
-        results[g.id] = {
-            "remaining": remaining,
-            "rate_per_day": rb["per_day"],
-            "rate_per_week": rb["per_week"],
-            "rate_per_month": rb["per_month"],
-            "eta_ts": None if eta is None else int(datetime.combine(eta, datetime.min.time()).timestamp()),
-            "required_daily_30": required_daily_30,
-            "progress_percent": (current_savings / g.target_amount * 100) if g.target_amount > 0 else 0
-        }
-    return results
\ No newline at end of file
+    return analyse_goals(goals, current_savings, rate_per_day(user_transactions_as_movements(user)))
@@ -0,0 +1,364 @@
+"""
+Versioned JSON API for the analytics the pages show.
+
+    GET  /api/v1/me                            the user and their savings balance
+    GET  /api/v1/me/analytics                  account and active goal analytics
+    GET  /api/v1/goals/<goal_id>/analytics     one of the user's goals
+    GET  /api/v1/groups                        the user's groups, balances and pending approvals
+    GET  /api/v1/groups/<group_id>/analytics   group account and goal analytics
+    POST /api/v1/groups/<group_id>/transactions  idempotent bulk transaction submission
+    POST /api/v1/batch                         several of the GETs above in one round trip
+
+Goal analytics are the payloads of home.analysis (remaining, rate_per_day,
+rate_per_week, rate_per_month, eta_ts, required_daily_30, progress_percent)
+plus ``eta`` as an ISO date, so clients do not have to agree with the server
+on time zones. The list endpoints accept repeated ``goal=<id>`` arguments to
+limit the goals analysed; the groups endpoint also takes ``status``.
+
+The dashboard, goal and group pages render without analytics and fill them in
+from these endpoints (static/analytics.js), so their first byte no longer
+waits for the ledger to be read. The API uses the session cookie like the
+pages do; errors are JSON with an ``error`` message and the HTTP status.
+Responses carry the same weak ETags as the pages (home.conditional), so a
+repeated fetch of unchanged data is a 304.
+
+A batch is ``{"requests": [{"id": "home", "path": "/api/v1/me/analytics"}, ...]}``
+and is answered with ``{"responses": [{"id": "home", "status": 200, "body": ...}]}``
+in the same order. Every GET resource above can be batched, at most
+API_BATCH_MAX_REQUESTS of them. The sub-requests share one ApiContext: the
+user's memberships are loaded with one query, and savings rates, goals and
+pending approval counts are computed once however many sub-requests use
+them. A failing sub-request gets its own error status and does not fail the
+batch.
+
+Bulk transactions are ``{"transactions": [{"idempotency_key", "amount",
+"description", "occurred_at"?}, ...]}``, at most API_BULK_TRANSACTIONS_MAX
+per call; see home.transactions for the deduplication. The answer lists every
+entry in input order with ``created`` false for keys already submitted, and
+is 201 when anything was created, 200 for a pure replay and 422 (nothing
+written) when any entry is invalid.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from flask import Blueprint, abort, current_app, jsonify, request
+from flask_login import current_user
+from sqlalchemy import func
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException, NotFound
+
+from home import db
+from home.analysis import account_analytics, analyse_goal
+from home.cached_analysis import group_rate, user_rate
+from home.conditional import conditional_page, group_page_version, user_page_version
+from home.db_models import Goal, Group, GroupGoal, GroupJoinRequest, GroupMember, GroupTransaction
+from home.permissions import group_member_required, load_group_membership
+from home.ratelimit import limiter
+from home.transactions import InvalidEntries, submit_group_transactions, validate_entries
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+GROUP_GOAL_STATUSES = ('proposed', 'approved')
+
+_UNSET = object()
+
+
+def _error_body(e: HTTPException) -> dict:
+    body = {'error': e.description, 'status': e.code}
+    if getattr(e, 'retry_after', None) is not None:
+        body['retry_after'] = e.retry_after
+    return body
+
+
+@bp.errorhandler(HTTPException)
+def json_error(e):
+    # Keep headers such as Retry-After and WWW-Authenticate, not the HTML content type.
+    headers = [(name, value) for name, value in e.get_headers() if name.lower() != 'content-type']
+    return jsonify(_error_body(e)), e.code, headers
+
+
+def api_login_required(f):
+    """Like flask_login.login_required, but answers 401 instead of redirecting to the login page."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not current_user.is_authenticated:
+            abort(401)
+        return f(*args, **kwargs)
+    return decorated
+
+
+class ApiContext:
+    """Queries and analysis shared by the resources of one API call or one batch."""
+
+    def __init__(self, user):
+        self.user = user
+        self._user_rate = _UNSET
+        self._active_goals: Optional[List[Goal]] = None
+        self._memberships: Optional[Dict[int, Tuple[Group, GroupMember]]] = None
+        self._group_rates: Dict[int, Optional[float]] = {}
+        self._pending: Optional[Dict[int, dict]] = None
+        self._group_goals: Dict[int, List[GroupGoal]] = {}
+
+    def user_rate(self) -> Optional[float]:
+        if self._user_rate is _UNSET:
+            self._user_rate = user_rate(self.user)
+        return self._user_rate
+
+    def active_goals(self) -> List[Goal]:
+        if self._active_goals is None:
+            self._active_goals = Goal.query.filter_by(user_id=self.user.id, status='active')\
+                .order_by(Goal.date_time.desc()).all()
+        return self._active_goals
+
+    def goal(self, goal_id: int) -> Goal:
+        """One of the user's goals (404 otherwise), from the active goals when they are loaded."""
+        for goal in self._active_goals or ():
+            if goal.id == goal_id:
+                return goal
+        return Goal.query.filter_by(id=goal_id, user_id=self.user.id).first_or_404()
+
+    def memberships(self) -> Dict[int, Tuple[Group, GroupMember]]:
+        """All active memberships of the user with their groups, in one query."""
+        if self._memberships is None:
+            rows = db.session.query(Group, GroupMember).join(GroupMember, GroupMember.group_id == Group.id)\
+                .filter(GroupMember.user_id == self.user.id, GroupMember.is_active == True)\
+                .order_by(Group.name).all()
+            self._memberships = {group.id: (group, member) for group, member in rows}
+        return self._memberships
+
+    def membership(self, group_id: int) -> Tuple[Group, GroupMember]:
+        """The group and the user's active membership; 404 for a missing group, 403 for a non-member."""
+        if self._memberships is None:
+            group, member = load_group_membership(group_id, self.user.id)
+        else:
+            group, member = self._memberships.get(group_id, (None, None))
+            if group is None and db.session.get(Group, group_id) is None:
+                abort(404)
+        if member is None or not member.is_active:
+            abort(403)
+        return group, member
+
+    def group_rate(self, group: Group) -> Optional[float]:
+        if group.id not in self._group_rates:
+            self._group_rates[group.id] = group_rate(group)
+        return self._group_rates[group.id]
+
+    def prefetch_group_goals(self, group_ids) -> None:
+        """Load the proposed and approved goals of several groups with one query."""
+        group_ids = [gid for gid in set(group_ids) if gid not in self._group_goals]
+        if not group_ids:
+            return
+        for gid in group_ids:
+            self._group_goals[gid] = []
+        goals = GroupGoal.query.filter(GroupGoal.group_id.in_(group_ids), GroupGoal.status.in_(GROUP_GOAL_STATUSES))\
+            .order_by(GroupGoal.created_at.desc()).all()
+        for goal in goals:
+            self._group_goals[goal.group_id].append(goal)
+
+    def group_goals(self, group_id: int, statuses) -> List[GroupGoal]:
+        """The group's goals in ``statuses``, newest first."""
+        if group_id in self._group_goals and set(statuses) <= set(GROUP_GOAL_STATUSES):
+            return [g for g in self._group_goals[group_id] if g.status in statuses]
+        return GroupGoal.query.filter(GroupGoal.group_id == group_id, GroupGoal.status.in_(statuses))\
+            .order_by(GroupGoal.created_at.desc()).all()
+
+    def pending_approvals(self) -> Dict[int, dict]:
+        """Pending transactions, proposed goals and join requests per group the user administers."""
+        if self._pending is None:
+            admin_ids = [gid for gid, (_, member) in self.memberships().items() if member.role == 'admin']
+            self._pending = {gid: {'transactions': 0, 'goals': 0, 'join_requests': 0} for gid in admin_ids}
+            if admin_ids:
+                for key, model, status in (('transactions', GroupTransaction, 'pending'),
+                                           ('goals', GroupGoal, 'proposed'),
+                                           ('join_requests', GroupJoinRequest, 'pending')):
+                    counts = db.session.query(model.group_id, func.count(model.id))\
+                        .filter(model.group_id.in_(admin_ids), model.status == status)\
+                        .group_by(model.group_id).all()
+                    for gid, count in counts:
+                        self._pending[gid][key] = count
+        return self._pending
+
+
+def _with_eta(analytics: Dict[str, Optional[float]]) -> dict:
+    eta_ts = analytics.get('eta_ts')
+    return dict(analytics, eta=None if eta_ts is None else date.fromtimestamp(eta_ts).isoformat())
+
+
+def _goal(goal, analytics: Dict[str, Optional[float]]) -> dict:
+    return {
+        'id': goal.id,
+        'title': goal.title,
+        'status': goal.status,
+        'target_amount': float(goal.target_amount),
+        'deadline': goal.deadline.date().isoformat() if goal.deadline else None,
+        'analytics': _with_eta(analytics),
+    }
+
+
+def _selected(goals, args: MultiDict):
+    ids = set(args.getlist('goal', type=int))
+    return [g for g in goals if g.id in ids] if ids else goals
+
+
+def me_resource(ctx: ApiContext, args: MultiDict) -> dict:
+    user = ctx.user
+    return {'id': user.id, 'username': user.username, 'email': user.email, 'savings': float(user.savings or 0.0)}
+
+
+def user_analytics_resource(ctx: ApiContext, args: MultiDict) -> dict:
+    savings = ctx.user.savings or 0.0
+    rate = ctx.user_rate()
+    return {
+        'savings': float(savings),
+        'account': _with_eta(account_analytics(rate, ctx.active_goals(), savings)),
+        'goals': [_goal(g, analyse_goal(g, savings, rate)) for g in _selected(ctx.active_goals(), args)],
+    }
+
+
+def goal_analytics_resource(ctx: ApiContext, args: MultiDict, goal_id: int) -> dict:
+    goal = ctx.goal(goal_id)
+    return {'goal': _goal(goal, analyse_goal(goal, ctx.user.savings or 0.0, ctx.user_rate()))}
+
+
+def groups_resource(ctx: ApiContext, args: MultiDict) -> dict:
+    pending = ctx.pending_approvals()
+    return {'groups': [{
+        'id': group.id,
+        'name': group.name,
+        'currency': group.currency,
+        'balance': float(group.balance or 0.0),
+        'role': member.role,
+        'pending_approvals': pending.get(group.id),
+    } for group, member in ctx.memberships().values()]}
+
+
+def group_analytics_resource(ctx: ApiContext, args: MultiDict, group_id: int) -> dict:
+    group, member = ctx.membership(group_id)
+    statuses = args.getlist('status') or GROUP_GOAL_STATUSES
+    balance = group.balance or 0.0
+    rate = ctx.group_rate(group)
+    open_goals = ctx.group_goals(group_id, set(statuses) | {'approved'})
+    approved_goals = [g for g in open_goals if g.status == 'approved']
+    goals = _selected([g for g in open_goals if g.status in statuses], args)
+    return {
+        'group': {'id': group.id, 'balance': float(balance), 'currency': group.currency},
+        'account': _with_eta(account_analytics(rate, approved_goals, balance)),
+        'goals': [_goal(g, analyse_goal(g, balance, rate)) for g in goals],
+    }
+
+
+# Endpoint -> resource(ctx, args, **view_args), for the batch endpoint.
+BATCH_RESOURCES = {
+    'api.me': me_resource,
+    'api.user_analytics': user_analytics_resource,
+    'api.goal_analytics': goal_analytics_resource,
+    'api.groups': groups_resource,
+    'api.group_analytics': group_analytics_resource,
+}
+
+
+@bp.route("/me")
+@api_login_required
+def me():
+    return jsonify(me_resource(ApiContext(current_user), request.args))
+
+
+@bp.route("/me/analytics")
+@api_login_required
+@conditional_page(user_page_version)
+def user_analytics():
+    return jsonify(user_analytics_resource(ApiContext(current_user), request.args))
+
+
+@bp.route("/goals/<int:goal_id>/analytics")
+@api_login_required
+@conditional_page(user_page_version)
+def goal_analytics(goal_id):
+    return jsonify(goal_analytics_resource(ApiContext(current_user), request.args, goal_id))
+
+
+@bp.route("/groups")
+@api_login_required
+def groups():
+    return jsonify(groups_resource(ApiContext(current_user), request.args))
+
+
+@bp.route("/groups/<int:group_id>/analytics")
+@api_login_required
+@group_member_required()
+@conditional_page(group_page_version)
+def group_analytics(group_id, group, member):
+    return jsonify(group_analytics_resource(ApiContext(current_user), request.args, group_id))
+
+
+@bp.route("/groups/<int:group_id>/transactions", methods=['POST'])
+@api_login_required
+@group_member_required()
+def group_transactions(group_id, group, member):
+    payload = request.get_json(silent=True)
+    entries = payload.get('transactions') if isinstance(payload, dict) else None
+    if not isinstance(entries, list) or not entries:
+        abort(400, 'Expected {"transactions": [{"idempotency_key": ..., "amount": ..., "description": ...}, ...]}.')
+    limit = current_app.config['API_BULK_TRANSACTIONS_MAX']
+    if len(entries) > limit:
+        abort(413, f'At most {limit} transactions per call.')
+    try:
+        result = submit_group_transactions(group, current_user.id, validate_entries(entries),
+                                           approve=member.role == 'admin')
+    except InvalidEntries as e:
+        return jsonify(error='Invalid transactions; nothing was saved.', status=422,
+                       entries={str(i): message for i, message in e.errors.items()}), 422
+    return jsonify(created=result.created, duplicates=result.duplicates, balance_delta=result.balance_delta,
+                   balance=result.balance, transactions=result.entries), 201 if result.created else 200
+
+
+def _match(adapter, path: str):
+    """(endpoint, resource, args, view_args) for a sub-request path, or the HTTPException it fails with."""
+    parts = urlsplit(path)
+    try:
+        endpoint, view_args = adapter.match(parts.path, method='GET')
+    except HTTPException as e:
+        return e
+    resource = BATCH_RESOURCES.get(endpoint)
+    if resource is None:
+        return NotFound()
+    return endpoint, resource, MultiDict(parse_qsl(parts.query)), view_args
+
+
+@bp.route("/batch", methods=['POST'])
+@api_login_required
+def batch():
+    payload = request.get_json(silent=True)
+    subrequests = payload.get('requests') if isinstance(payload, dict) else None
+    if not isinstance(subrequests, list) or not all(
+            isinstance(r, dict) and isinstance(r.get('path'), str) for r in subrequests):
+        abort(400, 'Expected {"requests": [{"id": ..., "path": "/api/v1/..."}, ...]}.')
+    limit = current_app.config['API_BATCH_MAX_REQUESTS']
+    if len(subrequests) > limit:
+        abort(413, f'At most {limit} requests per batch.')
+
+    adapter = current_app.url_map.bind(request.host)
+    matched = [_match(adapter, r['path']) for r in subrequests]
+    ctx = ApiContext(current_user)
+    group_ids = [m[3]['group_id'] for m in matched if not isinstance(m, HTTPException) and 'group_id' in m[3]]
+    if group_ids:
+        # One membership query answers the access checks of every group sub-request.
+        ctx.prefetch_group_goals(gid for gid in group_ids if gid in ctx.memberships())
+
+    responses = []
+    for subrequest, match in zip(subrequests, matched):
+        try:
+            if isinstance(match, HTTPException):
+                raise match
+            endpoint, resource, args, view_args = match
+            limiter.check(endpoint)
+            status, body = 200, resource(ctx, args, **view_args)
+        except HTTPException as e:
+            status, body = e.code, _error_body(e)
+        responses.append({'id': subrequest.get('id'), 'status': status, 'body': body})
+    return jsonify(responses=responses)
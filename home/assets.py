@@ -0,0 +1,169 @@
+"""
+Fingerprinted, precompressed static files.
+
+At startup every file under static/ (profile pictures aside) is hashed and
+``url_for('static', filename=...)`` gains a ``v=<content hash>`` argument, so
+the URL changes whenever the file does. Requests carrying the current hash are
+answered with ``Cache-Control: public, max-age=ASSET_MAX_AGE, immutable``;
+browsers then reuse the file without revalidating. Anything else (old hash,
+no hash) gets Flask's normal short-lived caching.
+
+Compressible files (CSS, JS, SVG, ...) get .gz and, when the optional
+``brotli`` package is installed, .br siblings written to ASSET_CACHE_DIR. They
+are served with the matching Content-Encoding to clients that accept it.
+
+Profile pictures are fingerprinted on first use. Content-addressed ones
+(see home.pictures) are immutable by name and need no hash.
+
+No build step: the manifest is rebuilt on every start, and in debug mode a
+file is re-hashed when its mtime changes.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from flask import current_app, request, send_file, send_from_directory
+from werkzeug.security import safe_join
+
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+COMPRESSIBLE = {'.css', '.js', '.mjs', '.svg', '.txt', '.json', '.map', '.html', '.xml', '.ico'}
+MIN_COMPRESS_BYTES = 512
+CONTENT_KEYED_PICTURE = re.compile(r'^profile_pics/[0-9a-f]{20}-\d+\.(webp|png)$')
+
+
+@dataclass
+class Asset:
+    digest: str
+    mtime: float
+    gzip_path: Optional[str] = None
+    brotli_path: Optional[str] = None
+
+
+_manifest: Dict[str, Asset] = {}
+_lock = threading.Lock()
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def _write_sibling(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_asset(filename: str) -> Optional[Asset]:
+    path = safe_join(current_app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    asset = Asset(digest=_file_digest(path), mtime=os.path.getmtime(path))
+    if os.path.splitext(filename)[1].lower() in COMPRESSIBLE and os.path.getsize(path) >= MIN_COMPRESS_BYTES:
+        with open(path, 'rb') as f:
+            data = f.read()
+        base = os.path.join(current_app.config['ASSET_CACHE_DIR'], asset.digest, filename)
+        asset.gzip_path = f"{base}.gz"
+        if not os.path.exists(asset.gzip_path):
+            _write_sibling(asset.gzip_path, gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            asset.brotli_path = f"{base}.br"
+            if not os.path.exists(asset.brotli_path):
+                _write_sibling(asset.brotli_path, brotli.compress(data, quality=11))
+    return asset
+
+
+def build_manifest() -> Dict[str, Asset]:
+    """Hash (and precompress) everything in static/ except profile pictures."""
+    manifest: Dict[str, Asset] = {}
+    for root, dirs, files in os.walk(current_app.static_folder):
+        rel_root = os.path.relpath(root, current_app.static_folder)
+        if rel_root.split(os.sep)[0] == 'profile_pics':
+            continue
+        for name in files:
+            filename = name if rel_root == '.' else f"{rel_root.replace(os.sep, '/')}/{name}"
+            asset = build_asset(filename)
+            if asset is not None:
+                manifest[filename] = asset
+    return manifest
+
+
+def lookup(filename: str) -> Optional[Asset]:
+    asset = _manifest.get(filename)
+    if asset is not None and current_app.debug:
+        path = safe_join(current_app.static_folder, filename)
+        if path is None or not os.path.isfile(path) or os.path.getmtime(path) != asset.mtime:
+            asset = None
+    if asset is None and (filename.startswith('profile_pics/') or current_app.debug):
+        # Pictures never change under the same name, so hashing them once is enough.
+        asset = build_asset(filename)
+        if asset is not None:
+            with _lock:
+                _manifest[filename] = asset
+    return asset
+
+
+def _fingerprint_static(endpoint, values):
+    if endpoint != 'static' or not current_app.config['ASSET_FINGERPRINT'] or 'v' in values:
+        return
+    filename = values.get('filename')
+    if not filename or CONTENT_KEYED_PICTURE.match(filename):
+        return
+    asset = lookup(filename)
+    if asset is not None:
+        values['v'] = asset.digest
+
+
+def _immutable(filename: str, asset: Optional[Asset]) -> bool:
+    if CONTENT_KEYED_PICTURE.match(filename):
+        return True
+    return asset is not None and request.args.get('v') == asset.digest
+
+
+def serve_static(filename):
+    asset = lookup(filename) if current_app.config['ASSET_FINGERPRINT'] else None
+    immutable = _immutable(filename, asset)
+    max_age = current_app.config['ASSET_MAX_AGE'] if immutable else None
+
+    response = None
+    if asset is not None and asset.gzip_path:
+        for encoding, path in (('br', asset.brotli_path), ('gzip', asset.gzip_path)):
+            if path and request.accept_encodings[encoding] and os.path.exists(path):
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response = send_file(path, mimetype=mimetype, max_age=max_age, etag=f"{asset.digest}-{encoding}")
+                response.headers['Content-Encoding'] = encoding
+                break
+    if response is None:
+        response = send_from_directory(current_app.static_folder, filename, max_age=max_age)
+    if asset is not None and asset.gzip_path:
+        response.vary.add('Accept-Encoding')
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    """Hash static/ now (once in a preloading master) and take over the static endpoint."""
+    with app.app_context():
+        _manifest.update(build_manifest())
+    app.url_defaults(_fingerprint_static)
+    app.view_functions['static'] = serve_static
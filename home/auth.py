@@ -0,0 +1,100 @@
+from flask import Blueprint, render_template, url_for, flash, redirect, request
+from home import db
+from home.mailer import enqueue_email
+from home.passwords import hash_password, check_password, needs_rehash
+from home.db_models import User
+from home.forms import RegistrationForm, LoginForm, RequestResetForm, ResetPasswordForm, ChangePasswordForm
+import os
+from flask_login import login_user, current_user, logout_user, login_required
+
+bp = Blueprint('auth', __name__)
+
+@bp.route("/register", methods=['GET', 'POST'])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('main.home'))
+    form = RegistrationForm()
+    if form.validate_on_submit():
+        hashed_password = hash_password(form.password.data)
+        user = User(username=form.username.data, email=form.email.data, password=hashed_password)
+        db.session.add(user)
+        db.session.commit()
+        flash('Your account has been created! You are now able to log in!', 'success')
+        return redirect(url_for('auth.login'))
+    return render_template("register.html", title="Register", form=form)
+
+@bp.route("/login", methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('main.home'))
+    form = LoginForm()
+    if form.validate_on_submit():
+        user = User.query.filter_by(email=form.email.data).first()
+        if user and check_password(user.password, form.password.data):
+            if needs_rehash(user.password):
+                user.password = hash_password(form.password.data)
+                db.session.commit()
+            login_user(user, remember=form.remember.data)
+            next_page = request.args.get('next')
+            flash('Login Successful','success')
+            return redirect(next_page) if next_page else redirect(url_for('main.home'))
+        else:
+            flash('Login Unsuccessful. Please check email and password', 'danger')
+    return render_template("login.html", title="Login", form=form)
+
+@bp.route("/logout")
+def logout():
+    logout_user()
+    return redirect(url_for('main.home'))
+
+@bp.route("/change_password", methods=['GET', 'POST'])
+@login_required
+def change_password():
+    form = ChangePasswordForm()
+    if form.validate_on_submit():
+        if not check_password(current_user.password, form.current_password.data):
+            flash('Current password is incorrect', 'danger')
+            return redirect(url_for('auth.change_password'))
+        new_hashed = hash_password(form.new_password.data)
+        current_user.password = new_hashed
+        db.session.commit()
+        flash('Your password has been changed', 'success')
+        return redirect(url_for('personal.account'))
+    return render_template('change_password.html', title='Change Password', form=form)
+
+def send_reset_email(user):
+    token = user.get_reset_token()
+    body = f'''To reset your password, visit the following link:
+    {url_for('auth.reset_token', token=token, _external=True)}
+    If you did not make this request then simply ignore this email and no changes will be made.
+    '''
+    enqueue_email('Password Reset Request', [user.email], body, sender=os.environ.get('EMAIL_USER'))
+
+@bp.route("/reset_password", methods=['GET', 'POST'])
+def reset_request():
+    if current_user.is_authenticated:
+        return redirect(url_for('main.home'))
+    form = RequestResetForm()
+    if form.validate_on_submit():
+        user = User.query.filter_by(email=form.email.data).first()
+        send_reset_email(user)
+        flash('An email has been sent with instructions to reset your password.', 'info')
+        return redirect(url_for('auth.login'))
+    return render_template('reset_request.html', title='Reset Password', form=form)
+
+@bp.route("/reset_password/<token>", methods=['GET', 'POST'])
+def reset_token(token):
+    if current_user.is_authenticated:
+        return redirect(url_for('main.home'))
+    user = User.verify_reset_token(token)
+    if user is None:
+        flash('That is an invalid or expired token', 'warning')
+        return redirect(url_for('auth.reset_request')) 
+    form = ResetPasswordForm()
+    if form.validate_on_submit():
+        hashed_password = hash_password(form.password.data)
+        user.password = hashed_password
+        db.session.commit()
+        flash('Your password has been updated! You are now able to log in', 'success')
+        return redirect(url_for('auth.login'))
+    return render_template('reset_token.html', title='Reset Password', form=form)
@@ -0,0 +1,99 @@
+"""
+Small in-process caches shared by the app's hot paths.
+
+Caches keyed by row ids belong to one application: several apps on different
+databases can live in one process (tests, CLI tasks), so modules declare them
+with ``per_app`` instead of as plain module globals.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after ``ttl`` seconds.
+
+    Lives in one worker process; every gunicorn worker has its own copy, so
+    entries must be safe to serve for up to ``ttl`` seconds after another
+    worker changed the underlying row.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, maxsize: int, ttl: float) -> None:
+        """Apply an app's size and TTL settings; entries already stored keep their expiry."""
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            while len(self._data) > max(maxsize, 0):
+                self._data.popitem(last=False)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING or item[0] < self._clock():
+                if item is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        expires = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def per_app(name: str, factory: Callable[[Any], Any]) -> Any:
+    """
+    A proxy to the current app's ``app.extensions[name]``, built by
+    ``factory(app)`` on first use. Needs an app context; code that outlives it
+    (a streamed response) must keep the object itself.
+    """
+    def lookup():
+        app = current_app._get_current_object()
+        obj = app.extensions.get(name)
+        if obj is None:
+            obj = app.extensions.setdefault(name, factory(app))
+        return obj
+    return LocalProxy(lookup)
@@ -0,0 +1,115 @@
+"""
+Savings rates and goal analytics as the views serve them.
+
+home.analysis computes rates and goal projections from a ledger; this module
+decides when to. A rate is keyed by its subject, the data version of what it
+was computed from (home.conditional) and the day, and looked up in the
+request, in ``latest_rates`` and in the cache shared by the host's workers
+(home.sharedcache), in that order. Otherwise concurrent callers share one
+computation (home.singleflight) and store its result. While the worker is
+overloaded (home.ratelimit) an older rate of the subject is served instead
+and the request is flagged with g.analytics_stale.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+from flask import current_app, g, has_app_context
+
+from home.analysis import analyse_goal, group_transactions_as_movements, rate_per_day, user_transactions_as_movements
+from home.cache import TTLCache, per_app
+from home.conditional import group_data_version, user_data_version
+from home.db_models import Goal, Group, GroupGoal, User
+from home.ratelimit import overloaded
+from home.sharedcache import MISSING, analytics_cache, database_identity
+from home.singleflight import single_flight
+
+# Last computed rate per subject: (key it was computed for, rate). Answers repeat
+# requests for an unchanged version, and stands in for a newer one under load.
+latest_rates = per_app('fundflow.latest_rates', lambda app: TTLCache(maxsize=8192, ttl=3600))
+
+
+def _versioned_rate(subject: tuple, version: tuple, movements) -> Optional[float]:
+    """
+    rate_per_day(movements()) for ``subject`` at data ``version`` and today's
+    date. Computations are shared across workers too when ANALYTICS_LOCK_DIR
+    is set.
+    """
+    key = (database_identity(),) + subject + (version, date.today().isoformat())
+    rates = g.setdefault('analytics_rates', {}) if has_app_context() else {}
+    if key in rates:
+        return rates[key]
+    latest = latest_rates.get(subject)
+    if latest is not None and latest[0] == key:
+        rate = latest[1]
+    else:
+        rate = analytics_cache.get(key, MISSING)
+        if rate is MISSING and latest is not None and overloaded():
+            rate = latest[1]
+            g.analytics_stale = True
+        else:
+            if rate is MISSING:
+                rate = single_flight(
+                    key, lambda: _compute_rate(key, movements),
+                    lock_dir=current_app.config.get('ANALYTICS_LOCK_DIR') or None,
+                    lock_timeout=current_app.config.get('ANALYTICS_LOCK_TIMEOUT', 10.0),
+                )
+            latest_rates.set(subject, (key, rate))
+    rates[key] = rate
+    return rate
+
+
+def _compute_rate(key: tuple, movements) -> Optional[float]:
+    rate = rate_per_day(movements())
+    analytics_cache.set(key, rate)
+    return rate
+
+
+def _goal_analytics(subject: tuple, version: tuple, goals: Iterable, balance: float, rate
+                    ) -> Dict[int, Dict[str, Optional[float]]]:
+    """
+    analyse_goal for each of ``goals`` at ``rate()``, kept in the shared cache.
+
+    The key covers the data version, the day, ``balance`` and the goals'
+    targets and deadlines; ``rate`` is only called on a miss. Results built
+    from a stale rate are not stored.
+    """
+    goals = list(goals)
+    key = (database_identity(),) + subject + (
+        version, date.today().isoformat(), float(balance or 0.0),
+        tuple((goal.id, float(goal.target_amount), str(goal.deadline)) for goal in goals))
+    pairs = analytics_cache.get(key, MISSING)
+    if pairs is MISSING:
+        current = rate()
+        pairs = [(goal.id, analyse_goal(goal, balance, current)) for goal in goals]
+        if not (has_app_context() and g.get('analytics_stale')):
+            analytics_cache.set(key, pairs)
+    return {goal_id: analytics for goal_id, analytics in pairs}
+
+
+def group_rate(group: Group) -> Optional[float]:
+    """Daily savings rate of the group's approved ledger (see _versioned_rate)."""
+    return _versioned_rate(('group_rate', group.id), group_data_version(group),
+                           lambda: group_transactions_as_movements(group.id, approved_only=True))
+
+
+def user_rate(user: User) -> Optional[float]:
+    """Daily savings rate of the user's ledger (see _versioned_rate)."""
+    return _versioned_rate(('user_rate', user.id), user_data_version(user),
+                           lambda: user_transactions_as_movements(user))
+
+
+def group_goal_analytics(group: Group, goals: Iterable[GroupGoal], group_balance: float
+                         ) -> Dict[int, Dict[str, Optional[float]]]:
+    """analyse_goal for each of the group's ``goals`` at its current rate (see _goal_analytics)."""
+    return _goal_analytics(('group_goals', group.id), group_data_version(group), goals, group_balance,
+                           lambda: group_rate(group))
+
+
+def user_goal_analytics(user: User, goals: Iterable[Goal], current_savings: float
+                        ) -> Dict[int, Dict[str, Optional[float]]]:
+    """analyse_goal for each of the user's ``goals`` at their current rate (see _goal_analytics)."""
+    return _goal_analytics(('user_goals', user.id), user_data_version(user), goals, current_savings,
+                           lambda: user_rate(user))
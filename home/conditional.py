@@ -0,0 +1,128 @@
+"""
+Conditional GET for the analytics pages.
+
+``@conditional_page(version)`` computes a cheap data version for the page
+before the view runs. The version is built from row counts, max ids and max
+updated_at/approved_at of the tables the page reads, all in one SELECT, plus
+the already loaded user/group/member rows. It is sent as a weak ETag, and a
+matching If-None-Match is answered with 304 before any analysis or template
+rendering happens.
+
+Besides the data, the tag covers everything else the HTML depends on: the
+endpoint and query string, today's date (ETAs and days-left are relative to
+it), the theme and CSRF secret in the session, and the CSRF token lifetime
+(a 304 must not revive a page whose form tokens have expired). Responses that
+carry flashed messages get no ETag and are never answered with 304, so a flash
+is neither lost nor replayed. Neither do pages built from stale analytics
+(served under load, see home.ratelimit).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from datetime import date
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from flask.globals import request_ctx
+from flask_login import current_user
+from sqlalchemy import func, select
+
+from home import db
+from home.db_models import (Goal, GroupGoal, GroupJoinRequest, GroupMember, GroupTransaction, SavingChanges,
+                            SavingChangesRollup, user_columns)
+
+
+def _columns(obj) -> tuple:
+    return tuple(getattr(obj, c.key) for c in obj.__table__.columns)
+
+
+def _aggregates(*tables) -> tuple:
+    """(count, max id, max changed_at) per (model, changed_at column or None, filter...) in one round trip."""
+    columns = []
+    for model, changed_at, *filters in tables:
+        columns.append(select(func.count(model.id)).where(*filters).scalar_subquery())
+        columns.append(select(func.max(model.id)).where(*filters).scalar_subquery())
+        if changed_at is not None:
+            columns.append(select(func.max(changed_at)).where(*filters).scalar_subquery())
+    return tuple(db.session.execute(select(*columns)).one())
+
+
+def user_page_version(**kwargs) -> tuple:
+    return (
+        tuple(sorted(user_columns(current_user).items())),
+        _aggregates(
+            (Goal, Goal.updated_at, Goal.user_id == current_user.id),
+            (SavingChanges, None, SavingChanges.user_id == current_user.id),
+        ),
+    )
+
+
+def user_data_version(user) -> tuple:
+    """Version of ``user``'s savings ledger and balance; computed once per request."""
+    versions = g.setdefault('user_data_versions', {})
+    if user.id not in versions:
+        versions[user.id] = (user.savings,) + _aggregates(
+            (SavingChanges, None, SavingChanges.user_id == user.id),
+            (SavingChangesRollup, None, SavingChangesRollup.user_id == user.id),
+        )
+    return versions[user.id]
+
+
+def group_data_version(group) -> tuple:
+    """Version of everything a group page shows about ``group``; computed once per request."""
+    versions = g.setdefault('group_data_versions', {})
+    if group.id not in versions:
+        group_id = group.id
+        versions[group_id] = (
+            _columns(group),
+            _aggregates(
+                (GroupMember, GroupMember.updated_at, GroupMember.group_id == group_id),
+                (GroupGoal, GroupGoal.updated_at, GroupGoal.group_id == group_id),
+                (GroupTransaction, GroupTransaction.approved_at, GroupTransaction.group_id == group_id),
+                (GroupJoinRequest, GroupJoinRequest.responded_at, GroupJoinRequest.group_id == group_id),
+            ),
+        )
+    return versions[group.id]
+
+
+def group_page_version(group, member, **kwargs) -> tuple:
+    return (
+        group_data_version(group),
+        _columns(member) if member is not None else None,
+    )
+
+
+def page_etag(version) -> str:
+    csrf_window = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600) or 3600
+    parts = (
+        request.endpoint, request.full_path, date.today().isoformat(),
+        int(time.time() // (csrf_window / 2)), session.get('csrf_token'), session.get('theme'),
+        version,
+    )
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def conditional_page(version):
+    """Answer GET/HEAD with 304 when ``version(**view_kwargs)`` is unchanged. Goes below access checks."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return f(*args, **kwargs)
+            etag = page_etag(version(**kwargs))
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200 or request_ctx.flashes or session.get('_flashes') \
+                        or g.get('analytics_stale'):
+                    # A stale page must not be revalidated as the current version.
+                    return response
+            response.set_etag(etag, weak=True)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return decorated
+    return decorator
@@ -0,0 +1,219 @@
+"""
+Database connection settings.
+
+The URI comes from DATABASE_URL. For SQLite every new connection is tuned with
+PRAGMAs so that gunicorn workers can share one file: WAL lets readers run
+alongside the single writer, busy_timeout makes writers queue for the lock
+instead of failing with "database is locked", and a larger page cache plus
+mmap keep hot pages out of the read() path. Other backends get a regular
+connection pool with pre-ping and recycling.
+
+All knobs are plain config keys (see DEFAULTS) and can be set from the
+environment with the same name.
+
+Read replica: when DATABASE_REPLICA_URL is set it becomes the "replica" bind
+and RoutingSession sends plain SELECTs issued while serving GET/HEAD requests
+to it. Everything else stays on the primary: writes, reads during non-GET
+requests, reads after the request has flushed anything, views marked with
+@use_primary, and for REPLICA_PIN_SECONDS after a request wrote, every request
+from that browser session (so the page a form redirects to shows the change).
+A second SQLite file kept current with ``python -m home.replica`` works as a
+replica for local testing.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import weakref
+from functools import wraps
+from typing import Dict, Mapping
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session as _FlaskSession
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+REPLICA_BIND = 'replica'
+
+DEFAULTS: Dict[str, object] = {
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+    'SQLITE_CACHE_SIZE': -65536,          # negative = KiB, i.e. 64 MiB per connection
+    'SQLITE_MMAP_SIZE': 268435456,        # 256 MiB
+    'DB_POOL_SIZE': 10,
+    'DB_MAX_OVERFLOW': 20,
+    'DB_POOL_RECYCLE': 1800,
+    'DB_POOL_TIMEOUT': 30,
+    'REPLICA_PIN_SECONDS': 10,
+}
+
+
+def load_database_config(environ: Mapping[str, str] = os.environ) -> Dict[str, object]:
+    """Database related config values, with environment overrides applied."""
+    config: Dict[str, object] = {'SQLALCHEMY_DATABASE_URI': environ.get('DATABASE_URL', 'sqlite:///site.db')}
+    if environ.get('DATABASE_REPLICA_URL'):
+        config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: environ['DATABASE_REPLICA_URL']}
+    for key, default in DEFAULTS.items():
+        raw = environ.get(key)
+        if raw is None:
+            config[key] = default
+        elif isinstance(default, int):
+            config[key] = int(raw)
+        else:
+            config[key] = raw
+    return config
+
+
+def is_sqlite(uri: str) -> bool:
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(uri: str, config: Mapping[str, object]) -> Dict[str, object]:
+    """SQLALCHEMY_ENGINE_OPTIONS suited to the backend behind ``uri``."""
+    if is_sqlite(uri):
+        database = make_url(uri).database
+        if not database or database == ':memory:':
+            # Flask-SQLAlchemy already pins in-memory databases to a single connection.
+            return {}
+        return {
+            # The sqlite3 module has its own lock wait; keep it in line with busy_timeout.
+            'connect_args': {'timeout': int(config['SQLITE_BUSY_TIMEOUT_MS']) / 1000.0,
+                             'check_same_thread': False},
+            'pool_size': int(config['DB_POOL_SIZE']),
+            'max_overflow': int(config['DB_MAX_OVERFLOW']),
+            'pool_timeout': int(config['DB_POOL_TIMEOUT']),
+        }
+    return {
+        'pool_size': int(config['DB_POOL_SIZE']),
+        'max_overflow': int(config['DB_MAX_OVERFLOW']),
+        'pool_recycle': int(config['DB_POOL_RECYCLE']),
+        'pool_timeout': int(config['DB_POOL_TIMEOUT']),
+        'pool_pre_ping': True,
+    }
+
+
+def sqlite_pragmas(config: Mapping[str, object]) -> Dict[str, object]:
+    pragmas: Dict[str, object] = {
+        'journal_mode': config['SQLITE_JOURNAL_MODE'],
+        'synchronous': config['SQLITE_SYNCHRONOUS'],
+        'busy_timeout': int(config['SQLITE_BUSY_TIMEOUT_MS']),
+        'cache_size': int(config['SQLITE_CACHE_SIZE']),
+        'mmap_size': int(config['SQLITE_MMAP_SIZE']),
+    }
+    return {k: v for k, v in pragmas.items() if v not in (None, '')}
+
+
+def apply_sqlite_pragmas(engine: Engine, config: Mapping[str, object]) -> None:
+    """Run the configured PRAGMAs on every new DBAPI connection of ``engine``."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(config)
+
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    event.listen(engine, 'connect', _on_connect)
+
+
+def configure_app(app) -> None:
+    """Copy database settings into ``app.config`` ahead of ``SQLAlchemy(app)``."""
+    for key, value in load_database_config().items():
+        app.config.setdefault(key, value)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config))
+
+
+class RoutingSession(_FlaskSession):
+    """
+    Session that sends read-only SELECTs to the replica bind when it is safe to.
+
+    Models with an explicit ``__bind_key__`` and explicit ``bind=`` arguments are
+    left to Flask-SQLAlchemy's normal lookup.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(mapper, clause):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, mapper, clause) -> bool:
+        if REPLICA_BIND not in self._db.engines or not has_request_context():
+            return False
+        if not g.get('db_read_only') or g.get('db_wrote') or self._flushing:
+            return False
+        if self.new or self.dirty or self.deleted:
+            return False
+        if mapper is not None and getattr(getattr(mapper, 'class_', mapper), '__bind_key__', None):
+            return False
+        return clause is None or bool(getattr(clause, 'is_select', False))
+
+
+def use_primary(f):
+    """Pin a view to the primary database, e.g. a GET that creates rows or must not lag."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.db_read_only = False
+        return f(*args, **kwargs)
+    return decorated
+
+
+def _mark_flush(sess, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+
+def _mark_statement(orm_execute_state):
+    # Bulk UPDATE/DELETE/INSERT through session.execute() bypass the flush.
+    if has_request_context() and not orm_execute_state.is_select:
+        g.db_wrote = True
+
+
+def init_replica_routing(app, db) -> None:
+    """Request hooks deciding, per request, whether reads may go to the replica."""
+
+    @app.before_request
+    def _route_reads():
+        pinned = session.get('_primary_until', 0) > time.time()
+        g.db_read_only = request.method in ('GET', 'HEAD') and not pinned
+
+    @app.after_request
+    def _pin_after_write(response):
+        if g.get('db_wrote') and app.config.get('REPLICA_PIN_SECONDS'):
+            session['_primary_until'] = time.time() + float(app.config['REPLICA_PIN_SECONDS'])
+        return response
+
+    # db.session is shared by every app created in this process; hook it once.
+    for name, listener in (('after_flush', _mark_flush), ('do_orm_execute', _mark_statement)):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
+
+
+# Engines of every app in this process. A worker forked from a preloading master
+# inherits their pools; the connections in them belong to the parent.
+_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def _forget_inherited_connections() -> None:
+    for engine in list(_engines):
+        # close=False: drop the parent's pooled connections without closing them,
+        # the parent (or a sibling) may still be using them.
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_inherited_connections)
+
+
+def configure_engines(app, db) -> None:
+    """Attach connect-time tuning to every engine Flask-SQLAlchemy created for ``app``."""
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine, app.config)
+            _engines.add(engine)
@@ -1,13 +1,77 @@
 from fsspec.registry import default
-from sqlalchemy import CheckConstraint
-from home import db, login_manager, app
+from sqlalchemy import CheckConstraint, event
+from sqlalchemy.orm import make_transient_to_detached
+from home import db, login_manager
+from home.cache import TTLCache, per_app
+from collections import namedtuple
 from datetime import datetime
+from flask import current_app, g, has_request_context, request, session
 from flask_login import UserMixin
 from itsdangerous import URLSafeTimedSerializer
 
+# Column values of recently loaded users, keyed by id. Each worker keeps its own
+# copy; USER_CACHE_TTL bounds how long another worker's change can go unseen by
+# read-only requests (writes always reload the row, see load_user).
+user_cache = per_app('fundflow.user_cache',
+                     lambda app: TTLCache(maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL']))
+
+
+def init_app(app):
+    # home.events maps these models to events, so it can only be imported once they exist.
+    from home.events import UserChanged, subscribe
+    subscribe(UserChanged, _invalidate_committed_user)
+
+Identity = namedtuple('Identity', ['id', 'username'])
+
+# Requests that may be answered from cached rows; anything else reloads them.
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    if has_request_context() and request.method not in SAFE_METHODS:
+        # Writes read-modify-write columns such as savings, so they must start
+        # from the current row, never from another worker's cached copy.
+        user = db.session.get(User, user_id, populate_existing=True)
+        if user is not None:
+            user_cache.set(user_id, user_columns(user))
+        return user
+    row = user_cache.get(user_id)
+    if row is not None:
+        # Rebuild the instance from cached columns and attach it without a SELECT;
+        # relationships still lazy-load and attribute changes flush as usual.
+        user = User(**row)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    user = db.session.get(User, user_id)
+    if user is not None:
+        user_cache.set(user_id, user_columns(user))
+    return user
+
+def user_columns(user) -> dict:
+    return {c.key: getattr(user, c.key) for c in User.__table__.columns}
+
+def invalidate_user(user_id) -> None:
+    user_cache.delete(int(user_id))
+
+def current_identity():
+    """
+    Id and username of the logged-in user without loading the full ORM row
+    when it is not already loaded. Returns None for anonymous requests.
+    """
+    if not has_request_context():
+        return None
+    loaded = g.get('_login_user')
+    if loaded is not None:
+        return Identity(loaded.id, loaded.username) if loaded.is_authenticated else None
+    user_id = session.get('_user_id')
+    if user_id is None:
+        return None
+    row = user_cache.get(int(user_id))
+    if row is not None:
+        return Identity(row['id'], row['username'])
+    found = db.session.query(User.id, User.username).filter_by(id=int(user_id)).first()
+    return Identity(*found) if found else None
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -28,12 +92,12 @@ class User(db.Model, UserMixin):
         return f"User('{self.username}','{self.email}','{self.image_file}')"
     
     def get_reset_token(self) -> str:
-        s = URLSafeTimedSerializer(app.config['SECRET_KEY'])
+        s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
         return s.dumps({'user_id': self.id})
     
     @staticmethod
     def verify_reset_token(token: str, max_age: int = 1800):
-        s = URLSafeTimedSerializer(app.config['SECRET_KEY'])
+        s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
         try:
             data = s.loads(token, max_age=max_age)
             user_id = data['user_id']
@@ -41,6 +105,16 @@ class User(db.Model, UserMixin):
             return None
         return User.query.get(user_id)
 
+@event.listens_for(db.session, 'after_flush')
+def _invalidate_changed_users(sess, flush_context):
+    for obj in list(sess.dirty) + list(sess.deleted):
+        if isinstance(obj, User):
+            invalidate_user(obj.id)
+
+def _invalidate_committed_user(change):
+    # A concurrent request may have re-cached the old row between flush and commit.
+    invalidate_user(change.user_id)
+
 class SavingChanges(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     amount = db.Column(db.Float, nullable=False)
@@ -49,9 +123,32 @@ class SavingChanges(db.Model):
     
     user = db.relationship('User', backref='saving_changes')
     
+    __table_args__ = (
+        db.Index('ix_saving_changes_user_date', 'user_id', 'date_time'),
+    )
+    
     def __repr__(self):
         return f"SavingChange('{self.user.username}', '${self.amount}')"
 
+class SavingChangesRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    month = db.Column(db.DateTime, nullable=False)
+    total_in = db.Column(db.Float, nullable=False, default=0.0)
+    total_out = db.Column(db.Float, nullable=False, default=0.0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'month', name='unique_saving_rollup_user_month'),
+    )
+    
+    @property
+    def amount(self):
+        return self.total_in - self.total_out
+    
+    def __repr__(self):
+        return f"SavingChangesRollup('{self.user_id}', '{self.month:%Y-%m}', '${self.amount}')"
+
 class Goal(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -63,9 +160,11 @@ class Goal(db.Model):
     category = db.Column(db.String(50), nullable=True, default='savings')
     status = db.Column(db.String(20), nullable=False, default='active')
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     __table_args__ = (
         CheckConstraint('target_amount > 0', name='check_target_amount_positive'),
+        db.Index('ix_goal_user_status_deadline', 'user_id', 'status', 'deadline'),
     )
     
 class UserPreference(db.Model):
@@ -75,6 +174,7 @@ class UserPreference(db.Model):
     notifications_enabled = db.Column(db.Boolean, nullable=False, default=True)
     email_notifications = db.Column(db.Boolean, nullable=False, default=True)
     default_currency = db.Column(db.String(10), nullable=False, default='USD')
+    last_digest_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -120,6 +220,7 @@ class GroupMember(db.Model):
     role = db.Column(db.String(20), nullable=False, default='member')  
     joined_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, nullable=False, default=True)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     __table_args__ = (
         db.UniqueConstraint('group_id', 'user_id', name='unique_group_user'),
@@ -145,12 +246,14 @@ class GroupGoal(db.Model):
     approved_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     approved_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     proposer = db.relationship('User', foreign_keys=[proposer_id], backref='proposed_goals')
     approved_by = db.relationship('User', foreign_keys=[approved_by_id], backref='approved_goals')
     
     __table_args__ = (
         CheckConstraint('target_amount > 0', name='check_group_goal_amount_positive'),
+        db.Index('ix_group_goal_group_status_deadline', 'group_id', 'status', 'deadline'),
     )
     
     def __repr__(self):
@@ -166,12 +269,16 @@ class GroupTransaction(db.Model):
     status = db.Column(db.String(20), nullable=False, default='pending')  
     approved_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     approved_at = db.Column(db.DateTime, nullable=True)
+    idempotency_key = db.Column(db.String(64), nullable=True)
     
     user = db.relationship('User', foreign_keys=[user_id], backref='group_transactions')
     approved_by = db.relationship('User', foreign_keys=[approved_by_id], backref='approved_transactions')
     
     __table_args__ = (
         CheckConstraint('amount != 0', name='check_transaction_amount_non_zero'),
+        db.Index('ix_group_transaction_group_status_date', 'group_id', 'status', 'occurred_at'),
+        db.Index('ix_group_transaction_user_approved', 'user_id', 'approved_at'),
+        db.Index('uq_group_transaction_idempotency', 'group_id', 'user_id', 'idempotency_key', unique=True),
     )
     
     def __repr__(self):
@@ -193,6 +300,26 @@ class GroupTransaction(db.Model):
     def is_adjustment(self):
         return self.transaction_type == 'adjustment'
 
+class GroupTransactionRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
+    month = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    total_in = db.Column(db.Float, nullable=False, default=0.0)
+    total_out = db.Column(db.Float, nullable=False, default=0.0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('group_id', 'month', 'status', name='unique_group_rollup_month_status'),
+    )
+    
+    @property
+    def amount(self):
+        return self.total_in - self.total_out
+    
+    def __repr__(self):
+        return f"GroupTransactionRollup('{self.group_id}', '{self.month:%Y-%m}', '{self.status}', '${self.amount}')"
+
 class GroupJoinRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
@@ -208,6 +335,8 @@ class GroupJoinRequest(db.Model):
     
     __table_args__ = (
         db.UniqueConstraint('group_id', 'user_id', name='unique_pending_join_request'),
+        db.Index('ix_group_join_request_group_status', 'group_id', 'status'),
+        db.Index('ix_group_join_request_user_responded', 'user_id', 'responded_at'),
     )
     
     def __repr__(self):
@@ -228,4 +357,26 @@ class GroupPreference(db.Model):
     group = db.relationship('Group', backref='preferences')
     
     def __repr__(self):
-        return f"GroupPreference('{self.group.name}', 'open:{self.is_open}')"
\ No newline at end of file
+        return f"GroupPreference('{self.group.name}', 'open:{self.is_open}')"
+
+class EmailOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(200), nullable=False)
+    sender = db.Column(db.String(120), nullable=True)
+    recipients = db.Column(db.Text, nullable=False)  # comma separated
+    body = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    def __repr__(self):
+        return f"EmailOutbox('{self.subject}', '{self.recipients}', '{self.status}')"
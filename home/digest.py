@@ -0,0 +1,222 @@
+"""
+Per-user notification digests, sent by a scheduled job.
+
+Run from project root (e.g. from cron once a day):
+  python -m home.digest --dry-run          # count who would get a digest
+  python -m home.digest                    # queue digests in the email outbox
+  python -m home.digest --deliver          # ... and send them from this process
+
+A digest collects, since the user's last digest (UserPreference.last_digest_at,
+or DIGEST_INTERVAL_HOURS back for a first digest):
+  - items waiting in groups the user administers (pending transactions,
+    proposed goals, join requests), when any of them arrived since then,
+  - the user's group transactions that were approved or denied,
+  - the user's join requests that were approved or denied,
+  - personal and group goals whose deadline came within DIGEST_DEADLINE_DAYS.
+
+Users with email_notifications switched off are skipped; users without a
+preference row get digests (the column defaults to on) and get a row the first
+time. Users are walked in id order, DIGEST_BATCH_SIZE at a time; each batch
+costs a fixed handful of indexed IN (...) queries whatever the number of
+events, every user's digest is rendered once, and the batch's outbox rows and
+last_digest_at updates commit together, so a rerun after a crash neither skips
+nor repeats anyone. Delivery goes through home.mailer, which sends each outbox
+batch over one SMTP connection.
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from flask import current_app, render_template
+from sqlalchemy import func, or_
+
+from home import create_app, db
+from home.db_models import (User, UserPreference, Goal, Group, GroupMember, GroupGoal, GroupTransaction,
+                            GroupJoinRequest)
+from home.mailer import deliver_pending, enqueue_email
+
+
+def _recipients(last_id: int, batch_size: int):
+    return db.session.query(User.id, User.username, User.email, UserPreference).outerjoin(
+        UserPreference, UserPreference.user_id == User.id
+    ).filter(
+        User.id > last_id,
+        or_(UserPreference.id.is_(None), UserPreference.email_notifications == True),
+    ).order_by(User.id).limit(batch_size).all()
+
+
+def _pending_by_group(group_ids, cache: Dict[int, Dict[str, int]]) -> None:
+    """Fill ``cache`` with waiting-item counts for groups not seen in an earlier batch."""
+    missing = [gid for gid in group_ids if gid not in cache]
+    if not missing:
+        return
+    for gid in missing:
+        cache[gid] = {'transactions': 0, 'goals': 0, 'join_requests': 0, 'latest': None}
+    for key, model, status, created in (('transactions', GroupTransaction, 'pending', GroupTransaction.occurred_at),
+                                         ('goals', GroupGoal, 'proposed', GroupGoal.created_at),
+                                         ('join_requests', GroupJoinRequest, 'pending', GroupJoinRequest.requested_at)):
+        rows = db.session.query(model.group_id, func.count(model.id), func.max(created)).filter(
+            model.group_id.in_(missing), model.status == status
+        ).group_by(model.group_id).all()
+        for gid, count, latest in rows:
+            cache[gid][key] = count
+            if latest is not None and (cache[gid]['latest'] is None or latest > cache[gid]['latest']):
+                cache[gid]['latest'] = latest
+
+
+def collect_digests(users, since: Dict[int, datetime], now: datetime, deadline_days: int,
+                    group_names: Dict[int, str], pending_cache: Dict[int, Dict[str, int]]) -> Dict[int, dict]:
+    """Digest contents for a batch of users, keyed by user id. Users with nothing to report are left out."""
+    user_ids = [u.id for u in users]
+    earliest = min(since.values())
+    horizon = timedelta(days=deadline_days)
+    items: Dict[int, dict] = defaultdict(lambda: {'pending': [], 'transactions': [], 'join_requests': [], 'deadlines': []})
+
+    memberships = db.session.query(GroupMember.user_id, GroupMember.group_id, GroupMember.role).filter(
+        GroupMember.user_id.in_(user_ids), GroupMember.is_active == True
+    ).all()
+    groups_of: Dict[int, List[int]] = defaultdict(list)
+    admin_of: Dict[int, List[int]] = defaultdict(list)
+    for uid, gid, role in memberships:
+        groups_of[uid].append(gid)
+        if role == 'admin':
+            admin_of[uid].append(gid)
+    all_groups = {gid for gids in groups_of.values() for gid in gids}
+    unnamed = [gid for gid in all_groups if gid not in group_names]
+    if unnamed:
+        group_names.update(db.session.query(Group.id, Group.name).filter(Group.id.in_(unnamed)).all())
+
+    _pending_by_group({gid for gids in admin_of.values() for gid in gids}, pending_cache)
+    for uid, gids in admin_of.items():
+        for gid in gids:
+            # Only remind about a group's queue when something joined it since the last digest.
+            counts = dict(pending_cache[gid])
+            latest = counts.pop('latest')
+            if latest is not None and latest > since[uid]:
+                items[uid]['pending'].append({'group_id': gid, 'group': group_names.get(gid), **counts})
+
+    decided = db.session.query(GroupTransaction.user_id, GroupTransaction.group_id, GroupTransaction.amount,
+                               GroupTransaction.description, GroupTransaction.status,
+                               GroupTransaction.approved_at).filter(
+        GroupTransaction.user_id.in_(user_ids),
+        GroupTransaction.approved_at > earliest,
+        GroupTransaction.approved_at <= now,
+        GroupTransaction.status.in_(('approved', 'denied')),
+    ).order_by(GroupTransaction.approved_at).all()
+    answered = db.session.query(GroupJoinRequest.user_id, GroupJoinRequest.group_id, GroupJoinRequest.status,
+                                GroupJoinRequest.responded_at).filter(
+        GroupJoinRequest.user_id.in_(user_ids),
+        GroupJoinRequest.responded_at > earliest,
+        GroupJoinRequest.responded_at <= now,
+        GroupJoinRequest.status.in_(('approved', 'denied')),
+    ).all()
+    missing_names = {r.group_id for r in list(decided) + list(answered)} - group_names.keys()
+    if missing_names:
+        group_names.update(db.session.query(Group.id, Group.name).filter(Group.id.in_(missing_names)).all())
+    for t in decided:
+        if t.approved_at > since[t.user_id]:
+            items[t.user_id]['transactions'].append({'group': group_names.get(t.group_id), 'amount': t.amount,
+                                                     'description': t.description, 'status': t.status})
+    for r in answered:
+        if r.responded_at > since[r.user_id]:
+            items[r.user_id]['join_requests'].append({'group': group_names.get(r.group_id), 'status': r.status})
+
+    # A deadline is reported once: in the digest covering the moment it came within the horizon.
+    goals = db.session.query(Goal.user_id, Goal.id, Goal.title, Goal.deadline).filter(
+        Goal.user_id.in_(user_ids), Goal.status == 'active',
+        Goal.deadline > earliest + horizon, Goal.deadline <= now + horizon,
+    ).all()
+    for goal in goals:
+        if goal.deadline > since[goal.user_id] + horizon:
+            items[goal.user_id]['deadlines'].append({'title': goal.title, 'deadline': goal.deadline, 'group': None})
+
+    if all_groups:
+        group_goals = db.session.query(GroupGoal.group_id, GroupGoal.id, GroupGoal.title, GroupGoal.deadline).filter(
+            GroupGoal.group_id.in_(all_groups), GroupGoal.status == 'approved',
+            GroupGoal.deadline > earliest + horizon, GroupGoal.deadline <= now + horizon,
+        ).all()
+        by_group = defaultdict(list)
+        for goal in group_goals:
+            by_group[goal.group_id].append(goal)
+        for uid, gids in groups_of.items():
+            for gid in gids:
+                for goal in by_group.get(gid, ()):
+                    if goal.deadline > since[uid] + horizon:
+                        items[uid]['deadlines'].append({'title': goal.title, 'deadline': goal.deadline,
+                                                        'group': group_names.get(gid)})
+
+    return {uid: digest for uid, digest in items.items() if any(digest.values())}
+
+
+def send_digests(now: Optional[datetime] = None, batch_size: Optional[int] = None, dry_run: bool = False,
+                 deliver: bool = False, progress=print) -> int:
+    """Queue one digest per user with something to report. Returns the number queued. Needs an app context."""
+    now = now or datetime.utcnow()
+    app = current_app._get_current_object()
+    batch_size = batch_size or app.config['DIGEST_BATCH_SIZE']
+    default_since = now - timedelta(hours=app.config['DIGEST_INTERVAL_HOURS'])
+    deadline_days = app.config['DIGEST_DEADLINE_DAYS']
+    group_names: Dict[int, str] = {}
+    pending_cache: Dict[int, Dict[str, int]] = {}
+    queued = scanned = 0
+    last_id = 0
+
+    with app.test_request_context(base_url=app.config['APP_BASE_URL']):
+        while True:
+            users = _recipients(last_id, batch_size)
+            if not users:
+                break
+            last_id = users[-1].id
+            since = {u.id: (u.UserPreference.last_digest_at if u.UserPreference is not None
+                            and u.UserPreference.last_digest_at else default_since) for u in users}
+            digests = collect_digests(users, since, now, deadline_days, group_names, pending_cache)
+            scanned += len(users)
+            if dry_run:
+                queued += len(digests)
+                continue
+
+            try:
+                for u in users:
+                    digest = digests.get(u.id)
+                    if digest is not None:
+                        body = render_template('email/digest.txt', user=u, since=since[u.id], now=now, **digest)
+                        enqueue_email('Your FundFlow digest', [u.email], body, commit=False)
+                    preference = u.UserPreference
+                    if preference is None:
+                        preference = UserPreference(user_id=u.id)
+                        db.session.add(preference)
+                    preference.last_digest_at = now
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            queued += len(digests)
+            progress(f"Scanned {scanned} users, queued {queued} digests (up to user {last_id})")
+
+            if deliver:
+                while any(deliver_pending()):
+                    pass
+    return queued
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description='Queue notification digests for users with email notifications on')
+    parser.add_argument('--batch-size', type=int, default=None, help='Users per batch (default: DIGEST_BATCH_SIZE)')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the digests that would be sent')
+    parser.add_argument('--deliver', action='store_true',
+                        help='Send queued mail from this process instead of leaving it to the outbox worker')
+    args = parser.parse_args(argv)
+
+    # This process exits when it is done; leave delivery to --deliver or the outbox worker.
+    app = create_app({'MAIL_OUTBOX_WORKER': False})
+    with app.app_context():
+        queued = send_digests(batch_size=args.batch_size, dry_run=args.dry_run, deliver=args.deliver)
+    print(("Would send" if args.dry_run else "Queued") + f" {queued} digests")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+Commit-time change events.
+
+Session hooks turn what a transaction wrote into typed events such as
+``GroupLedgerChanged(group_id=42)`` or ``UserGoalsChanged(user_id=7)`` and hand
+them to subscribers once the transaction has committed; a rollback discards
+them. Events raised inside a SAVEPOINT (``begin_nested()``) are kept apart:
+releasing it hands them to the enclosing transaction, rolling it back drops
+only them. Events are coalesced per commit: a commit touching 5000
+transactions of one group produces one ``GroupLedgerChanged`` for it.
+
+    from home import events
+
+    events.subscribe(events.GroupLedgerChanged, lambda e: cache.delete(e.group_id))
+    events.subscribe(events.Event, audit, background=True)   # every event
+
+Events are frozen dataclasses compared by their subject fields. Fields
+declared with ``field(compare=False)`` carry payload; when two events of the
+same subject are coalesced, tuple payloads are concatenated.
+
+Events come from the ORM flush (see ``_model_events``) and from collectors
+registered with ``collector()``, which see the session in after_flush. Code
+that writes through Core statements, which the flush never sees, reports its
+changes with ``emit(session, event)``.
+
+Synchronous subscribers run in after_commit, in the committing thread, in the
+order events were first raised; an exception is logged and does not affect
+other subscribers or the caller, since the data is already committed.
+Background subscribers run on one daemon thread per process, inside an app
+context when the commit happened in one.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+from dataclasses import dataclass, fields, replace
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session
+
+from home import db
+from home.db_models import (EmailOutbox, Goal, Group, GroupGoal, GroupJoinRequest, GroupMember, GroupTransaction,
+                            GroupTransactionRollup, SavingChanges, SavingChangesRollup, User, UserPreference)
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Event:
+    def merge(self, other: 'Event') -> 'Event':
+        """Coalesce ``other`` (same type and subject) into this event."""
+        payload = {f.name: getattr(self, f.name) + getattr(other, f.name)
+                   for f in fields(self) if not f.compare and isinstance(getattr(self, f.name), tuple)}
+        return replace(self, **payload) if payload else self
+
+
+@dataclass(frozen=True)
+class UserChanged(Event):
+    user_id: int
+
+
+@dataclass(frozen=True)
+class UserGoalsChanged(Event):
+    user_id: int
+
+
+@dataclass(frozen=True)
+class UserSavingsChanged(Event):
+    """The user's savings ledger (or its rollups) changed."""
+    user_id: int
+
+
+@dataclass(frozen=True)
+class UserPreferencesChanged(Event):
+    user_id: int
+
+
+@dataclass(frozen=True)
+class GroupChanged(Event):
+    """The group row itself (name, settings, balance) changed."""
+    group_id: int
+
+
+@dataclass(frozen=True)
+class GroupLedgerChanged(Event):
+    """Transactions of the group (or their rollups) were added, changed or removed."""
+    group_id: int
+
+
+@dataclass(frozen=True)
+class GroupGoalsChanged(Event):
+    group_id: int
+
+
+@dataclass(frozen=True)
+class GroupJoinRequestsChanged(Event):
+    group_id: int
+
+
+@dataclass(frozen=True)
+class MembershipChanged(Event):
+    group_id: int
+    user_id: int
+
+
+@dataclass(frozen=True)
+class OutboxEnqueued(Event):
+    pass
+
+
+def _model_events(obj) -> Iterable[Event]:
+    if isinstance(obj, User):
+        yield UserChanged(obj.id)
+    elif isinstance(obj, Goal):
+        yield UserGoalsChanged(obj.user_id)
+    elif isinstance(obj, (SavingChanges, SavingChangesRollup)):
+        yield UserSavingsChanged(obj.user_id)
+    elif isinstance(obj, UserPreference):
+        yield UserPreferencesChanged(obj.user_id)
+    elif isinstance(obj, Group):
+        yield GroupChanged(obj.id)
+    elif isinstance(obj, GroupMember):
+        yield MembershipChanged(obj.group_id, obj.user_id)
+    elif isinstance(obj, GroupGoal):
+        yield GroupGoalsChanged(obj.group_id)
+    elif isinstance(obj, (GroupTransaction, GroupTransactionRollup)):
+        yield GroupLedgerChanged(obj.group_id)
+    elif isinstance(obj, GroupJoinRequest):
+        yield GroupJoinRequestsChanged(obj.group_id)
+    elif isinstance(obj, EmailOutbox):
+        yield OutboxEnqueued()
+
+
+def _flushed_model_events(sess) -> Iterable[Event]:
+    for obj in sess.new:
+        yield from _model_events(obj)
+    for obj in sess.dirty:
+        if sess.is_modified(obj, include_collections=False):
+            yield from _model_events(obj)
+    for obj in sess.deleted:
+        yield from _model_events(obj)
+
+
+Handler = Callable[[Event], None]
+
+_subscribers: List[Tuple[Type[Event], Handler, bool]] = []
+_collectors: List[Callable[..., Iterable[Event]]] = [_flushed_model_events]
+_background: "queue.Queue[Tuple[object, List[Event]]]" = queue.Queue()
+_worker_lock = threading.Lock()
+_worker: Optional[threading.Thread] = None
+_worker_pid: Optional[int] = None
+
+
+def subscribe(event_type: Type[Event], handler: Handler, background: bool = False) -> None:
+    """Call ``handler(event)`` for every committed event that is an instance of ``event_type``."""
+    if (event_type, handler, background) not in _subscribers:
+        _subscribers.append((event_type, handler, background))
+
+
+def collector(fn: Callable[..., Iterable[Event]]) -> Callable[..., Iterable[Event]]:
+    """Register ``fn(session)``, called in after_flush, for events derived from the flushed objects."""
+    _collectors.append(fn)
+    return fn
+
+
+def _current(sess):
+    """The innermost SAVEPOINT of ``sess``, or its outermost transaction."""
+    return sess.get_nested_transaction() or sess.get_transaction()
+
+
+def _enclosing(transaction):
+    """The SAVEPOINT or outermost transaction ``transaction`` is released into."""
+    parent = transaction.parent
+    while not parent.nested and parent.parent is not None:
+        parent = parent.parent
+    return parent
+
+
+def _merge(pending: Dict[Event, Event], raised: Iterable[Event]) -> None:
+    for item in raised:
+        existing = pending.get(item)
+        pending[item] = item if existing is None else existing.merge(item)
+
+
+def emit(sess, *raised: Event) -> None:
+    """Record events for ``sess``'s current transaction; they are delivered if it commits."""
+    if isinstance(sess, scoped_session):
+        sess = sess()
+    by_transaction = sess.info.setdefault('change_events', {})
+    _merge(by_transaction.setdefault(_current(sess), {}), raised)
+
+
+def _dispatch(events: List[Event], background: bool) -> None:
+    for item in events:
+        for event_type, handler, in_background in list(_subscribers):
+            if in_background == background and isinstance(item, event_type):
+                try:
+                    handler(item)
+                except Exception:
+                    log.exception('Change event subscriber %r failed on %r', handler, item)
+
+
+def _run_background() -> None:
+    while True:
+        app, events = _background.get()
+        try:
+            if app is not None:
+                with app.app_context():
+                    _dispatch(events, background=True)
+            else:
+                _dispatch(events, background=True)
+        finally:
+            _background.task_done()
+
+
+def _start_worker() -> None:
+    """Start the background delivery thread once per process (again after a fork)."""
+    global _worker, _worker_pid
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive() and _worker_pid == os.getpid():
+            return
+        _worker = threading.Thread(target=_run_background, name='change-events', daemon=True)
+        _worker_pid = os.getpid()
+        _worker.start()
+
+
+def publish(events: List[Event]) -> None:
+    """Deliver committed events: synchronous subscribers now, background ones on the worker thread."""
+    if not events:
+        return
+    _dispatch(events, background=False)
+    if any(in_background and isinstance(item, event_type)
+           for event_type, _, in_background in _subscribers for item in events):
+        _start_worker()
+        _background.put((current_app._get_current_object() if has_app_context() else None, events))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_change_events(sess, flush_context):
+    for fn in _collectors:
+        emit(sess, *fn(sess))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_change_events(sess):
+    # Also fires when a SAVEPOINT is released; its events wait for the enclosing transaction.
+    transaction = _current(sess)
+    by_transaction = sess.info.get('change_events', {})
+    pending = by_transaction.pop(transaction, {})
+    if transaction is not None and transaction.nested:
+        if pending:
+            _merge(by_transaction.setdefault(_enclosing(transaction), {}), pending.values())
+        return
+    # Events emitted before the transaction began belong to it too.
+    events = sess.info.pop('change_events', {}).get(None, {})
+    _merge(events, pending.values())
+    publish(list(events.values()))
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _forget_change_events(sess, transaction):
+    # Whatever a committed transaction had is gone by now; what is left was rolled back.
+    if transaction.parent is None:
+        sess.info.pop('change_events', None)
+    elif transaction.nested:
+        sess.info.get('change_events', {}).pop(transaction, None)
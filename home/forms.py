@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, BooleanField, TextAreaField, FloatField, DateField, SelectField, IntegerField
+from wtforms import StringField, PasswordField, SubmitField, BooleanField, TextAreaField, FloatField, DateField, SelectField, IntegerField, HiddenField
 from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, Optional, NumberRange
 from home.db_models import User
 from flask_wtf.file import FileField, FileAllowed
@@ -135,6 +135,7 @@ class UserPreferencesForm(FlaskForm):
         ('dark', 'Dark Mode')
     ], validators=[DataRequired()])
     notifications = BooleanField('Enable Notifications')
+    email_notifications = BooleanField('Email me a digest of group activity and upcoming deadlines')
     submit = SubmitField('Save Preferences')
 
 class CreateGroupForm(FlaskForm):
@@ -181,6 +182,8 @@ class GroupTransactionForm(FlaskForm):
         NumberRange(min=0.01, message='Amount must be greater than 0')
     ])
     description = TextAreaField('Description', validators=[DataRequired()])
+    # Set once per rendered form, so a resubmitted POST is recognised instead of saved twice.
+    idempotency_key = HiddenField(validators=[Optional(), Length(max=64)])
     submit = SubmitField('Submit Transaction')
 
 class GroupPreferencesForm(FlaskForm):
@@ -0,0 +1,91 @@
+"""
+Versioned fragment cache for the group pages.
+
+The expensive parts of group_detail.html and group_analytics.html (stat cards,
+recent goals with their analytics, transaction lists, monthly activity) are
+wrapped in
+
+    {% call cache_fragment('group_detail.goals', group) %} ... {% endcall %}
+
+and stored as rendered HTML in a bounded in-process TTLCache. The key is the
+fragment name, the group id, the group's data version (see
+home.conditional.group_data_version), today's date and any extra arguments;
+anything that differs between viewers, such as the member's role, must be
+passed as an extra argument. Data changes produce a new version, so entries
+are never invalidated explicitly; old ones fall out of the LRU.
+
+Views pass the fragment data as ``lazy(loader)`` so a cached fragment is
+served without running the queries or the analysis behind it. Sections that
+are personal to the viewer (pending approvals, join requests) stay outside
+the fragments and are rendered on every request.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Callable
+
+from flask import g
+from markupsafe import Markup
+
+from home.cache import TTLCache, per_app
+from home.conditional import group_data_version
+
+fragment_cache = per_app('fundflow.fragment_cache',
+                         lambda app: TTLCache(maxsize=app.config['FRAGMENT_CACHE_SIZE'],
+                                              ttl=app.config['FRAGMENT_CACHE_TTL']))
+
+_UNSET = object()
+
+
+class Lazy:
+    """Stands in for a template value; ``loader`` runs the first time the template looks at it."""
+
+    __slots__ = ('_loader', '_value')
+
+    def __init__(self, loader: Callable[[], Any]):
+        self._loader = loader
+        self._value = _UNSET
+
+    @property
+    def value(self) -> Any:
+        if self._value is _UNSET:
+            self._value = self._loader()
+        return self._value
+
+    def __getattr__(self, name):
+        return getattr(self.value, name)
+
+    def __getitem__(self, key):
+        return self.value[key]
+
+    def __contains__(self, item) -> bool:
+        return item in self.value
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    def __bool__(self) -> bool:
+        return bool(self.value)
+
+
+def lazy(loader: Callable[[], Any]) -> Lazy:
+    return Lazy(loader)
+
+
+def cache_fragment(name: str, group, *vary, caller) -> Markup:
+    """Render the call block once per (group, data version, day, vary) and reuse the HTML."""
+    key = (name, group.id, group_data_version(group), date.today().isoformat()) + vary
+    html = fragment_cache.get(key)
+    if html is None:
+        html = Markup(caller())
+        if not g.get('analytics_stale'):
+            fragment_cache.set(key, html)
+    return html
+
+
+def init_app(app):
+    app.add_template_global(cache_fragment)
@@ -0,0 +1,646 @@
+from flask import Blueprint, Response, current_app, render_template, url_for, flash, redirect, request, abort
+from home import db, live
+from home.conditional import conditional_page, group_page_version
+from home.database import use_primary
+from home.fragments import lazy
+from home.permissions import group_member_required
+from home.transactions import submit_group_transactions
+from home.db_models import Group, GroupMember, GroupGoal, GroupTransaction, GroupJoinRequest, GroupPreference
+from home.forms import CreateGroupForm, JoinGroupForm, GroupGoalForm, GroupTransactionForm, GroupPreferencesForm
+from home.analysis import estimate_eta, group_monthly_rollups
+from home.cached_analysis import group_goal_analytics, group_rate
+from flask_login import current_user, login_required
+from datetime import datetime
+import uuid
+
+bp = Blueprint('groups', __name__)
+
+@bp.route("/groups")
+@login_required
+def groups():
+    page = request.args.get('page', 1, type=int)
+    per_page = 6
+    
+    user_groups = Group.query.join(GroupMember).filter(
+        GroupMember.user_id == current_user.id,
+        GroupMember.is_active == True
+    ).paginate(page=page, per_page=per_page, error_out=False)
+    
+    admin_groups = Group.query.join(GroupMember).filter(
+        GroupMember.user_id == current_user.id,
+        GroupMember.role == 'admin',
+        GroupMember.is_active == True
+    ).all()
+    
+    return render_template("groups.html", title="My Groups", 
+                         user_groups=user_groups, admin_groups=admin_groups)
+
+@bp.route("/groups/create", methods=['GET', 'POST'])
+@login_required
+def create_group():
+    form = CreateGroupForm()
+    if form.validate_on_submit():
+        group = Group(
+            name=form.name.data,
+            description=form.description.data,
+            currency=form.currency.data,
+            is_open=form.is_open.data
+        )
+        db.session.add(group)
+        db.session.flush()
+        
+        admin_member = GroupMember(
+            group_id=group.id,
+            user_id=current_user.id,
+            role='admin'
+        )
+        db.session.add(admin_member)
+        db.session.commit()
+        
+        flash('Group created successfully!', 'success')
+        return redirect(url_for('groups.group_detail', group_id=group.id))
+    
+    return render_template("create_group.html", title="Create Group", form=form)
+
+@bp.route("/groups/join", methods=['GET', 'POST'])
+@login_required
+def join_group():
+    form = JoinGroupForm()
+    if form.validate_on_submit():
+        group = Group.query.filter_by(id=form.group_id.data, is_active=True).first()
+        
+        if not group:
+            flash('Group not found or inactive.', 'danger')
+            return redirect(url_for('groups.join_group'))
+        
+        if not group.is_open:
+            flash('This group is closed and not accepting any new members or rejoins.', 'danger')
+            return redirect(url_for('groups.join_group'))
+        
+        existing_member = GroupMember.query.filter_by(
+            group_id=group.id, 
+            user_id=current_user.id,
+            is_active=True
+        ).first()
+        
+        if existing_member:
+            flash('You are already an active member of this group.', 'info')
+            return redirect(url_for('groups.group_detail', group_id=group.id))
+        
+        existing_request = GroupJoinRequest.query.filter_by(
+            group_id=group.id,
+            user_id=current_user.id,
+            status='pending'
+        ).first()
+        
+        if existing_request:
+            flash('You already have a pending join request for this group.', 'info')
+            return redirect(url_for('groups.join_group'))
+        
+        join_request = GroupJoinRequest(
+            group_id=group.id,
+            user_id=current_user.id,
+            message=form.message.data if form.message.data else None
+        )
+        db.session.add(join_request)
+        db.session.commit()
+        
+        flash('Join request sent! Waiting for admin approval.', 'success')
+        
+        return redirect(url_for('groups.groups'))
+    
+    return render_template("join_group.html", title="Join Group", form=form)
+
+@bp.route("/groups/<int:group_id>")
+@login_required
+@group_member_required()
+@conditional_page(group_page_version)
+def group_detail(group_id, group, member):
+    # Goals and transactions feed cached fragments: only loaded when a fragment is rendered.
+    # Goal analytics are fetched by the page from api.group_analytics.
+    recent_goals = lazy(lambda: GroupGoal.query.filter_by(group_id=group_id, status='proposed').order_by(GroupGoal.created_at.desc()).limit(5).all())
+    
+    transactions = lazy(lambda: GroupTransaction.query.filter_by(group_id=group_id).order_by(GroupTransaction.occurred_at.desc()).limit(5).all())
+    
+    pending_goals = []
+    pending_transactions = []
+    if member.role == 'admin':
+        pending_goals = GroupGoal.query.filter_by(
+            group_id=group_id, 
+            status='proposed'
+        ).all()
+        pending_transactions = GroupTransaction.query.filter_by(
+            group_id=group_id, 
+            status='pending'
+        ).all()
+    
+    return render_template("group_detail.html", title=group.name, 
+                         group=group, member=member, recent_goals=recent_goals, 
+                         transactions=transactions, pending_goals=pending_goals,
+                         pending_transactions=pending_transactions)
+
+@bp.route("/groups/<int:group_id>/leave", methods=['POST'])
+@login_required
+@group_member_required(enforce=False)
+def leave_group(group_id, group, member):
+    if not member:
+        flash('You are not a member of this group.', 'danger')
+        return redirect(url_for('groups.groups'))
+    
+    if member.role == 'admin' and len(group.admin_members) == 1:
+        flash('Cannot leave group as the only admin. Transfer admin role first.', 'danger')
+        return redirect(url_for('groups.group_detail', group_id=group_id))
+    
+    member.is_active = False
+    db.session.commit()
+    
+    flash('Successfully left the group.', 'success')
+    return redirect(url_for('groups.groups'))
+
+@bp.route("/groups/<int:group_id>/goals/new", methods=['GET', 'POST'])
+@login_required
+@group_member_required()
+def new_group_goal(group_id, group, member):
+    form = GroupGoalForm()
+    if form.validate_on_submit():
+        goal = GroupGoal(
+            group_id=group_id,
+            title=form.title.data,
+            description=form.description.data,
+            target_amount=form.target_amount.data,
+            deadline=form.deadline.data,
+            category=form.category.data,
+            proposer_id=current_user.id
+        )
+        db.session.add(goal)
+        db.session.commit()
+        
+        flash('Goal proposed successfully! Waiting for admin approval.', 'success')
+        return redirect(url_for('groups.group_detail', group_id=group_id))
+    
+    return render_template("new_group_goal.html", title="Propose Group Goal", 
+                         form=form, group=group)
+
+@bp.route("/groups/<int:group_id>/goals/<int:goal_id>")
+@login_required
+@group_member_required()
+def group_goal(group_id, goal_id, group, member):
+    goal = GroupGoal.query.get_or_404(goal_id)
+    if goal.group_id != group_id:
+        abort(404)
+
+    analytics_map = group_goal_analytics(group, [goal], group.balance)
+    goal_analytics = analytics_map.get(goal.id, {})
+    remaining = max(0.0, float(goal.target_amount) - float(group.balance or 0.0))
+    is_ready = float(group.balance or 0.0) >= float(goal.target_amount)
+
+    return render_template('group_goal.html', title=goal.title, group=group, goal=goal,
+                           goal_analytics=goal_analytics, remaining=remaining, is_ready=is_ready)
+
+@bp.route("/groups/<int:group_id>/goals/<int:goal_id>/approve", methods=['POST'])
+@login_required
+@group_member_required(enforce=False)
+def approve_group_goal(group_id, goal_id, group, member):
+    try:
+        if not member or member.role != 'admin':
+            flash('You do not have permission to approve goals.', 'danger')
+            return redirect(url_for('groups.group_detail', group_id=group_id))
+        
+        goal = GroupGoal.query.get_or_404(goal_id)
+        if goal.group_id != group_id:
+            flash('Goal not found in this group.', 'danger')
+            return redirect(url_for('groups.group_detail', group_id=group_id))
+        
+        if goal.status != 'proposed':
+            flash(f'This goal is already {goal.status} and cannot be approved.', 'warning')
+            return redirect(url_for('groups.group_detail', group_id=group_id))
+        
+        if group.balance < goal.target_amount:
+            flash(f'Insufficient group funds. Current balance: ${group.balance:.2f}, Goal amount: ${goal.target_amount:.2f}', 'danger')
+            return redirect(url_for('groups.group_detail', group_id=group_id))
+
+        transaction = GroupTransaction(
+            group_id=group_id,
+            user_id=current_user.id,
+            amount=-goal.target_amount,
+            description=f"Goal approved: {goal.title}",
+            status='approved',
+            approved_by_id=current_user.id,
+            approved_at=datetime.utcnow()
+        )
+        db.session.add(transaction)
+        
+        goal.status = 'approved'
+        goal.approved_by_id = current_user.id
+        goal.approved_at = datetime.utcnow()
+        
+        group.balance -= goal.target_amount
+        
+        db.session.commit()
+        flash(f'Goal "{goal.title}" approved successfully! ${goal.target_amount:.2f} deducted from group savings.', 'success')
+        
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error approving goal: {str(e)}', 'danger')
+        print(f"Error in goal approval: {e}")
+        import traceback
+        traceback.print_exc()
+    
+    return redirect(url_for('groups.group_detail', group_id=group_id))
+
+@bp.route("/groups/<int:group_id>/goals/<int:goal_id>/deny", methods=['POST'])
+@login_required
+@group_member_required(admin=True)
+def deny_group_goal(group_id, goal_id, group, member):
+    goal = GroupGoal.query.get_or_404(goal_id)
+    if goal.group_id != group_id:
+        abort(404)
+    
+    goal.status = 'denied'
+    goal.approved_by_id = current_user.id
+    goal.approved_at = datetime.utcnow()
+    db.session.commit()
+    
+    flash('Goal denied.', 'info')
+    return redirect(url_for('groups.group_detail', group_id=group_id))
+
+@bp.route("/groups/<int:group_id>/goals", methods=['GET', 'POST'])
+@login_required
+@group_member_required()
+@conditional_page(group_page_version)
+def view_group_goals(group_id, group, member):
+    status_filter = request.args.get('status', 'proposed')
+    page = request.args.get('page', 1, type=int)
+    per_page = 8
+
+    goals = GroupGoal.query.filter_by(
+        group_id=group_id,
+        status=status_filter
+    ).order_by(GroupGoal.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+
+    active_tab = status_filter
+
+    overall_rate = group_rate(group)
+    approved_goals = GroupGoal.query.filter_by(group_id=group_id, status='approved').all()
+    total_remaining = sum(max(0.0, float(g.target_amount) - float(group.balance or 0.0)) for g in approved_goals)
+    eta = estimate_eta(total_remaining, overall_rate)
+    group_account_analytics = {
+        'rate_per_day': overall_rate,
+        'eta_ts': None if eta is None else int(datetime.combine(eta, datetime.min.time()).timestamp())
+    }
+
+    goals_analysis = {}
+    for g in goals.items:
+        remaining = max(0.0, float(g.target_amount) - float(group.balance or 0.0))
+        is_ready = float(group.balance or 0.0) >= float(g.target_amount)
+        progress_percent = (float(group.balance or 0.0) / float(g.target_amount) * 100) if g.target_amount and g.target_amount > 0 else 0.0
+        days = 30
+        try:
+            if getattr(g, 'deadline', None):
+                dl = g.deadline
+                if isinstance(dl, datetime):
+                    dl_date = dl.date()
+                else:
+                    dl_date = dl
+                days_left = (dl_date - datetime.today().date()).days
+                days = max(1, days_left) if days_left is not None else 30
+        except Exception:
+            days = 30
+        required_daily_30 = remaining / float(days) if days > 0 else None
+        goals_analysis[g.id] = {
+            'remaining': remaining,
+            'is_ready': is_ready,
+            'progress_percent': progress_percent,
+            'required_daily_30': required_daily_30,
+        }
+
+    return render_template("group_goals.html", title=f"{group.name} Goals",
+                           group=group, goals=goals, active_tab=active_tab, group_id=group_id,
+                           group_account_analytics=group_account_analytics,
+                           goals_analysis=goals_analysis)
+
+@bp.route("/groups/<int:group_id>/transactions/new", methods=['GET', 'POST'])
+@login_required
+@group_member_required()
+def new_group_transaction(group_id, group, member):
+    form = GroupTransactionForm()
+    if form.validate_on_submit():
+        is_admin = member.role == 'admin'
+        entry = {
+            'idempotency_key': form.idempotency_key.data or uuid.uuid4().hex,
+            'amount': form.amount.data,
+            'description': form.description.data,
+            'occurred_at': None,
+        }
+        result = submit_group_transactions(group, current_user.id, [entry], approve=is_admin)
+        
+        if not result.created:
+            flash('This transaction was already submitted.', 'info')
+        elif is_admin:
+            flash('Transaction added successfully!', 'success')
+        else:
+            flash('Transaction request submitted! Waiting for admin approval.', 'success')
+        
+        return redirect(url_for('groups.group_detail', group_id=group_id))
+    
+    if not form.idempotency_key.data:
+        form.idempotency_key.data = uuid.uuid4().hex
+    return render_template("new_group_transaction.html", title="New Group Transaction", 
+                         form=form, group=group, member=member)
+
+@bp.route("/groups/<int:group_id>/transactions/<int:transaction_id>/approve", methods=['POST'])
+@login_required
+@group_member_required(admin=True)
+def approve_group_transaction(group_id, transaction_id, group, member):
+    transaction = GroupTransaction.query.get_or_404(transaction_id)
+    if transaction.group_id != group_id:
+        abort(404)
+    
+    try:
+        group.balance += transaction.amount
+        
+        transaction.status = 'approved'
+        transaction.approved_by_id = current_user.id
+        transaction.approved_at = datetime.utcnow()
+        
+        db.session.commit()
+        flash('Transaction approved successfully!', 'success')
+        
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error approving transaction: {str(e)}', 'danger')
+        print(f"Error in transaction approval: {e}")
+    
+    return redirect(url_for('groups.group_detail', group_id=group_id))
+
+@bp.route("/groups/<int:group_id>/transactions/<int:transaction_id>/deny", methods=['POST'])
+@login_required
+@group_member_required(admin=True)
+def deny_group_transaction(group_id, transaction_id, group, member):
+    transaction = GroupTransaction.query.get_or_404(transaction_id)
+    if transaction.group_id != group_id:
+        abort(404)
+    
+    transaction.status = 'denied'
+    transaction.approved_by_id = current_user.id
+    transaction.approved_at = datetime.utcnow()
+    db.session.commit()
+    
+    flash('Transaction denied.', 'info')
+    return redirect(url_for('groups.group_detail', group_id=group_id))
+
+@bp.route("/groups/<int:group_id>/analytics")
+@login_required
+@group_member_required()
+@conditional_page(group_page_version)
+def group_analytics(group_id, group, member):
+    def load_stats():
+        total_balance = group.total_balance
+        total_members = len([m for m in group.members if m.is_active])
+        total_goals = len(group.goals)
+        proposed_goals = len([g for g in group.goals if g.status == 'proposed'])
+        approved_goals = len([g for g in group.goals if g.status == 'approved'])
+        denied_goals = len([g for g in group.goals if g.status == 'denied'])
+        
+        recent_transactions = GroupTransaction.query.filter_by(
+            group_id=group_id, 
+            status='approved'
+        ).order_by(GroupTransaction.occurred_at.desc()).limit(30).all()
+
+        goals = GroupGoal.query.filter_by(group_id=group_id).all()
+        group_analytics = group_goal_analytics(group, goals, group.balance)
+
+        overall_rate = group_rate(group)
+        approved_goals_list = [g for g in goals if g.status == 'approved']
+        total_remaining = sum(max(0.0, float(g.target_amount) - float(group.balance or 0.0)) for g in approved_goals_list)
+        eta = estimate_eta(total_remaining, overall_rate)
+        group_account_analytics = {
+            'rate_per_day': overall_rate,
+            'eta_ts': None if eta is None else int(datetime.combine(eta, datetime.min.time()).timestamp())
+        }
+        
+        monthly_data = {}
+        for tx in recent_transactions:
+            month = tx.occurred_at.strftime('%Y-%m')
+            if month not in monthly_data:
+                monthly_data[month] = {'contributions': 0, 'expenses': 0}
+            
+            if tx.amount > 0:
+                monthly_data[month]['contributions'] += tx.amount
+            else:
+                monthly_data[month]['expenses'] += abs(tx.amount)
+        
+        # The live window reaches back into archived history: show the rolled-up months too.
+        if len(recent_transactions) < 30:
+            for month, data in group_monthly_rollups(group_id).items():
+                monthly_data.setdefault(month, data)
+
+        return dict(total_balance=total_balance, total_members=total_members, total_goals=total_goals,
+                    proposed_goals=proposed_goals, approved_goals=approved_goals, denied_goals=denied_goals,
+                    monthly_data=monthly_data, group_analytics=group_analytics,
+                    group_account_analytics=group_account_analytics, goals=goals)
+    
+    # Everything the page shows is inside a cached fragment; load it only when that fragment is rendered.
+    return render_template("group_analytics.html", title=f"{group.name} Analytics", 
+                         group=group, member=member, stats=lazy(load_stats))
+
+@bp.route("/groups/<int:group_id>/members")
+@login_required
+@group_member_required()
+def group_members(group_id, group, member):
+    return render_template("group_members.html", title=f"{group.name} Members", 
+                         group=group, member=member, current_user_member=member)
+
+@bp.route("/groups/<int:group_id>/members/<int:member_id>/promote", methods=['POST'])
+@login_required
+@group_member_required(admin=True)
+def promote_member(group_id, member_id, group, member):
+    member_to_promote = GroupMember.query.get_or_404(member_id)
+    if member_to_promote.group_id != group_id:
+        abort(404)
+    
+    member_to_promote.role = 'admin'
+    db.session.commit()
+    
+    flash('Member promoted to admin successfully!', 'success')
+    return redirect(url_for('groups.group_members', group_id=group_id))
+
+@bp.route("/groups/<int:group_id>/members/<int:member_id>/demote", methods=['POST'])
+@login_required
+@group_member_required(admin=True)
+def demote_member(group_id, member_id, group, member):
+    member_to_demote = GroupMember.query.get_or_404(member_id)
+    if member_to_demote.group_id != group_id:
+        abort(404)
+    
+    if member_to_demote.user_id == current_user.id:
+        flash('You cannot demote yourself.', 'danger')
+        return redirect(url_for('groups.group_members', group_id=group_id))
+    
+    member_to_demote.role = 'member'
+    db.session.commit()
+    
+    flash('Member demoted to regular member.', 'info')
+    return redirect(url_for('groups.group_members', group_id=group_id))
+
+@bp.route("/groups/<int:group_id>/members/<int:member_id>/remove", methods=['POST'])
+@login_required
+@group_member_required(admin=True)
+def remove_member(group_id, member_id, group, member):
+    member_to_remove = GroupMember.query.get_or_404(member_id)
+    if member_to_remove.group_id != group_id:
+        abort(404)
+    
+    if member_to_remove.user_id == current_user.id:
+        flash('You cannot remove yourself. Transfer admin role first.', 'danger')
+        return redirect(url_for('groups.group_members', group_id=group_id))
+    
+    member_to_remove.is_active = False
+    db.session.commit()
+    
+    flash('Member removed from group.', 'info')
+    return redirect(url_for('groups.group_members', group_id=group_id))
+
+@bp.route("/groups/<int:group_id>/join-requests")
+@login_required
+@group_member_required(admin=True)
+def group_join_requests(group_id, group, member):
+    pending_requests = GroupJoinRequest.query.filter_by(
+        group_id=group_id,
+        status='pending'
+    ).order_by(GroupJoinRequest.requested_at.desc()).all()
+    
+    return render_template("group_join_requests.html", title=f"{group.name} Join Requests", 
+                         group=group, member=member, pending_requests=pending_requests)
+
+@bp.route("/groups/<int:group_id>/events")
+@login_required
+@group_member_required()
+def group_events(group_id, group, member):
+    """Server-Sent Events for the group pages; see home.live."""
+    try:
+        sub, missed = live.broker.subscribe(group_id, member.role == 'admin', request.headers.get('Last-Event-ID'))
+    except live.TooManyStreams:
+        return Response('Too many live streams, try again later.', 503,
+                        {'Retry-After': str(current_app.config['SSE_MAX_STREAM_SECONDS'])})
+    # The stream can stay open for minutes; it must not hold a database connection.
+    db.session.close()
+    response = Response(live.stream(sub, missed, current_app.config['SSE_HEARTBEAT_SECONDS'],
+                                    current_app.config['SSE_MAX_STREAM_SECONDS'], current_app.config['SSE_RETRY_MS']),
+                        mimetype='text/event-stream')
+    response.call_on_close(sub.close)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route("/groups/<int:group_id>/join-requests/<int:request_id>/approve", methods=['POST'])
+@login_required
+@group_member_required(admin=True)
+def approve_join_request(group_id, request_id, group, member):
+    join_request = GroupJoinRequest.query.get_or_404(request_id)
+    if join_request.group_id != group_id:
+        abort(404)
+    
+    try:
+        existing_member = GroupMember.query.filter_by(
+            group_id=group_id,
+            user_id=join_request.user_id
+        ).first()
+        
+        if existing_member:
+            existing_member.is_active = True
+            existing_member.joined_at = datetime.utcnow()
+        else:
+            new_member = GroupMember(
+                group_id=group_id,
+                user_id=join_request.user_id,
+                role='member'
+            )
+            db.session.add(new_member)
+        
+        join_request.status = 'approved'
+        join_request.responded_at = datetime.utcnow()
+        join_request.responded_by_id = current_user.id
+        db.session.commit()
+        
+        if existing_member:
+            flash(f'{join_request.user.username} has been reactivated as a member!', 'success')
+        else:
+            flash(f'{join_request.user.username} has been approved to join the group!', 'success')
+        
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error approving join request: {str(e)}', 'danger')
+        print(f"Error in join request approval: {e}")
+    
+    return redirect(url_for('groups.group_join_requests', group_id=group_id))
+
+@bp.route("/groups/<int:group_id>/join-requests/<int:request_id>/deny", methods=['POST'])
+@login_required
+@group_member_required(admin=True, denied_status=404)
+def deny_join_request(group_id, request_id, group, member):
+    join_request = GroupJoinRequest.query.get_or_404(request_id)
+    if join_request.group_id != group_id:
+        abort(404)
+    
+    join_request.status = 'denied'
+    join_request.responded_at = datetime.utcnow()
+    join_request.responded_by_id = current_user.id
+    db.session.commit()
+    
+    flash(f'{join_request.user.username}\'s join request has been denied.', 'info')
+    return redirect(url_for('groups.group_join_requests', group_id=group_id))
+
+@bp.route("/groups/<int:group_id>/preferences", methods=['GET', 'POST'])
+@login_required
+@use_primary
+@group_member_required(enforce=False)
+def group_preferences(group_id, group, member):
+    if not member or member.role != 'admin':
+        flash('Only group admins can access group preferences.', 'danger')
+        return redirect(url_for('groups.group_detail', group_id=group_id))
+    
+    preferences = GroupPreference.query.filter_by(group_id=group_id).first()
+    if not preferences:
+        preferences = GroupPreference(
+            group_id=group_id,
+            is_open=group.is_open,  
+            default_currency=group.currency
+        )
+        db.session.add(preferences)
+        db.session.commit()
+    
+    form = GroupPreferencesForm()
+    
+    if form.validate_on_submit():
+        try:
+            group.is_open = form.is_open.data
+            group.currency = form.default_currency.data
+            
+            preferences.is_open = form.is_open.data
+            preferences.default_currency = form.default_currency.data
+            preferences.require_goal_approval = form.require_goal_approval.data
+            preferences.require_transaction_approval = form.require_transaction_approval.data
+            preferences.updated_at = datetime.utcnow()
+            
+            db.session.commit()
+            flash('Group preferences have been updated!', 'success')
+            return redirect(url_for('groups.group_preferences', group_id=group_id))
+            
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error updating preferences: {str(e)}', 'danger')
+            print(f"Error in group preferences update: {e}")
+    
+    elif request.method == 'GET':
+        form.is_open.data = preferences.is_open
+        form.default_currency.data = preferences.default_currency
+        form.require_goal_approval.data = preferences.require_goal_approval
+        form.require_transaction_approval.data = preferences.require_transaction_approval  
+    
+    return render_template("group_preferences.html", title=f"{group.name} Preferences", 
+                         form=form, group=group, member=member)
+
+"""
+Data analysis below 
+"""
@@ -0,0 +1,293 @@
+"""
+Live group updates over Server-Sent Events.
+
+Session hooks turn committed changes to a group's transactions, goals, join
+requests and balance into small events (``transaction``, ``goal``,
+``join_request``, ``balance``) and hand them to an in-process broker. The
+group pages keep one ``/groups/<id>/events`` stream open and patch
+themselves from those events instead of being reloaded to look for new
+approvals.
+
+Events travel as ``GroupActivity`` change events (home.events), so they are
+published only once the transaction has committed, one batch per group and
+commit. Join requests go to admins only.
+
+The broker lives in one worker process (one per app). Every event gets an id of the form
+``<process token>:<sequence>`` and the last SSE_HISTORY events per group are
+kept, so a client reconnecting with Last-Event-ID gets what it missed; when
+that cannot be guaranteed (another worker, history overrun, a subscriber too
+slow to keep up) the stream sends ``resync`` and the page offers a reload.
+Changes committed in a different worker reach a page the next time its stream
+reconnects to a worker that saw them, which streams do at least every
+SSE_MAX_STREAM_SECONDS.
+
+Each open stream holds a server thread, so a worker serves at most
+SSE_MAX_STREAMS of them and answers the rest with 503; the page simply works
+without live updates until it gets a slot.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from flask import g, has_request_context
+from sqlalchemy import inspect
+
+from home.cache import per_app
+from home.db_models import Group, GroupGoal, GroupJoinRequest, GroupTransaction, user_cache
+from home.events import Event, collector, emit, subscribe
+
+ADMIN_ONLY = {'join_request'}
+
+
+class TooManyStreams(Exception):
+    """This worker already serves SSE_MAX_STREAMS streams."""
+
+
+def visible(item: dict, admin: bool) -> bool:
+    return admin or item['type'] not in ADMIN_ONLY
+
+
+class Subscription:
+    def __init__(self, broker: 'GroupBroker', group_id: int, admin: bool, maxsize: int):
+        self.broker = broker
+        self.group_id = group_id
+        self.admin = admin
+        self.queue: "queue.Queue[dict]" = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, events: List[dict]) -> None:
+        for item in events:
+            if not visible(item, self.admin):
+                continue
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.overflowed = True
+                return
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+class GroupBroker:
+    """Fans committed group events out to the streams open in this process."""
+
+    def __init__(self, max_streams: int = 4, history: int = 200, queue_size: int = 500):
+        self.max_streams = max_streams
+        self.history_size = history
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._history: Dict[int, Deque[dict]] = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+        self._token = uuid.uuid4().hex[:8]
+        self._pid = os.getpid()
+
+    def _reset_after_fork(self) -> None:
+        # Subscribers of the parent (a preloading master has none) are not ours.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._token = uuid.uuid4().hex[:8]
+            self._subscribers.clear()
+            self._history.clear()
+
+    @property
+    def stream_count(self) -> int:
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def subscribe(self, group_id: int, admin: bool, last_event_id: Optional[str] = None
+                  ) -> Tuple[Subscription, Optional[List[dict]]]:
+        """
+        Register a stream for ``group_id``. Returns the subscription and the
+        events after ``last_event_id`` (None if they cannot be replayed).
+        """
+        with self._lock:
+            self._reset_after_fork()
+            if self.stream_count >= self.max_streams:
+                raise TooManyStreams()
+            sub = Subscription(self, group_id, admin, self.queue_size)
+            self._subscribers.setdefault(group_id, set()).add(sub)
+            missed: Optional[List[dict]] = []
+            if last_event_id:
+                missed = self._since(group_id, last_event_id)
+        if missed:
+            missed = [item for item in missed if visible(item, admin)]
+        return sub, missed
+
+    def _since(self, group_id: int, last_event_id: str) -> Optional[List[dict]]:
+        token, _, seq = last_event_id.partition(':')
+        if token != self._token or not seq.isdigit():
+            return None
+        seq = int(seq)
+        history = self._history.get(group_id)
+        if history is None:
+            return []
+        if len(history) == history.maxlen and history[0]['seq'] > seq:
+            # Events between the client's last one and the oldest kept were dropped.
+            return None
+        return [item for item in history if item['seq'] > seq]
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subscribers.get(sub.group_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.group_id]
+
+    def publish(self, group_id: int, events: List[dict]) -> None:
+        with self._lock:
+            self._reset_after_fork()
+            for item in events:
+                item['seq'] = next(self._sequence)
+                item['id'] = f"{self._token}:{item['seq']}"
+            if self.history_size > 0:
+                history = self._history.get(group_id)
+                if history is None:
+                    history = self._history[group_id] = deque(maxlen=self.history_size)
+                history.extend(events)
+            subs = list(self._subscribers.get(group_id, ()))
+        for sub in subs:
+            sub.deliver(events)
+
+
+broker = per_app('fundflow.live', lambda app: GroupBroker(app.config['SSE_MAX_STREAMS'], app.config['SSE_HISTORY'],
+                                                           app.config['SSE_QUEUE_SIZE']))
+
+
+def format_event(item: dict) -> str:
+    return f"id: {item['id']}\nevent: {item['type']}\ndata: {json.dumps(item['data'])}\n\n"
+
+
+def stream(sub: Subscription, missed: Optional[List[dict]], heartbeat: float, max_seconds: float,
+           retry_ms: int) -> Iterator[str]:
+    """
+    The SSE body for one subscription. Uses no request or app context, so the
+    view can return it without keeping a database session open.
+    """
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield f"retry: {retry_ms}\n\n"
+        if missed is None:
+            yield "event: resync\ndata: {}\n\n"
+        else:
+            for item in missed:
+                yield format_event(item)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                item = sub.queue.get(timeout=min(heartbeat, remaining))
+            except queue.Empty:
+                if sub.overflowed:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event(item)
+            if sub.overflowed and sub.queue.empty():
+                yield "event: resync\ndata: {}\n\n"
+                return
+    finally:
+        sub.close()
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _username(obj, user_id: Optional[int]) -> Optional[str]:
+    """Username without a query: the loaded relationship, the current user or the user cache."""
+    if user_id is None:
+        return None
+    for attr in ('user', 'proposer'):
+        loaded = obj.__dict__.get(attr)
+        if loaded is not None and loaded.id == user_id:
+            return loaded.username
+    if has_request_context():
+        current = g.get('_login_user')
+        if current is not None and current.is_authenticated and current.id == user_id:
+            return current.username
+    row = user_cache.get(int(user_id))
+    return row['username'] if row is not None else None
+
+
+def transaction_event(tx: GroupTransaction, status: Optional[str] = None) -> dict:
+    return {'type': 'transaction', 'data': {
+        'id': tx.id, 'status': status or tx.status, 'amount': tx.amount, 'description': tx.description,
+        'user_id': tx.user_id, 'username': _username(tx, tx.user_id), 'occurred_at': _isoformat(tx.occurred_at),
+    }}
+
+
+def goal_event(goal: GroupGoal, status: Optional[str] = None) -> dict:
+    return {'type': 'goal', 'data': {
+        'id': goal.id, 'status': status or goal.status, 'title': goal.title, 'target_amount': goal.target_amount,
+        'proposer_id': goal.proposer_id, 'username': _username(goal, goal.proposer_id),
+    }}
+
+
+def join_request_event(join_request: GroupJoinRequest, status: Optional[str] = None) -> dict:
+    return {'type': 'join_request', 'data': {
+        'id': join_request.id, 'status': status or join_request.status, 'user_id': join_request.user_id,
+        'username': _username(join_request, join_request.user_id), 'message': join_request.message,
+        'requested_at': _isoformat(join_request.requested_at),
+    }}
+
+
+def balance_event(balance: float) -> dict:
+    return {'type': 'balance', 'data': {'balance': balance}}
+
+
+_EVENTS = {GroupTransaction: transaction_event, GroupGoal: goal_event, GroupJoinRequest: join_request_event}
+
+
+@dataclass(frozen=True)
+class GroupActivity(Event):
+    """Row-level changes of one group, in the order they were flushed."""
+    group_id: int
+    items: Tuple[dict, ...] = field(default=(), compare=False)
+
+
+def record(sess, group_id: int, item: dict) -> None:
+    """Queue an event for ``group_id`` to be published when ``sess`` commits (for Core statements)."""
+    emit(sess, GroupActivity(group_id, (item,)))
+
+
+@collector
+def _group_activity(sess) -> Iterator[GroupActivity]:
+    for obj in sess.new:
+        factory = _EVENTS.get(type(obj))
+        if factory is not None and obj.group_id is not None:
+            yield GroupActivity(obj.group_id, (factory(obj),))
+    for obj in sess.dirty:
+        factory = _EVENTS.get(type(obj))
+        if factory is not None and inspect(obj).attrs.status.history.has_changes():
+            yield GroupActivity(obj.group_id, (factory(obj),))
+        elif isinstance(obj, Group) and inspect(obj).attrs.balance.history.has_changes():
+            yield GroupActivity(obj.id, (balance_event(obj.balance),))
+    for obj in sess.deleted:
+        factory = _EVENTS.get(type(obj))
+        if factory is not None and obj.group_id is not None:
+            yield GroupActivity(obj.group_id, (factory(obj, status='deleted'),))
+
+
+def _publish_activity(activity: GroupActivity) -> None:
+    # Only the balance after the commit matters.
+    balances = [item for item in activity.items if item['type'] == 'balance']
+    items = [item for item in activity.items if item['type'] != 'balance'] + balances[-1:]
+    broker.publish(activity.group_id, [dict(item) for item in items])
+
+
+subscribe(GroupActivity, _publish_activity)
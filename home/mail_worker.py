@@ -0,0 +1,59 @@
+"""
+Deliver queued email from the outbox table.
+
+Run from project root:
+  python -m home.mail_worker            # keep delivering, polling every MAIL_OUTBOX_POLL_SECONDS
+  python -m home.mail_worker --once     # send everything that is due, then exit
+  python -m home.mail_worker --status   # show queue counts
+
+Run this next to the web processes when they have MAIL_OUTBOX_WORKER=0.
+See home.mailer for batching, retry and backoff.
+"""
+
+from __future__ import annotations
+
+import argparse
+from typing import Optional
+
+from sqlalchemy import func
+
+from home import create_app, db
+from home.db_models import EmailOutbox
+from home.mailer import deliver_pending, run_worker
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description='Deliver queued email')
+    parser.add_argument('--once', action='store_true', help='Drain due messages and exit')
+    parser.add_argument('--status', action='store_true', help='Print message counts by status and exit')
+    parser.add_argument('--poll', type=float, default=None, help='Seconds between polls when idle')
+    args = parser.parse_args(argv)
+    app = create_app(blueprints=False)
+
+    if args.status:
+        with app.app_context():
+            counts = db.session.query(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all()
+        for status, count in counts:
+            print(f"{status:<10}{count:>8}")
+        return
+
+    if args.once:
+        total_sent = total_failed = 0
+        with app.app_context():
+            while True:
+                sent, failed = deliver_pending()
+                total_sent += sent
+                total_failed += failed
+                if not sent and not failed:
+                    break
+        print(f"Sent {total_sent}, failed attempts {total_failed}")
+        return
+
+    try:
+        run_worker(app, poll_seconds=args.poll)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
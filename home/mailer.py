@@ -0,0 +1,194 @@
+"""
+Outgoing email goes through the ``email_outbox`` table.
+
+Request handlers call ``enqueue_email``, which only inserts a row; nothing
+talks to the SMTP server while a worker is serving a page. Delivery happens in
+``deliver_pending``, run either by a daemon thread inside each app process
+(MAIL_OUTBOX_WORKER=1, the default, started by the first request each process
+serves and by ``enqueue_email``) or by a dedicated
+process (``python -m home.mail_worker``, with MAIL_OUTBOX_WORKER=0 in the web
+processes).
+
+Each pass claims up to MAIL_OUTBOX_BATCH_SIZE due rows with a conditional
+UPDATE, so several workers can run side by side without sending a message
+twice, then sends the whole batch over one SMTP connection. A failed message
+is retried with exponential backoff (MAIL_OUTBOX_BACKOFF_SECONDS doubling per
+attempt, capped at an hour) until MAIL_OUTBOX_MAX_ATTEMPTS, after which it is
+marked failed. A claim expires after MAIL_OUTBOX_LEASE_SECONDS, so rows held by
+a worker that died are picked up again.
+
+For local runs point MAIL_SERVER/MAIL_PORT at ``python -m home.smtp_sink``.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Tuple
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import update
+
+from home import db, mail
+from home.db_models import EmailOutbox
+from home.events import OutboxEnqueued, subscribe
+
+MAX_BACKOFF_SECONDS = 3600
+
+_wakeup = threading.Event()
+_worker_lock = threading.Lock()
+
+
+def enqueue_email(subject: str, recipients: Iterable[str], body: str, html: Optional[str] = None,
+                  sender: Optional[str] = None, commit: bool = True) -> EmailOutbox:
+    """Queue a message for delivery. With commit=False it goes out with the caller's transaction."""
+    entry = EmailOutbox(subject=subject, sender=sender, recipients=','.join(recipients), body=body, html=html)
+    db.session.add(entry)
+    if commit:
+        db.session.commit()
+    if current_app.config.get('MAIL_OUTBOX_WORKER'):
+        start_worker()
+    return entry
+
+
+def backoff_delay(attempts: int) -> float:
+    base = float(current_app.config.get('MAIL_OUTBOX_BACKOFF_SECONDS', 30))
+    delay = min(base * (2 ** max(attempts - 1, 0)), MAX_BACKOFF_SECONDS)
+    return delay + random.uniform(0, delay * 0.1)
+
+
+def _message(entry: EmailOutbox) -> Message:
+    return Message(entry.subject,
+                   sender=entry.sender or current_app.config.get('MAIL_DEFAULT_SENDER'),
+                   recipients=[r for r in entry.recipients.split(',') if r],
+                   body=entry.body,
+                   html=entry.html)
+
+
+def _claim(batch_size: int, now: datetime) -> list:
+    due = db.session.query(EmailOutbox.id).filter(
+        EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(batch_size).all()
+    if not due:
+        return []
+    token = uuid.uuid4().hex
+    lease = timedelta(seconds=int(current_app.config.get('MAIL_OUTBOX_LEASE_SECONDS', 300)))
+    db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_([row.id for row in due]),
+               EmailOutbox.status == 'pending',
+               EmailOutbox.next_attempt_at <= now)
+        .values(claimed_by=token, next_attempt_at=now + lease)
+    )
+    db.session.commit()
+    return EmailOutbox.query.filter_by(claimed_by=token, status='pending').order_by(EmailOutbox.id).all()
+
+
+def _record_failure(entry: EmailOutbox, error: BaseException, now: datetime) -> None:
+    entry.attempts += 1
+    entry.last_error = f'{type(error).__name__}: {error}'[:2000]
+    entry.claimed_by = None
+    if entry.attempts >= int(current_app.config.get('MAIL_OUTBOX_MAX_ATTEMPTS', 6)):
+        entry.status = 'failed'
+    else:
+        entry.next_attempt_at = now + timedelta(seconds=backoff_delay(entry.attempts))
+
+
+def _connection_lost(error: BaseException) -> bool:
+    # SMTPException subclasses OSError; anything else from the socket means the connection is gone.
+    return isinstance(error, smtplib.SMTPServerDisconnected) or (
+        isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException))
+
+
+def deliver_pending(batch_size: Optional[int] = None) -> Tuple[int, int]:
+    """Send one batch of due messages. Returns (sent, failed attempts). Needs an app context."""
+    batch_size = batch_size or int(current_app.config.get('MAIL_OUTBOX_BATCH_SIZE', 50))
+    now = datetime.utcnow()
+    entries = _claim(batch_size, now)
+    if not entries:
+        return 0, 0
+
+    sent = failed = 0
+    remaining = list(entries)
+    try:
+        with mail.connect() as connection:
+            while remaining:
+                entry = remaining[0]
+                try:
+                    connection.send(_message(entry))
+                except Exception as e:
+                    if _connection_lost(e):
+                        raise
+                    _record_failure(entry, e, now)
+                    failed += 1
+                else:
+                    entry.status = 'sent'
+                    entry.sent_at = datetime.utcnow()
+                    entry.claimed_by = None
+                    sent += 1
+                remaining.pop(0)
+    except Exception as e:
+        # Could not connect, or the server went away mid-batch: retry the rest later.
+        for entry in remaining:
+            _record_failure(entry, e, now)
+            failed += 1
+        current_app.logger.warning('Email delivery interrupted: %s', e)
+    db.session.commit()
+    return sent, failed
+
+
+def run_worker(app, poll_seconds: Optional[float] = None, stop: Optional[threading.Event] = None) -> None:
+    """Deliver until ``stop`` is set, draining full batches back to back and waiting otherwise."""
+    poll = float(poll_seconds if poll_seconds is not None else app.config.get('MAIL_OUTBOX_POLL_SECONDS', 5))
+    batch_size = int(app.config.get('MAIL_OUTBOX_BATCH_SIZE', 50))
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        _wakeup.clear()
+        try:
+            with app.app_context():
+                sent, failed = deliver_pending(batch_size)
+        except Exception:
+            app.logger.exception('Email outbox worker pass failed')
+            sent = failed = 0
+        if sent + failed < batch_size:
+            _wakeup.wait(poll)
+
+
+def _running(app) -> bool:
+    worker = app.extensions.get('fundflow.mail_worker')
+    return worker is not None and worker[1] == os.getpid() and worker[0].is_alive()
+
+
+def start_worker() -> None:
+    """Start the app's in-process delivery thread once per process (again after a fork)."""
+    app = current_app._get_current_object()
+    with _worker_lock:
+        if _running(app):
+            return
+        worker = threading.Thread(target=run_worker, args=(app,), name='email-outbox', daemon=True)
+        app.extensions['fundflow.mail_worker'] = (worker, os.getpid())
+        worker.start()
+
+
+def _ensure_worker() -> None:
+    # Rows queued by other processes (digests, retries left by a restart) need
+    # a running worker even if this process never enqueues anything itself.
+    if not _running(current_app):
+        start_worker()
+
+
+def _wake_worker(change: OutboxEnqueued) -> None:
+    _wakeup.set()
+
+
+subscribe(OutboxEnqueued, _wake_worker)
+
+
+def init_app(app):
+    if app.config['MAIL_OUTBOX_WORKER']:
+        app.before_request(_ensure_worker)
@@ -0,0 +1,122 @@
+"""
+Password hashing for the auth routes.
+
+The bcrypt cost comes from BCRYPT_LOG_ROUNDS (Flask-Bcrypt's setting). Raising
+or lowering it takes effect for existing users as they log in: a stored hash
+with a different cost is replaced after the password has been verified.
+
+By default hashing runs inline in the request thread. With
+PASSWORD_HASH_WORKERS > 0 it runs on a bounded pool instead (PASSWORD_HASH_POOL
+= "thread" or "process"), so a login storm keeps at most that many cores busy
+with bcrypt and the rest of the site stays responsive. At most
+PASSWORD_HASH_QUEUE hashes wait behind the running ones; a request that cannot
+get a slot within PASSWORD_HASH_WAIT_SECONDS fails fast with
+PasswordHashingBusy (answered with 503 and Retry-After) instead of piling up.
+bcrypt releases the GIL, so the thread pool already runs hashes in parallel;
+the process pool is for deployments with few threads per worker. Each app
+has its own pool, sized from its own settings.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt as _bcrypt
+
+from flask import current_app
+
+from home.cache import per_app
+
+
+class PasswordHashingBusy(Exception):
+    """Every hashing slot is taken; the client should retry shortly."""
+
+
+def _hash(password: bytes, rounds: int, prefix: bytes) -> bytes:
+    return _bcrypt.hashpw(password, _bcrypt.gensalt(rounds=rounds, prefix=prefix))
+
+
+def _check(pw_hash: bytes, password: bytes) -> bool:
+    return hmac.compare_digest(_bcrypt.hashpw(password, pw_hash), pw_hash)
+
+
+def _prepare(password: str) -> bytes:
+    password = password.encode('utf-8')
+    if current_app.config.get('BCRYPT_HANDLE_LONG_PASSWORDS'):
+        password = hashlib.sha256(password).hexdigest().encode('utf-8')
+    return password
+
+
+class HashPool:
+    """An app's hashing executor and the slots bounding what may wait for it."""
+
+    def __init__(self, app):
+        self.workers = int(app.config['PASSWORD_HASH_WORKERS'])
+        self.kind = app.config.get('PASSWORD_HASH_POOL')
+        self.capacity = self.workers + int(app.config['PASSWORD_HASH_QUEUE'])
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        self._pid: Optional[int] = None
+
+    def get(self) -> Tuple[Executor, threading.BoundedSemaphore]:
+        with self._lock:
+            # A forked worker must not reuse the parent's pool threads/processes.
+            if self._executor is None or self._pid != os.getpid():
+                if self.kind == 'process':
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+                self._slots = threading.BoundedSemaphore(self.capacity)
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+
+hash_pool = per_app('fundflow.password_hash_pool', HashPool)
+
+
+def _run(fn, *args):
+    if not current_app.config.get('PASSWORD_HASH_WORKERS'):
+        return fn(*args)
+    executor, slots = hash_pool.get()
+    if not slots.acquire(timeout=float(current_app.config['PASSWORD_HASH_WAIT_SECONDS'])):
+        raise PasswordHashingBusy()
+    try:
+        future = executor.submit(fn, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda f: slots.release())
+    return future.result()
+
+
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
+    rounds = rounds or int(current_app.config['BCRYPT_LOG_ROUNDS'])
+    prefix = current_app.config.get('BCRYPT_HASH_PREFIX', '2b').encode('ascii')
+    return _run(_hash, _prepare(password), rounds, prefix).decode('utf-8')
+
+
+def check_password(pw_hash: str, password: str) -> bool:
+    try:
+        return _run(_check, pw_hash.encode('utf-8'), _prepare(password))
+    except ValueError:
+        # Not a bcrypt hash at all.
+        return False
+
+
+def hash_cost(pw_hash: str) -> Optional[int]:
+    """The log rounds a stored bcrypt hash was made with ("$2b$12$..." -> 12)."""
+    parts = pw_hash.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def needs_rehash(pw_hash: str) -> bool:
+    prefix = current_app.config.get('BCRYPT_HASH_PREFIX', '2b')
+    return hash_cost(pw_hash) != int(current_app.config['BCRYPT_LOG_ROUNDS']) or not pw_hash.startswith(f'${prefix}$')
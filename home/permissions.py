@@ -0,0 +1,127 @@
+"""
+Group membership checks for the group routes.
+
+``group_member_required`` resolves the group and the current user's
+membership with one joined query, enforces the role the view needs and passes
+both to the view as ``group`` and ``member`` keyword arguments.
+
+Memberships are cached per worker and app as (user_id, group_id) -> membership columns
+(or "not a member"). A cached denial is answered without touching the
+database, and a cached membership only costs the primary-key load of the group.
+Only read-only requests to member views use the cache: write requests and
+admin views always check the membership against the database, so a demoted or
+removed admin loses admin rights everywhere at once.
+Cache entries are dropped at flush and again on the committed
+MembershipChanged event whenever a GroupMember row is added, changed or
+deleted (promote, demote, remove, leave, join approval, group creation), and
+MEMBERSHIP_CACHE_TTL bounds staleness across workers.
+"""
+
+from __future__ import annotations
+
+from functools import wraps
+from typing import Optional, Tuple
+
+from flask import abort, request
+from sqlalchemy import and_, event
+from sqlalchemy.orm import make_transient_to_detached
+
+from home import db
+from home.cache import TTLCache, per_app
+from home.db_models import SAFE_METHODS, Group, GroupMember, current_identity
+from home.events import MembershipChanged, subscribe
+
+membership_cache = per_app('fundflow.membership_cache',
+                           lambda app: TTLCache(maxsize=app.config['MEMBERSHIP_CACHE_SIZE'],
+                                                ttl=app.config['MEMBERSHIP_CACHE_TTL']))
+
+NOT_A_MEMBER = 'not-a-member'
+
+
+def _member_columns(member: GroupMember) -> dict:
+    return {c.key: getattr(member, c.key) for c in GroupMember.__table__.columns}
+
+
+def _attach(row: dict) -> GroupMember:
+    member = GroupMember(**row)
+    make_transient_to_detached(member)
+    return db.session.merge(member, load=False)
+
+
+def _allowed(member, admin: bool) -> bool:
+    if not member:
+        return False
+    role = member['role'] if isinstance(member, dict) else member.role
+    is_active = member['is_active'] if isinstance(member, dict) else member.is_active
+    return role == 'admin' if admin else bool(is_active)
+
+
+def invalidate_membership(group_id: int, user_id: int) -> None:
+    membership_cache.delete((int(user_id), int(group_id)))
+
+
+def load_group_membership(group_id: int, user_id: int, fresh: bool = False) -> Tuple[Group, Optional[GroupMember]]:
+    """
+    The group (404 if missing) and the user's GroupMember row for it, or None.
+
+    fresh=True skips the cache and reads the current membership.
+    """
+    key = (user_id, group_id)
+    cached = None if fresh else membership_cache.get(key)
+    if cached is not None:
+        group = db.session.get(Group, group_id)
+        if group is None:
+            abort(404)
+        return group, None if cached == NOT_A_MEMBER else _attach(cached)
+
+    result = db.session.query(Group, GroupMember).outerjoin(
+        GroupMember, and_(GroupMember.group_id == Group.id, GroupMember.user_id == user_id)
+    ).filter(Group.id == group_id).execution_options(populate_existing=True).first()
+    if result is None:
+        abort(404)
+    group, member = result
+    membership_cache.set(key, _member_columns(member) if member is not None else NOT_A_MEMBER)
+    return group, member
+
+
+def group_member_required(admin: bool = False, enforce: bool = True, denied_status: int = 403):
+    """
+    Inject ``group`` and ``member`` into a ``/groups/<int:group_id>/...`` view.
+
+    admin=False requires an active membership, admin=True requires the admin
+    role. With enforce=False nothing is checked and ``member`` may be None, for
+    views that answer a denial with a flash message instead of an error.
+    Must sit below ``@login_required``.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(group_id, *args, **kwargs):
+            identity = current_identity()
+            if identity is None:
+                abort(denied_status)
+            fresh = admin or request.method not in SAFE_METHODS
+            if enforce and not fresh:
+                cached = membership_cache.get((identity.id, group_id))
+                if cached is not None and not _allowed(None if cached == NOT_A_MEMBER else cached, admin):
+                    abort(denied_status)
+            group, member = load_group_membership(group_id, identity.id, fresh=fresh)
+            if enforce and not _allowed(member, admin):
+                abort(denied_status)
+            return f(*args, group_id=group_id, group=group, member=member, **kwargs)
+        return decorated
+    return decorator
+
+
+@event.listens_for(db.session, 'after_flush')
+def _invalidate_changed_memberships(sess, flush_context):
+    for obj in list(sess.new) + list(sess.dirty) + list(sess.deleted):
+        if isinstance(obj, GroupMember) and obj.group_id is not None and obj.user_id is not None:
+            invalidate_membership(obj.group_id, obj.user_id)
+
+
+def _invalidate_committed_membership(change: MembershipChanged) -> None:
+    if change.group_id is not None and change.user_id is not None:
+        invalidate_membership(change.group_id, change.user_id)
+
+
+subscribe(MembershipChanged, _invalidate_committed_membership)
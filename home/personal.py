@@ -0,0 +1,261 @@
+from flask import Blueprint, render_template, url_for, flash, redirect, request, abort, session
+from home import db
+from home.conditional import conditional_page, user_page_version
+from home.pictures import queue_profile_picture
+from home.db_models import SavingChanges, Goal, UserPreference
+from home.forms import UpdateAccountForm, UpdateGoalForm, GoalForm, UpdateSavingsForm, AdjustSavingsForm, UserPreferencesForm
+from flask_login import current_user, login_required
+
+bp = Blueprint('personal', __name__)
+
+@bp.route("/account")
+@login_required
+def account():
+    return render_template("account.html", title="Account")
+
+@bp.route("/account/edit", methods=['GET', 'POST'])
+@login_required
+def update_account():
+    form = UpdateAccountForm()
+    if form.validate_on_submit():
+        picture_pending = False
+        if form.picture.data:
+            picture_pending = not queue_profile_picture(current_user.id, form.picture.data)
+        current_user.username = form.username.data
+        current_user.email = form.email.data
+        db.session.commit()
+        flash('Your account has been updated', 'success')
+        if picture_pending:
+            flash('Your new profile picture will appear in a moment', 'info')
+        return redirect(url_for('personal.account'))
+    
+    elif request.method == 'GET':
+        form.username.data = current_user.username
+        form.email.data = current_user.email
+    
+    return render_template("update_account.html", title="Update Account", form=form)
+
+@bp.route("/update_savings", methods=['POST'])
+@login_required
+def update_savings():
+    form = UpdateSavingsForm()
+    if form.validate_on_submit():
+        new_savings = form.savings.data
+        if new_savings < 0:
+            flash('Savings cannot be negative!', 'danger')
+            return redirect(url_for('personal.dashboard'))
+        try:
+            current_savings = current_user.savings
+            saving_change = SavingChanges(
+                amount=new_savings - current_savings,
+                user_id=current_user.id
+            )
+            db.session.add(saving_change)
+            current_user.savings = new_savings
+            db.session.commit()
+            flash('Your savings balance has been updated!', 'success')
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        except Exception as e:
+            db.session.rollback()
+            flash('An error occurred while updating savings.', 'danger')
+        return redirect(url_for('personal.dashboard'))
+    else:
+        for field, errors in form.errors.items():
+            for error in errors:
+                flash(f'{getattr(form, field).label.text}: {error}', 'danger')
+        return redirect(url_for('personal.dashboard'))
+
+@bp.route("/adjust_savings", methods=['POST'])
+@login_required
+def adjust_savings():
+    form = AdjustSavingsForm()
+    if form.validate_on_submit():
+        amount = form.amount.data
+        operation = form.operation.data
+        
+        if operation == 'subtract' and current_user.savings < amount:
+            flash('Insufficient funds to subtract this amount!', 'danger')
+            return redirect(url_for('personal.dashboard'))
+        
+        try:
+            if operation == 'add':
+                current_user.savings += amount
+                saving_change = SavingChanges(
+                    amount=amount,
+                    user_id=current_user.id
+                )
+                db.session.add(saving_change)
+                flash(f'Added ${amount:.2f} to your savings!', 'success')
+            else:  
+                current_user.savings -= amount
+                saving_change = SavingChanges(
+                    amount=-amount,
+                    user_id=current_user.id
+                )
+                db.session.add(saving_change)
+                flash(f'Subtracted ${amount:.2f} from your savings!', 'success')
+            
+            db.session.commit()
+            
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error adjusting savings: {str(e)}', 'danger')
+            print(f"Error in savings adjustment: {e}")
+        
+        return redirect(url_for('personal.dashboard'))
+    else:
+        for field, errors in form.errors.items():
+            for error in errors:
+                flash(f'{getattr(form, field).label.text}: {error}', 'danger')
+        return redirect(url_for('personal.dashboard'))
+
+@bp.route("/goals")
+@login_required
+@conditional_page(user_page_version)
+def goals():
+    page = request.args.get('page', 1, type=int)
+    status_filter = request.args.get('status', 'incomplete')  
+    
+    if status_filter == 'completed':
+        goals = Goal.query.filter_by(user_id=current_user.id, status='completed')\
+            .order_by(Goal.date_time.desc()).paginate(page=page, per_page=5)
+        active_tab = 'completed'
+    else:
+        goals = Goal.query.filter_by(user_id=current_user.id, status='active')\
+            .order_by(Goal.date_time.desc()).paginate(page=page, per_page=5)
+        active_tab = 'incomplete'
+    
+    return render_template("goals.html", title="My Goals", goals=goals, active_tab=active_tab)
+
+@bp.route("/goal/new", methods=['GET', 'POST'])
+@login_required
+def new_goal():
+    if current_user.savings is None:
+        flash('Please set your savings balance first', 'danger')
+        return redirect(url_for('personal.account'))
+
+    form = GoalForm()
+    if form.validate_on_submit():
+        if form.target_amount.data <= 0:
+            flash('Target amount must be greater than 0!', 'danger')
+            return render_template("create_goal.html", title="New Goal", form=form, legend='New Goal')
+        goal = Goal(
+            title=form.title.data, 
+            description=form.description.data, 
+            target_amount=form.target_amount.data,
+            deadline=form.deadline.data,
+            category=form.category.data,
+            user_id=current_user.id
+        )
+        db.session.add(goal)
+        db.session.commit()
+        flash('Your goal has been created!', 'success')
+        return redirect(url_for('personal.goals'))
+    return render_template("create_goal.html", title="New Goal", form=form, legend='New Goal')
+
+@bp.route("/goal/<int:goal_id>")
+@login_required
+def goal(goal_id):
+    goal = Goal.query.get_or_404(goal_id)
+    # Analytics are fetched by the page from api.goal_analytics.
+    # precompute small view flags to keep template simple
+    is_ready = (current_user.savings or 0.0) >= float(goal.target_amount)
+    goal_view = {
+        'is_ready': is_ready,
+        'current_savings': float(current_user.savings or 0.0)
+    }
+    return render_template('goal.html', title=goal.title, goal=goal, goal_view=goal_view)
+
+@bp.route("/goal/<int:goal_id>/update", methods=['GET', 'POST'])
+@login_required
+def update_goal(goal_id):
+    goal = Goal.query.get_or_404(goal_id)
+    if goal.user_id != current_user.id:
+        abort(403)
+    form = UpdateGoalForm()
+    if form.validate_on_submit():
+        if form.target_amount.data <= 0:
+            flash('Target amount must be greater than 0!', 'danger')
+            return render_template("create_goal.html", title="New Goal", form=form, legend='New Goal')
+        goal.title = form.title.data
+        goal.description = form.description.data
+        goal.target_amount = form.target_amount.data
+        goal.deadline = form.deadline.data
+        goal.category = form.category.data
+        db.session.commit()
+        flash('Your goal has been updated!', 'success')
+        return redirect(url_for('personal.goal', goal_id=goal_id))
+    elif request.method == 'GET':
+        form.title.data = goal.title
+        form.description.data = goal.description
+        form.target_amount.data = goal.target_amount
+        form.deadline.data = goal.deadline
+        form.category.data = goal.category
+    return render_template("create_goal.html", title="Update Goal", form=form, legend='Update Goal')
+
+@bp.route("/goal/<int:goal_id>/complete", methods=['POST'])
+@login_required
+def complete_goal(goal_id):
+    goal = Goal.query.get_or_404(goal_id)
+    if goal.user_id != current_user.id:
+        abort(403)
+    if current_user.savings < goal.target_amount:
+        flash('You do not have enough savings to complete this goal', 'danger')
+        return redirect(url_for('personal.goal', goal_id=goal_id))
+    current_user.savings -= goal.target_amount
+    goal.status = 'completed'
+    db.session.commit()
+    flash('Your goal has been completed!', 'success')
+    return redirect(url_for('personal.goals'))
+
+@bp.route("/goal/<int:goal_id>/delete", methods=['POST'])
+@login_required
+def delete_goal(goal_id):
+    goal = Goal.query.get_or_404(goal_id)
+    if goal.user_id != current_user.id:
+        abort(403)
+    db.session.delete(goal)
+    db.session.commit()
+    flash('Your goal has been deleted!', 'success')
+    return redirect(url_for('personal.goals'))
+
+@bp.route("/dashboard")
+@login_required
+@conditional_page(user_page_version)
+def dashboard():
+    savings_form = UpdateSavingsForm()
+    adjust_form = AdjustSavingsForm()
+    
+    if request.method == 'GET':
+        savings_form.savings.data = current_user.savings or 0.0
+    
+    # Analytics are fetched by the page from api.user_analytics, so the ledger is not read here.
+    goals = Goal.query.filter_by(user_id=current_user.id, status='active').all()
+
+    return render_template("dashboard.html", title="Dashboard", 
+                         savings_form=savings_form, adjust_form=adjust_form, goals=goals)
+
+@bp.route("/preferences", methods=['GET', 'POST'])
+@login_required
+def user_preferences():
+    form = UserPreferencesForm()
+    preference = UserPreference.query.filter_by(user_id=current_user.id).first()
+    if request.method == 'GET':
+        form.theme.data = session.get('theme', 'light')
+        form.notifications.data = session.get('notifications', True)
+        form.email_notifications.data = preference.email_notifications if preference else True
+    
+    if form.validate_on_submit():
+        session['theme'] = form.theme.data
+        session['notifications'] = form.notifications.data
+        if preference is None:
+            preference = UserPreference(user_id=current_user.id)
+            db.session.add(preference)
+        preference.email_notifications = form.email_notifications.data
+        db.session.commit()
+        flash('Your preferences have been updated!', 'success')
+        return redirect(url_for('personal.user_preferences'))
+    
+    return render_template("user_preferences.html", title="User Preferences", form=form)
@@ -0,0 +1,178 @@
+"""
+Profile pictures: content-addressed, resized in the background.
+
+An upload is only hashed and spooled on the request path. Its key is the
+first 20 hex digits of the SHA-256 of the uploaded bytes, so identical uploads
+share one set of files and a re-upload of a picture we already have is
+applied immediately. A background thread (one per process and app, started
+when the process serves its first request) turns each spooled upload into square variants of every size in
+PROFILE_PICTURE_SIZES, as WebP and PNG, under static/profile_pics as
+``<key>-<size>.<ext>``, then points the user's image_file at the key.
+
+Pictures saved before this change keep their "<hex>.<ext>" filenames and are
+served as they are. Templates use ``avatar_url(user, size)`` or the
+``avatar`` macro in _avatar.html, which picks the nearest size for the
+screen density and offers WebP with a PNG fallback.
+
+Spooled uploads live in instance/picture_queue and survive restarts; whatever
+is left there is processed once a process starts serving again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import queue
+import threading
+
+from flask import current_app, url_for
+from PIL import Image, ImageOps
+
+from home import db
+from home.db_models import User
+
+KEY_LENGTH = 20
+FORMATS = (('webp', 'WEBP', {'quality': 85, 'method': 4}), ('png', 'PNG', {'optimize': True}))
+
+_worker_lock = threading.Lock()
+
+
+def picture_dir() -> str:
+    return os.path.join(current_app.root_path, 'static', 'profile_pics')
+
+
+def spool_dir() -> str:
+    return current_app.config['PROFILE_PICTURE_SPOOL']
+
+
+def sizes():
+    return sorted(current_app.config['PROFILE_PICTURE_SIZES'])
+
+
+def is_content_key(image_file: str) -> bool:
+    return '.' not in image_file
+
+
+def variant_name(key: str, size: int, ext: str) -> str:
+    return f"{key}-{size}.{ext}"
+
+
+def is_processed(key: str) -> bool:
+    largest = sizes()[-1]
+    return all(os.path.exists(os.path.join(picture_dir(), variant_name(key, largest, ext))) for ext, _, _ in FORMATS)
+
+
+def queue_profile_picture(user_id: int, upload) -> bool:
+    """
+    Spool an uploaded picture for ``user_id``. Returns True when the same
+    picture was processed before and image_file was set right away (the caller
+    commits), False when it will be applied in the background.
+    """
+    data = upload.read()
+    key = hashlib.sha256(data).hexdigest()[:KEY_LENGTH]
+    if is_processed(key):
+        user = db.session.get(User, user_id)
+        user.image_file = key
+        return True
+
+    os.makedirs(spool_dir(), exist_ok=True)
+    path = os.path.join(spool_dir(), f"{key}.{user_id}")
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    start_worker().put(path)
+    return False
+
+
+def render_variants(source: str, key: str) -> None:
+    target = picture_dir()
+    largest = sizes()[-1]
+    with Image.open(source) as im:
+        # Let the JPEG decoder downscale while decoding; a phone photo is 10-20x our largest size.
+        im.draft('RGB', (largest * 2, largest * 2))
+        im = ImageOps.exif_transpose(im)
+        im = im.convert('RGBA' if im.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        for size in sizes():
+            thumb = ImageOps.fit(im, (size, size), Image.LANCZOS)
+            for ext, fmt, options in FORMATS:
+                path = os.path.join(target, variant_name(key, size, ext))
+                tmp = f"{path}.tmp"
+                thumb.save(tmp, fmt, **options)
+                os.replace(tmp, path)
+
+
+def process_spooled(path: str) -> None:
+    """Render one spooled upload and assign it to its user. Needs an app context."""
+    key, user_id = os.path.basename(path).split('.')
+    try:
+        if not is_processed(key):
+            render_variants(path, key)
+    except (OSError, Image.DecompressionBombError) as e:
+        current_app.logger.warning('Could not process profile picture %s: %s', path, e)
+        os.remove(path)
+        return
+    user = db.session.get(User, int(user_id))
+    if user is not None:
+        user.image_file = key
+        db.session.commit()
+    os.remove(path)
+
+
+def _pending_uploads():
+    if not os.path.isdir(spool_dir()):
+        return []
+    entries = [os.path.join(spool_dir(), name) for name in os.listdir(spool_dir()) if not name.endswith('.tmp')]
+    return sorted(entries, key=os.path.getmtime)
+
+
+def run_worker(app, jobs: "queue.Queue[str]") -> None:
+    with app.app_context():
+        for path in _pending_uploads():
+            jobs.put(path)
+    while True:
+        path = jobs.get()
+        if not os.path.exists(path):
+            continue
+        try:
+            with app.app_context():
+                process_spooled(path)
+        except Exception:
+            app.logger.exception('Profile picture worker failed on %s', path)
+
+
+def _running(app) -> bool:
+    worker = app.extensions.get('fundflow.picture_worker')
+    return worker is not None and worker[1] == os.getpid() and worker[0].is_alive()
+
+
+def start_worker() -> "queue.Queue[str]":
+    """Start the app's picture thread once per process (again after a fork); returns its job queue."""
+    app = current_app._get_current_object()
+    with _worker_lock:
+        if not _running(app):
+            jobs: "queue.Queue[str]" = queue.Queue()
+            worker = threading.Thread(target=run_worker, args=(app, jobs), name='profile-pictures', daemon=True)
+            app.extensions['fundflow.picture_worker'] = (worker, os.getpid(), jobs)
+            worker.start()
+        return app.extensions['fundflow.picture_worker'][2]
+
+
+def _ensure_worker() -> None:
+    # Uploads spooled before a restart or crash must not wait for the next upload to this process.
+    if not _running(current_app):
+        start_worker()
+
+
+def avatar_url(user, size: int = 64, ext: str = 'png') -> str:
+    """URL of ``user``'s picture at the smallest stored size that is at least ``size`` pixels."""
+    if not is_content_key(user.image_file):
+        return url_for('static', filename='profile_pics/' + user.image_file)
+    available = sizes()
+    fitting = next((s for s in available if s >= size), available[-1])
+    return url_for('static', filename='profile_pics/' + variant_name(user.image_file, fitting, ext))
+
+
+def init_app(app):
+    app.add_template_global(avatar_url)
+    app.before_request(_ensure_worker)
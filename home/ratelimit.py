@@ -0,0 +1,239 @@
+"""
+Token-bucket rate limiting and load shedding for the expensive endpoints.
+
+Limits are configured per endpoint as "endpoint=capacity/seconds", comma
+separated:
+
+    RATE_LIMITS="groups.group_analytics=20/60,personal.dashboard=30/60"
+    RATE_LIMITS_GLOBAL="groups.group_analytics=200/60"
+
+RATE_LIMITS gives every user (or anonymous client address) a bucket of
+``capacity`` requests per endpoint, refilled at capacity/seconds;
+RATE_LIMITS_GLOBAL is one bucket per endpoint shared by everybody. A request
+that finds a bucket empty is answered with 429 and a Retry-After telling when
+the next token is due. Sub-requests of POST /api/v1/batch draw from the
+buckets of the endpoints they address.
+
+Buckets live in process memory by default (RATE_LIMIT_STORE=memory), so each
+worker enforces the limits on its own. RATE_LIMIT_STORE=sqlite keeps them in
+the SQLite file RATE_LIMIT_DB, shared by all workers on the host; each check
+is one short IMMEDIATE transaction.
+
+Load shedding: a worker counts the requests it is serving. While that number
+is at least LOAD_SHED_INFLIGHT, or a front proxy's X-Request-Start header
+shows the request queued for longer than LOAD_SHED_QUEUE_MS, ``overloaded()``
+is true and the analytics code serves the last rate it computed instead of
+recomputing (see home.cached_analysis).
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from flask import current_app, g, has_request_context, request
+from werkzeug.exceptions import TooManyRequests
+
+from home.cache import TTLCache, per_app
+from home.db_models import current_identity
+
+Limit = Tuple[float, float]  # (capacity, seconds to refill completely)
+
+
+def parse_limits(spec: str) -> Dict[str, Limit]:
+    """'a.b=10/60, c.d=5/1' -> {'a.b': (10.0, 60.0), 'c.d': (5.0, 1.0)}"""
+    limits: Dict[str, Limit] = {}
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        endpoint, _, rule = part.partition('=')
+        capacity, _, seconds = rule.partition('/')
+        try:
+            limits[endpoint.strip()] = (float(capacity), float(seconds or 1))
+        except ValueError:
+            raise ValueError(f'Invalid rate limit {part.strip()!r}, expected endpoint=capacity/seconds') from None
+    return limits
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, seconds: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated) * capacity / seconds)
+
+
+class MemoryStore:
+    """Buckets of this process. An idle bucket is full again after ``seconds`` and is then dropped."""
+
+    def __init__(self, maxsize: int = 65536):
+        self._buckets = TTLCache(maxsize=maxsize, ttl=60)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, seconds: float, now: float) -> float:
+        """Take one token; returns 0 on success, else the seconds until one is available."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated, now, capacity, seconds)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) * seconds / capacity
+            self._buckets.set(key, (tokens, now), ttl=seconds)
+            return wait
+
+
+class SQLiteStore:
+    """Buckets shared by every process using the same database file."""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._takes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS bucket ('
+                         'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, expires REAL NOT NULL)')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread and process; a forked worker must not reuse its parent's.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key: str, capacity: float, seconds: float, now: float) -> float:
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens = _refill(row[0], row[1], now, capacity, seconds) if row else capacity
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) * seconds / capacity
+            conn.execute('INSERT INTO bucket (key, tokens, updated, expires) VALUES (?, ?, ?, ?) '
+                         'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, '
+                         'expires = excluded.expires', (key, tokens, now, now + seconds))
+            self._takes += 1
+            if self._takes % self.PRUNE_EVERY == 0:
+                # Expired buckets are full again; forgetting them changes nothing.
+                conn.execute('DELETE FROM bucket WHERE expires < ?', (now,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+
+class RateLimiter:
+    def __init__(self):
+        self.store = MemoryStore()
+        self.per_user: Dict[str, Limit] = {}
+        self.per_endpoint: Dict[str, Limit] = {}
+
+    def configure(self, app) -> None:
+        self.per_user = parse_limits(app.config['RATE_LIMITS'])
+        self.per_endpoint = parse_limits(app.config['RATE_LIMITS_GLOBAL'])
+        if app.config['RATE_LIMIT_STORE'] == 'sqlite':
+            self.store = SQLiteStore(app.config['RATE_LIMIT_DB'])
+        elif app.config['RATE_LIMIT_STORE'] == 'memory':
+            self.store = MemoryStore()
+        else:
+            raise ValueError(f"RATE_LIMIT_STORE must be 'memory' or 'sqlite', not {app.config['RATE_LIMIT_STORE']!r}")
+
+    def check(self, endpoint: Optional[str]) -> None:
+        """Take a token for ``endpoint`` from the caller's and the endpoint's bucket; 429 if either is empty."""
+        if endpoint not in self.per_user and endpoint not in self.per_endpoint:
+            return
+        now = time.time()
+        wait = 0.0
+        if endpoint in self.per_endpoint:
+            wait = self.store.take(f'endpoint:{endpoint}', *self.per_endpoint[endpoint], now)
+        if not wait and endpoint in self.per_user:
+            identity = current_identity()
+            client = f'user:{identity.id}' if identity is not None else f'addr:{request.remote_addr}'
+            wait = self.store.take(f'{client}:{endpoint}', *self.per_user[endpoint], now)
+        if wait:
+            raise TooManyRequests('Too many requests for this page, please slow down.',
+                                  retry_after=max(1, int(wait + 0.999)))
+
+
+def _app_limiter(app) -> RateLimiter:
+    app_limiter = RateLimiter()
+    app_limiter.configure(app)
+    return app_limiter
+
+
+limiter = per_app('fundflow.limiter', _app_limiter)
+
+_inflight = 0
+_inflight_lock = threading.Lock()
+
+
+def _queued_ms() -> Optional[float]:
+    """Time the request waited in front of the app, from an X-Request-Start: t=<epoch ms or us> header."""
+    header = request.headers.get('X-Request-Start', '')
+    value = header[2:] if header.startswith('t=') else header
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    while started > 1e13:  # microseconds or finer
+        started /= 1000.0
+    return max(0.0, time.time() * 1000.0 - started)
+
+
+def overloaded() -> bool:
+    """True while this worker is saturated: too many requests in flight or queued too long upstream."""
+    if not has_request_context():
+        return False
+    if g.get('_overloaded') is None:
+        config = current_app.config
+        queued = _queued_ms()
+        g._overloaded = bool(
+            (config['LOAD_SHED_INFLIGHT'] and _inflight >= config['LOAD_SHED_INFLIGHT'])
+            or (config['LOAD_SHED_QUEUE_MS'] and queued is not None and queued >= config['LOAD_SHED_QUEUE_MS'])
+        )
+    return g._overloaded
+
+
+def _start_request():
+    global _inflight
+    with _inflight_lock:
+        _inflight += 1
+    g._counted = True
+    limiter.check(request.endpoint)
+
+
+def _mark_stale(response):
+    if g.get('analytics_stale'):
+        response.headers.add('Warning', '110 - "Response is Stale"')
+        response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def _end_request(exc):
+    global _inflight
+    if g.pop('_counted', False):
+        with _inflight_lock:
+            _inflight -= 1
+
+
+def init_app(app):
+    # Built now rather than on first use, so that bad RATE_LIMITS fail at startup.
+    app.extensions['fundflow.limiter'] = _app_limiter(app)
+    app.before_request(_start_request)
+    app.after_request(_mark_stale)
+    app.teardown_request(_end_request)
@@ -0,0 +1,65 @@
+"""
+Keep a local SQLite read replica in sync with the primary database file.
+
+Run from project root:
+  python -m home.replica                 # one-off copy of DATABASE_URL into DATABASE_REPLICA_URL
+  python -m home.replica --interval 2    # keep copying every 2 seconds
+
+Uses SQLite's online backup API, so the primary stays fully usable while it
+copies and the replica always holds a consistent snapshot. This is meant for
+local testing of read/write routing (see home.database); a real deployment
+would point DATABASE_REPLICA_URL at a proper replica instead.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import time
+from typing import Optional
+
+from sqlalchemy.engine import make_url
+
+from home import create_app, db
+from home.database import REPLICA_BIND
+
+
+def sqlite_path(engine) -> str:
+    url = make_url(str(engine.url))
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        raise SystemExit(f"{url} is not a file-backed SQLite database")
+    return url.database.removeprefix('file:').split('?')[0]
+
+
+def sync_replica(primary_path: str, replica_path: str, pages_per_step: int = 1024) -> None:
+    src = sqlite3.connect(primary_path)
+    dst = sqlite3.connect(replica_path)
+    try:
+        src.backup(dst, pages=pages_per_step)
+    finally:
+        dst.close()
+        src.close()
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description='Copy the primary SQLite database into the read replica file')
+    parser.add_argument('--interval', type=float, default=0.0, help='Repeat every N seconds (0 = copy once)')
+    args = parser.parse_args(argv)
+
+    with create_app(blueprints=False).app_context():
+        if REPLICA_BIND not in db.engines:
+            raise SystemExit('DATABASE_REPLICA_URL is not set')
+        primary = sqlite_path(db.engines[None])
+        replica = sqlite_path(db.engines[REPLICA_BIND])
+
+    while True:
+        started = time.perf_counter()
+        sync_replica(primary, replica)
+        print(f"Synced {primary} -> {replica} in {time.perf_counter() - started:.2f}s")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
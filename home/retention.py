@@ -0,0 +1,160 @@
+"""
+Ledger retention: move old SavingChanges / GroupTransaction rows to cold storage.
+
+Run from project root:
+  python -m home.retention --dry-run                 # count rows past the horizon
+  python -m home.retention --yes                     # roll up and archive using LEDGER_RETENTION_DAYS
+  python -m home.retention --yes --horizon-days 365 --archive-dir instance/archive
+
+Rows older than the horizon (rounded down to the start of a month, so every
+rollup month is complete) are appended to gzip JSON-lines files in the archive
+directory, folded into per-subject monthly rollup rows (SavingChangesRollup per
+user, GroupTransactionRollup per group and status) and then deleted. Totals are
+preserved, so User.savings / Group.balance still match ledger + rollups, and
+the analytics loaders read rollups alongside live rows.
+
+Pending group transactions are never archived; they still need an admin.
+Work happens in small batches with a commit after each, like home.sandbox.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+
+from home import create_app, db
+from home.db_models import SavingChanges, SavingChangesRollup, GroupTransaction, GroupTransactionRollup
+from home.sandbox import archive_rows
+
+
+def month_start(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1)
+
+
+def retention_cutoff(horizon_days: int, now: Optional[datetime] = None) -> datetime:
+    """First instant that is kept live: start of the month containing now - horizon."""
+    return month_start((now or datetime.utcnow()) - timedelta(days=horizon_days))
+
+
+def _roll_up(table, date_col, subject_col: str, rollup_model, rollup_subject: str, cutoff: datetime,
+             extra_filters: List, key_status: bool, archive_path: Optional[str], batch_size: int,
+             sleep: float, progress) -> int:
+    filters = [table.c[date_col] < cutoff, *extra_filters]
+    last_id = 0
+    moved = 0
+    while True:
+        rows = db.session.execute(
+            select(table).where(table.c.id > last_id, *filters).order_by(table.c.id).limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            break
+        first_id, last_id = rows[0]['id'], rows[-1]['id']
+        if archive_path:
+            archive_rows(archive_path, [dict(r) for r in rows])
+
+        buckets: Dict[Tuple, List[float]] = {}
+        for r in rows:
+            key = (r[subject_col], month_start(r[date_col]), r['status'] if key_status else None)
+            bucket = buckets.setdefault(key, [0.0, 0.0, 0])
+            amount = float(r['amount'])
+            if amount >= 0:
+                bucket[0] += amount
+            else:
+                bucket[1] += -amount
+            bucket[2] += 1
+
+        try:
+            subject_attr = getattr(rollup_model, rollup_subject)
+            existing = rollup_model.query.filter(
+                subject_attr.in_({k[0] for k in buckets}),
+                rollup_model.month.in_({k[1] for k in buckets}),
+            ).all()
+            by_key = {(getattr(e, rollup_subject), e.month, getattr(e, 'status', None)): e for e in existing}
+            for key, (total_in, total_out, count) in buckets.items():
+                rollup = by_key.get(key)
+                if rollup is None:
+                    values = {rollup_subject: key[0], 'month': key[1], 'total_in': 0.0, 'total_out': 0.0, 'count': 0}
+                    if key_status:
+                        values['status'] = key[2]
+                    rollup = rollup_model(**values)
+                    db.session.add(rollup)
+                rollup.total_in += total_in
+                rollup.total_out += total_out
+                rollup.count += count
+            db.session.execute(delete(table).where(table.c.id.between(first_id, last_id), *filters))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        moved += len(rows)
+        progress(f"{table.name}: rolled up {moved} rows (up to id {last_id})")
+        if sleep:
+            time.sleep(sleep)
+    return moved
+
+
+def roll_up_saving_changes(cutoff: datetime, archive_dir: Optional[str] = None, batch_size: int = 1000,
+                           sleep: float = 0.0, progress=print) -> int:
+    archive_path = os.path.join(archive_dir, f"saving_changes-{cutoff:%Y%m}.jsonl.gz") if archive_dir else None
+    return _roll_up(SavingChanges.__table__, 'date_time', 'user_id', SavingChangesRollup, 'user_id', cutoff,
+                    [], False, archive_path, batch_size, sleep, progress)
+
+
+def roll_up_group_transactions(cutoff: datetime, archive_dir: Optional[str] = None, batch_size: int = 1000,
+                               sleep: float = 0.0, progress=print) -> int:
+    table = GroupTransaction.__table__
+    archive_path = os.path.join(archive_dir, f"group_transaction-{cutoff:%Y%m}.jsonl.gz") if archive_dir else None
+    return _roll_up(table, 'occurred_at', 'group_id', GroupTransactionRollup, 'group_id', cutoff,
+                    [table.c.status != 'pending'], True, archive_path, batch_size, sleep, progress)
+
+
+def count_expired(cutoff: datetime) -> Dict[str, int]:
+    sc = SavingChanges.__table__
+    gt = GroupTransaction.__table__
+    return {
+        'saving_changes': db.session.execute(
+            select(func.count()).select_from(sc).where(sc.c.date_time < cutoff)).scalar(),
+        'group_transaction': db.session.execute(
+            select(func.count()).select_from(gt).where(gt.c.occurred_at < cutoff, gt.c.status != 'pending')).scalar(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Roll up and archive FundFlow ledger rows past the retention horizon')
+    parser.add_argument('--horizon-days', type=int, default=None,
+                        help='Keep this many days live (default: LEDGER_RETENTION_DAYS)')
+    parser.add_argument('--archive-dir', default=None,
+                        help='Directory for .jsonl.gz archives (default: LEDGER_ARCHIVE_DIR; empty to skip)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows moved per transaction')
+    parser.add_argument('--sleep', type=float, default=0.05, help='Seconds to pause between batches')
+    parser.add_argument('--dry-run', action='store_true', help='Only count rows past the horizon')
+    parser.add_argument('--yes', '-y', action='store_true', help='Skip confirmation prompt')
+    args = parser.parse_args(argv)
+
+    app = create_app(blueprints=False)
+    with app.app_context():
+        horizon = args.horizon_days if args.horizon_days is not None else app.config['LEDGER_RETENTION_DAYS']
+        archive_dir = args.archive_dir if args.archive_dir is not None else app.config['LEDGER_ARCHIVE_DIR']
+        cutoff = retention_cutoff(horizon)
+        counts = count_expired(cutoff)
+        print(f"Rows dated before {cutoff:%Y-%m-%d}: {counts}")
+        if args.dry_run or not any(counts.values()):
+            return
+        if not args.yes:
+            resp = input("Type ARCHIVE to roll up and remove these rows: ")
+            if resp.strip() != 'ARCHIVE':
+                print("Aborted by user.")
+                return
+        moved = roll_up_saving_changes(cutoff, archive_dir or None, args.batch_size, args.sleep)
+        moved += roll_up_group_transactions(cutoff, archive_dir or None, args.batch_size, args.sleep)
+        print(f"Rolled up {moved} rows" + (f", archived to {archive_dir}" if archive_dir else ""))
+
+
+if __name__ == '__main__':
+    main()
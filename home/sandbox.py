@@ -1,47 +1,170 @@
-
 """
 Sandbox utility for local maintenance.
 
 Run from project root:
-  python -m home.sandbox        # interactive prompt
-  python -m home.sandbox --yes  # skip prompt
+  python -m home.sandbox                                 # interactive prompt, delete everything
+  python -m home.sandbox --yes                           # skip prompt
+  python -m home.sandbox --dry-run --before 2024-01-01   # only count what would go
+  python -m home.sandbox --user-id 7 --before 2024-01-01 --archive instance/archive/sc.jsonl.gz
+
+This script deletes rows from the SavingChanges table when confirmed, optionally
+limited to one user and/or rows older than a date. Rows are removed in small
+id-ordered batches, each in its own short transaction with an optional pause in
+between, so the SQLite write lock is never held for long and the site keeps
+serving while a large table is trimmed.
+
+The deleted amounts are folded into one carry-forward SavingChanges row per
+user (inside the same transaction as each batch), so the sum of a user's ledger
+keeps matching User.savings. Pass --no-carry-forward to drop them outright.
 
-This script deletes all rows from the SavingChanges table when confirmed.
+With --archive the rows of each batch are appended to a gzip-compressed JSON
+lines file, and flushed to disk, before that batch is deleted.
 """
 
-from home import app, db
+from home import create_app, db
 from home.db_models import SavingChanges
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import delete, func, select, update
 import argparse
+import gzip
+import json
+import os
+import time
+
+
+def _filters(user_id: Optional[int], before: Optional[datetime]) -> List:
+	table = SavingChanges.__table__
+	clauses = []
+	if user_id is not None:
+		clauses.append(table.c.user_id == user_id)
+	if before is not None:
+		clauses.append(table.c.date_time < before)
+	return clauses
+
+
+def archive_rows(path: str, rows: List[Dict]) -> None:
+	"""Append rows to a gzip JSON-lines archive and make sure they hit the disk."""
+	directory = os.path.dirname(path)
+	if directory:
+		os.makedirs(directory, exist_ok=True)
+	with open(path, 'ab') as raw:
+		with gzip.GzipFile(fileobj=raw, mode='ab') as fh:
+			for row in rows:
+				fh.write((json.dumps(row, default=str) + '\n').encode('utf-8'))
+		raw.flush()
+		os.fsync(raw.fileno())
+
+
+def count_saving_changes(user_id: Optional[int] = None, before: Optional[datetime] = None) -> int:
+	table = SavingChanges.__table__
+	return db.session.execute(select(func.count()).select_from(table).where(*_filters(user_id, before))).scalar()
+
 
+def delete_saving_changes(user_id: Optional[int] = None, before: Optional[datetime] = None,
+						  batch_size: int = 500, sleep: float = 0.0, archive: Optional[str] = None,
+						  carry_forward: bool = True, progress=print) -> int:
+	"""
+	Delete matching SavingChanges rows in id-ordered batches, committing after each.
 
-def clear_saving_changes(confirm: bool) -> None:
-	with app.app_context():
-		before = SavingChanges.query.count()
-		print(f"SavingChanges rows before: {before}")
-		if before == 0:
+	Returns the number of rows deleted.
+	"""
+	table = SavingChanges.__table__
+	filters = _filters(user_id, before)
+	# Rows created after we start (including our own carry-forward rows) are left alone.
+	max_id = db.session.execute(select(func.max(table.c.id))).scalar() or 0
+	carry_ids: Dict[int, int] = {}
+	carry_date = before or datetime.utcnow()
+	last_id = 0
+	deleted = 0
+
+	while True:
+		rows = db.session.execute(
+			select(table).where(table.c.id > last_id, table.c.id <= max_id, *filters)
+			.order_by(table.c.id).limit(batch_size)
+		).mappings().all()
+		if not rows:
+			break
+		first_id, last_id = rows[0]['id'], rows[-1]['id']
+
+		if archive:
+			archive_rows(archive, [dict(r) for r in rows])
+
+		totals: Dict[int, float] = {}
+		for r in rows:
+			totals[r['user_id']] = totals.get(r['user_id'], 0.0) + float(r['amount'])
+
+		try:
+			db.session.execute(delete(table).where(table.c.id.between(first_id, last_id), *filters))
+			if carry_forward:
+				for uid, amount in totals.items():
+					if uid in carry_ids:
+						db.session.execute(update(table).where(table.c.id == carry_ids[uid])
+										   .values(amount=table.c.amount + amount))
+					elif amount != 0:
+						result = db.session.execute(table.insert().values(
+							user_id=uid, amount=amount, date_time=carry_date))
+						carry_ids[uid] = result.inserted_primary_key[0]
+			db.session.commit()
+		except Exception:
+			db.session.rollback()
+			raise
+
+		deleted += len(rows)
+		progress(f"Deleted {deleted} rows (up to id {last_id})")
+		if sleep:
+			time.sleep(sleep)
+
+	return deleted
+
+
+def clear_saving_changes(confirm: bool, user_id: Optional[int] = None, before: Optional[datetime] = None,
+						 batch_size: int = 500, sleep: float = 0.0, archive: Optional[str] = None,
+						 dry_run: bool = False, carry_forward: bool = True) -> None:
+	with create_app(blueprints=False).app_context():
+		before_count = count_saving_changes(user_id, before)
+		print(f"Matching SavingChanges rows: {before_count}")
+		if before_count == 0:
 			print("Nothing to delete.")
 			return
 
+		if dry_run:
+			print("Dry run: nothing deleted.")
+			return
+
 		if not confirm:
-			resp = input("Type DELETE to confirm deletion of ALL SavingChanges rows: ")
+			resp = input(f"Type DELETE to confirm deletion of {before_count} SavingChanges rows: ")
 			if resp.strip() != 'DELETE':
 				print("Aborted by user.")
 				return
 
 		# perform deletion
-		SavingChanges.query.delete()
-		db.session.commit()
-		after = SavingChanges.query.count()
-		print(f"Deletion complete. SavingChanges rows after: {after}")
+		deleted = delete_saving_changes(user_id=user_id, before=before, batch_size=batch_size, sleep=sleep,
+										archive=archive, carry_forward=carry_forward)
+		after = count_saving_changes(user_id, before)
+		print(f"Deletion complete. Deleted {deleted} rows, matching rows after: {after}")
+		if archive:
+			print(f"Archived rows to {archive}")
 
 
 def main():
 	parser = argparse.ArgumentParser(description='Sandbox utilities for FundFlow local development')
 	parser.add_argument('--yes', '-y', action='store_true', help='Skip confirmation prompt and delete immediately')
+	parser.add_argument('--user-id', type=int, default=None, help='Only delete rows belonging to this user')
+	parser.add_argument('--before', type=datetime.fromisoformat, default=None,
+						help='Only delete rows dated before this ISO date/time')
+	parser.add_argument('--batch-size', type=int, default=500, help='Rows deleted per transaction')
+	parser.add_argument('--sleep', type=float, default=0.05, help='Seconds to pause between batches')
+	parser.add_argument('--archive', default=None, help='Append deleted rows to this .jsonl.gz file first')
+	parser.add_argument('--dry-run', action='store_true', help='Only count matching rows')
+	parser.add_argument('--no-carry-forward', action='store_true',
+						help='Do not fold deleted amounts into a carry-forward row (User.savings will no longer match the ledger)')
 	args = parser.parse_args()
 
-	clear_saving_changes(confirm=args.yes)
+	clear_saving_changes(confirm=args.yes, user_id=args.user_id, before=args.before, batch_size=args.batch_size,
+						 sleep=args.sleep, archive=args.archive, dry_run=args.dry_run,
+						 carry_forward=not args.no_carry_forward)
 
 
 if __name__ == '__main__':
-	main()
\ No newline at end of file
+	main()
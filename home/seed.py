@@ -0,0 +1,371 @@
+"""
+Synthetic data seeder for load testing.
+
+Run from project root:
+  python -m home.seed --database sqlite:///instance/loadtest.db --users 20000 --groups 2000 --years 3
+  python -m home.seed --database sqlite:///instance/small.db --users 50 --groups 5 --seed 7
+
+Builds a fresh database full of realistic FundFlow data: users with personal
+goals and a savings ledger, groups with memberships, group goals in every
+status, join requests and years of group transaction history. The same seed
+and --now anchor date always produce the same database. Rows are written with
+executemany bulk inserts in large batches, so a multi-million row SQLite file
+takes minutes.
+
+Every seeded user can log in with the password given by --password.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import bcrypt as _bcrypt
+from sqlalchemy import create_engine, event, func, inspect, select
+from sqlalchemy.schema import CreateTable
+
+from home import create_app, db
+from home.db_models import (User, SavingChanges, Goal, Group, GroupMember, GroupGoal,
+                            GroupTransaction, GroupJoinRequest)
+
+GOAL_CATEGORIES = ['savings', 'investment', 'emergency', 'vacation', 'education', 'home', 'vehicle', 'other']
+CURRENCIES = ['USD', 'USD', 'USD', 'EUR', 'GBP', 'CAD', 'AUD']
+GOAL_TITLES = {
+    'savings': 'Rainy day pot',
+    'investment': 'Index fund top-up',
+    'emergency': 'Emergency fund',
+    'vacation': 'Summer trip',
+    'education': 'Course fees',
+    'home': 'House deposit',
+    'vehicle': 'New car',
+    'other': 'Something nice',
+}
+
+
+class Seeder:
+    """
+    Generates the synthetic dataset and streams it into the target database.
+
+    All randomness comes from a single ``random.Random(seed)`` and rows are
+    generated in a fixed order, so ids and values are reproducible.
+    """
+
+    def __init__(self, engine, seed: int = 42, users: int = 1000, groups: int = 100, years: float = 2.0,
+                 tx_per_month: float = 6.0, group_tx_per_month: float = 20.0, password: str = 'password',
+                 batch_size: int = 20000, now: Optional[datetime] = None, rounds: int = 12):
+        self.engine = engine
+        self.rng = random.Random(seed)
+        self.users = users
+        self.groups = groups
+        self.years = years
+        self.tx_per_month = tx_per_month
+        self.group_tx_per_month = group_tx_per_month
+        self.password = password
+        self.rounds = rounds
+        self.batch_size = batch_size
+        self.now = now or datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        self.start = self.now - timedelta(days=int(365 * years))
+        self.counts: Dict[str, int] = {}
+        self._conn = None
+
+    # -- helpers ---------------------------------------------------------
+
+    def _insert(self, model, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        self._conn.execute(model.__table__.insert(), rows)
+        name = model.__tablename__
+        self.counts[name] = self.counts.get(name, 0) + len(rows)
+
+    def _password_hash(self) -> str:
+        # bcrypt salts normally come from os.urandom; derive one from the seed instead
+        # so that the user table is byte-for-byte reproducible too.
+        alphabet = './ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
+        salt = ''.join(self.rng.choice(alphabet) for _ in range(21)) + self.rng.choice('.Oeu')
+        return _bcrypt.hashpw(self.password.encode('utf-8'), f'$2b${self.rounds:02d}${salt}'.encode('ascii')).decode('utf-8')
+
+    def _random_time(self, start: datetime, end: datetime) -> datetime:
+        span = max(1, int((end - start).total_seconds()))
+        return start + timedelta(seconds=self.rng.randrange(span))
+
+    def _activity(self) -> float:
+        # Most accounts are light users, a few are very busy.
+        return min(8.0, self.rng.lognormvariate(0.0, 0.75))
+
+    def _poisson(self, lam: float) -> int:
+        if lam <= 0:
+            return 0
+        if lam > 30:
+            return max(0, int(self.rng.gauss(lam, math.sqrt(lam)) + 0.5))
+        threshold = math.exp(-lam)
+        k, p = 0, 1.0
+        while True:
+            p *= self.rng.random()
+            if p <= threshold:
+                return k
+            k += 1
+
+    # -- generators ------------------------------------------------------
+
+    def _ledger(self, user_id: int, joined: datetime) -> Tuple[List[Dict], float]:
+        """Personal SavingChanges for one user; returns (rows, final balance)."""
+        months = max(1.0, (self.now - joined).days / 30.0)
+        n = self._poisson(self.tx_per_month * months * self._activity())
+        salary = round(self.rng.lognormvariate(5.5, 0.6), 2)
+        times = sorted(self._random_time(joined, self.now) for _ in range(n))
+        balance = 0.0
+        rows = []
+        for ts in times:
+            if self.rng.random() < 0.65:
+                amount = round(salary * self.rng.uniform(0.2, 1.2), 2)
+            else:
+                amount = -round(min(balance, salary * self.rng.expovariate(1.5)), 2)
+            if amount == 0:
+                continue
+            balance = round(balance + amount, 2)
+            rows.append({'amount': amount, 'date_time': ts, 'user_id': user_id})
+        return rows, balance
+
+    def seed_users(self) -> None:
+        hashed = self._password_hash()
+        goal_rows: List[Dict] = []
+        ledger_rows: List[Dict] = []
+        user_rows: List[Dict] = []
+
+        def flush() -> None:
+            self._insert(User, user_rows)
+            self._insert(SavingChanges, ledger_rows)
+            self._insert(Goal, goal_rows)
+            user_rows.clear()
+            ledger_rows.clear()
+            goal_rows.clear()
+
+        for user_id in range(1, self.users + 1):
+            joined = self._random_time(self.start, self.now - timedelta(days=1))
+            rows, balance = self._ledger(user_id, joined)
+            ledger_rows.extend(rows)
+            user_rows.append({
+                'id': user_id,
+                'username': f'user{user_id}',
+                'email': f'user{user_id}@example.com',
+                'image_file': 'default.jpg',
+                'password': hashed,
+                'savings': max(0.0, balance),
+            })
+            for _ in range(self.rng.choice((0, 1, 1, 2, 2, 3, 5))):
+                category = self.rng.choice(GOAL_CATEGORIES)
+                created = self._random_time(joined, self.now)
+                deadline = None
+                if self.rng.random() < 0.6:
+                    deadline = created + timedelta(days=self.rng.randint(30, 720))
+                goal_rows.append({
+                    'title': GOAL_TITLES[category],
+                    'description': f'Saving up for {category}.',
+                    'date_time': created,
+                    'target_amount': round(self.rng.lognormvariate(7.0, 1.0), 2) + 1.0,
+                    'deadline': deadline,
+                    'category': category,
+                    'status': 'completed' if self.rng.random() < 0.25 else 'active',
+                    'user_id': user_id,
+                    'updated_at': created,
+                })
+            if len(ledger_rows) >= self.batch_size:
+                flush()
+        flush()
+
+    def seed_groups(self) -> None:
+        if self.users == 0:
+            return
+        member_rows: List[Dict] = []
+        request_rows: List[Dict] = []
+        group_rows: List[Dict] = []
+        goal_rows: List[Dict] = []
+        tx_rows: List[Dict] = []
+
+        def flush() -> None:
+            self._insert(Group, group_rows)
+            self._insert(GroupMember, member_rows)
+            self._insert(GroupJoinRequest, request_rows)
+            self._insert(GroupGoal, goal_rows)
+            self._insert(GroupTransaction, tx_rows)
+            for rows in (group_rows, member_rows, request_rows, goal_rows, tx_rows):
+                rows.clear()
+
+        for group_id in range(1, self.groups + 1):
+            # Group sizes follow a heavy tail: lots of small groups, a few large ones.
+            size = min(self.users, max(2, int(self.rng.paretovariate(1.3) * 3)))
+            member_ids = self.rng.sample(range(1, self.users + 1), size)
+            created = self._random_time(self.start, self.now - timedelta(days=1))
+            members: List[Tuple[int, str, datetime]] = []
+            for idx, user_id in enumerate(member_ids):
+                role = 'admin' if idx == 0 or self.rng.random() < 0.08 else 'member'
+                joined = created if idx == 0 else self._random_time(created, self.now)
+                active = idx == 0 or self.rng.random() > 0.05
+                members.append((user_id, role, joined))
+                member_rows.append({
+                    'group_id': group_id, 'user_id': user_id, 'role': role,
+                    'joined_at': joined, 'is_active': active, 'updated_at': joined,
+                })
+            admins = [m[0] for m in members if m[1] == 'admin']
+
+            outsiders = set()
+            for _ in range(self._poisson(max(0.5, size * 0.15))):
+                user_id = self.rng.randint(1, self.users)
+                if user_id in outsiders or user_id in member_ids:
+                    continue
+                outsiders.add(user_id)
+                requested = self._random_time(created, self.now)
+                status = self.rng.choices(('pending', 'approved', 'denied'), (0.5, 0.3, 0.2))[0]
+                responded = None if status == 'pending' else self._random_time(requested, self.now)
+                request_rows.append({
+                    'group_id': group_id, 'user_id': user_id, 'status': status,
+                    'message': 'Please let me join.' if self.rng.random() < 0.4 else None,
+                    'requested_at': requested, 'responded_at': responded,
+                    'responded_by_id': None if status == 'pending' else self.rng.choice(admins),
+                })
+                if status == 'approved':
+                    members.append((user_id, 'member', responded))
+                    member_rows.append({
+                        'group_id': group_id, 'user_id': user_id, 'role': 'member',
+                        'joined_at': responded, 'is_active': True, 'updated_at': responded,
+                    })
+
+            balance = 0.0
+            months = max(1.0, (self.now - created).days / 30.0)
+            n_tx = self._poisson(self.group_tx_per_month * months * min(4.0, size / 5.0) * self._activity())
+            times = sorted(self._random_time(created, self.now) for _ in range(n_tx))
+            for ts in times:
+                user_id, _, joined = self.rng.choice(members)
+                ts = max(ts, joined)
+                status = self.rng.choices(('approved', 'pending', 'denied'), (0.85, 0.1, 0.05))[0]
+                if self.rng.random() < 0.8 or balance <= 1:
+                    amount = round(self.rng.lognormvariate(3.5, 0.9), 2) + 0.01
+                else:
+                    amount = -round(min(balance, self.rng.lognormvariate(4.0, 1.0)), 2)
+                if amount == 0:
+                    continue
+                if status == 'approved':
+                    balance = round(balance + amount, 2)
+                tx_rows.append({
+                    'group_id': group_id, 'user_id': user_id, 'amount': amount,
+                    'description': 'Contribution' if amount > 0 else 'Expense',
+                    'occurred_at': ts, 'status': status,
+                    'approved_by_id': None if status == 'pending' else self.rng.choice(admins),
+                    'approved_at': None if status == 'pending' else ts + timedelta(hours=self.rng.randint(0, 72)),
+                })
+
+            for _ in range(self.rng.choice((0, 1, 2, 3, 4, 6))):
+                category = self.rng.choice(GOAL_CATEGORIES)
+                proposed = self._random_time(created, self.now)
+                status = self.rng.choices(('proposed', 'approved', 'denied'), (0.4, 0.4, 0.2))[0]
+                target = round(self.rng.lognormvariate(6.5, 1.0), 2) + 1.0
+                approved_at = None if status == 'proposed' else self._random_time(proposed, self.now)
+                goal_rows.append({
+                    'group_id': group_id, 'title': GOAL_TITLES[category],
+                    'description': f'Group goal for {category}.', 'target_amount': target,
+                    'deadline': proposed + timedelta(days=self.rng.randint(30, 540)) if self.rng.random() < 0.5 else None,
+                    'category': category, 'status': status,
+                    'proposer_id': self.rng.choice(members)[0],
+                    'approved_by_id': None if status == 'proposed' else self.rng.choice(admins),
+                    'approved_at': approved_at, 'created_at': proposed,
+                    'updated_at': approved_at or proposed,
+                })
+
+            group_rows.append({
+                'id': group_id, 'name': f'Group {group_id}',
+                'description': f'Synthetic savings group with {size} members.',
+                'created_at': created, 'currency': self.rng.choice(CURRENCIES),
+                'is_active': self.rng.random() > 0.03, 'is_open': self.rng.random() > 0.2,
+                'balance': max(0.0, balance),
+            })
+            if len(tx_rows) + len(member_rows) >= self.batch_size:
+                flush()
+        flush()
+
+    def run(self) -> Dict[str, int]:
+        with self.engine.begin() as conn:
+            self._conn = conn
+            self.seed_users()
+            self.seed_groups()
+        self._conn = None
+        return self.counts
+
+
+def _fast_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # The seeded file is disposable until the run finishes, so trade durability for speed.
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=OFF')
+    cursor.execute('PRAGMA synchronous=OFF')
+    cursor.execute('PRAGMA cache_size=-200000')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
+
+
+def create_schema(engine) -> None:
+    """Like metadata.create_all, but with each table's indexes created in name order (not set order), so dumps match."""
+    with engine.begin() as conn:
+        existing = set(inspect(conn).get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name in existing:
+                continue
+            conn.execute(CreateTable(table))
+            for index in sorted(table.indexes, key=lambda i: i.name):
+                index.create(conn)
+
+
+def build_engine(database_uri: str):
+    engine = create_engine(database_uri)
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _fast_sqlite_pragmas)
+    return engine
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Generate a synthetic FundFlow database for load testing')
+    parser.add_argument('--database', default=None,
+                        help='Target database URI (default: the app SQLALCHEMY_DATABASE_URI)')
+    parser.add_argument('--users', type=int, default=1000, help='Number of users to create')
+    parser.add_argument('--groups', type=int, default=100, help='Number of groups to create')
+    parser.add_argument('--years', type=float, default=2.0, help='Years of ledger history to generate')
+    parser.add_argument('--tx-per-month', type=float, default=6.0,
+                        help='Average personal savings changes per user per month')
+    parser.add_argument('--group-tx-per-month', type=float, default=20.0,
+                        help='Average transactions per (5-member) group per month')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed; equal seeds give equal databases')
+    parser.add_argument('--password', default='password', help='Password set on every seeded user')
+    parser.add_argument('--now', type=datetime.fromisoformat, default=None,
+                        help='Anchor date for generated history (default: today, midnight UTC)')
+    parser.add_argument('--batch-size', type=int, default=20000, help='Rows per bulk insert')
+    args = parser.parse_args(argv)
+
+    app = create_app(blueprints=False)
+    with app.app_context():
+        database_uri = args.database or str(db.engine.url)
+    engine = build_engine(database_uri)
+    create_schema(engine)
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(User.__table__)).scalar():
+            print(f"Refusing to seed {database_uri}: the user table is not empty.", file=sys.stderr)
+            return 1
+
+    seeder = Seeder(engine, seed=args.seed, users=args.users, groups=args.groups, years=args.years,
+                    tx_per_month=args.tx_per_month, group_tx_per_month=args.group_tx_per_month,
+                    password=args.password, batch_size=args.batch_size, now=args.now,
+                    rounds=app.config['BCRYPT_LOG_ROUNDS'])
+    started = time.perf_counter()
+    counts = seeder.run()
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    for table, count in sorted(counts.items()):
+        print(f"{table:>20}: {count}")
+    print(f"Seeded {total} rows into {database_uri} in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} rows/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Analytics results shared by all workers on a host.
+
+The savings rates and per-goal analytics behind the analytics pages and API
+are kept in a cache every worker process can read, so a group computed by one
+worker is not computed again by the next worker a request lands on:
+
+    value = analytics_cache.get(key, MISSING)
+    if value is MISSING:
+        value = compute()
+        analytics_cache.set(key, value)
+
+Keys are tuples that start with ``database_identity()`` and include the data
+version of what the value was computed from (see home.conditional), so
+nothing has to be invalidated: after a change the old entries are simply never
+asked for again and age out, and apps on different databases sharing a cache
+file never see each other's entries. Values must be JSON serializable; they
+are stored as JSON text.
+
+ANALYTICS_CACHE picks the backend:
+
+- ``sqlite`` (default): the SQLite file ANALYTICS_CACHE_DB, opened in WAL
+  mode so hits never wait for a writer. Entries expire after
+  ANALYTICS_CACHE_TTL seconds and the least recently used are evicted once
+  the stored values exceed ANALYTICS_CACHE_MAX_BYTES.
+- ``memory``: a per-process LRU (home.cache.TTLCache), not shared.
+- ``none``: no caching.
+
+The cache is an optimisation only: a backend error is logged and the value
+recomputed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Hashable
+
+from home import db
+from home.cache import TTLCache, per_app
+
+log = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+def database_identity() -> str:
+    """The current app's database URL, password hidden."""
+    return db.engine.url.render_as_string(hide_password=True)
+
+
+def _digest(key: Hashable) -> str:
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+class NullBackend:
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryBackend:
+    """Per-process backend; values are serialized too, so callers never share mutable results."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        data = self._cache.get(key)
+        return default if data is None else json.loads(data)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._cache.set(key, json.dumps(value))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+class SQLiteBackend:
+    """
+    Entries in one SQLite file, shared by every process that opens it.
+
+    ``accessed`` is refreshed at most every TOUCH_SECONDS per entry, so most
+    hits are a single indexed read. The byte total of the stored values is
+    kept in the ``usage`` row; a write that takes it over ``max_bytes`` drops
+    expired entries and then the least recently used down to
+    EVICT_TO * max_bytes.
+    """
+
+    TOUCH_SECONDS = 60
+    EVICT_TO = 0.9
+
+    def __init__(self, path: str, max_bytes: int, ttl: float, timeout: float = 2.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS entry ('
+                     'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+                     'accessed REAL NOT NULL, expires REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_entry_accessed ON entry (accessed)')
+        conn.execute('CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 1), bytes INTEGER NOT NULL)')
+        conn.execute('INSERT OR IGNORE INTO usage (id, bytes) VALUES (1, 0)')
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread and process; a forked worker must not reuse its parent's.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        digest = _digest(key)
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute('SELECT value, accessed, expires FROM entry WHERE key = ?', (digest,)).fetchone()
+            if row is None or row[2] < now:
+                return default
+            if now - row[1] > self.TOUCH_SECONDS:
+                conn.execute('UPDATE entry SET accessed = ? WHERE key = ?', (now, digest))
+            return json.loads(row[0])
+        except sqlite3.Error:
+            log.warning('Analytics cache read from %s failed', self.path, exc_info=True)
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        data = json.dumps(value)
+        size = len(data.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        digest = _digest(key)
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                old = conn.execute('SELECT size FROM entry WHERE key = ?', (digest,)).fetchone()
+                conn.execute('INSERT INTO entry (key, value, size, accessed, expires) VALUES (?, ?, ?, ?, ?) '
+                             'ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, '
+                             'accessed = excluded.accessed, expires = excluded.expires',
+                             (digest, data, size, now, now + self.ttl))
+                conn.execute('UPDATE usage SET bytes = bytes + ? WHERE id = 1', (size - (old[0] if old else 0),))
+                used = conn.execute('SELECT bytes FROM usage WHERE id = 1').fetchone()[0]
+                if used > self.max_bytes:
+                    self._evict(conn, used, now)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            log.warning('Analytics cache write to %s failed', self.path, exc_info=True)
+
+    def _evict(self, conn: sqlite3.Connection, used: int, now: float) -> None:
+        freed = conn.execute('SELECT total(size) FROM entry WHERE expires < ?', (now,)).fetchone()[0]
+        conn.execute('DELETE FROM entry WHERE expires < ?', (now,))
+        used -= int(freed)
+        target = int(self.max_bytes * self.EVICT_TO)
+        while used > target:
+            rows = conn.execute('SELECT key, size FROM entry ORDER BY accessed LIMIT 256').fetchall()
+            if not rows:
+                break
+            victims = []
+            for key, size in rows:
+                victims.append((key,))
+                used -= size
+                if used <= target:
+                    break
+            conn.executemany('DELETE FROM entry WHERE key = ?', victims)
+        conn.execute('UPDATE usage SET bytes = ? WHERE id = 1', (max(used, 0),))
+
+    def clear(self) -> None:
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM entry')
+        conn.execute('UPDATE usage SET bytes = 0 WHERE id = 1')
+        conn.execute('COMMIT')
+
+
+class AnalyticsCache:
+    def __init__(self):
+        self.backend = NullBackend()
+
+    def configure(self, app) -> None:
+        kind = app.config['ANALYTICS_CACHE']
+        if kind == 'sqlite':
+            self.backend = SQLiteBackend(app.config['ANALYTICS_CACHE_DB'], app.config['ANALYTICS_CACHE_MAX_BYTES'],
+                                         app.config['ANALYTICS_CACHE_TTL'])
+        elif kind == 'memory':
+            self.backend = MemoryBackend(app.config['ANALYTICS_CACHE_MAX_ENTRIES'], app.config['ANALYTICS_CACHE_TTL'])
+        elif kind in ('none', ''):
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f"ANALYTICS_CACHE must be 'sqlite', 'memory' or 'none', not {kind!r}")
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.backend.get(key, default)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.backend.set(key, value)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+def _app_cache(app) -> AnalyticsCache:
+    cache = AnalyticsCache()
+    cache.configure(app)
+    return cache
+
+
+analytics_cache = per_app('fundflow.analytics_cache', _app_cache)
+
+
+def init_app(app):
+    # Built now rather than on first use, so that a bad ANALYTICS_CACHE fails at startup.
+    app.extensions['fundflow.analytics_cache'] = _app_cache(app)
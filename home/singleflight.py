@@ -0,0 +1,172 @@
+"""
+Single-flight execution of expensive, deterministic computations.
+
+``single_flight(key, fn)`` runs ``fn`` once for any number of concurrent
+callers with the same key: the first caller in the process computes and the
+others block until it finishes and share its result (or its exception).
+Nothing is kept afterwards, so the key must identify the inputs completely,
+data version included; a call that starts after the computation finished runs
+it again.
+
+With a ``lock_dir`` the computing thread also takes an exclusive ``fcntl``
+lock on ``<lock_dir>/<key hash>.lock``, so that across pre-forked workers only
+one computes a key at a time. The winner leaves its JSON result next to the
+lock file for up to HANDOFF_SECONDS; a worker that was waiting for the lock
+reads it instead of computing again. Results must therefore be JSON
+serializable. Without ``fcntl`` (Windows), or when the lock is not obtained
+within ``lock_timeout`` seconds, the worker computes on its own.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+try:
+    import fcntl
+except ImportError:  # optional: no cross-process locking on this platform
+    fcntl = None
+
+HANDOFF_SECONDS = 60
+_PRUNE_INTERVAL = 300
+
+
+class _Call:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._last_prune = 0.0
+        self.computed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], lock_dir: Optional[str] = None,
+           lock_timeout: float = 10.0) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            if lock_dir and fcntl is not None:
+                call.value = self._locked(key, fn, lock_dir, lock_timeout)
+            else:
+                call.value = fn()
+                self.computed += 1
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _locked(self, key: Hashable, fn: Callable[[], Any], lock_dir: str, lock_timeout: float) -> Any:
+        os.makedirs(lock_dir, exist_ok=True)
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        result_path = os.path.join(lock_dir, f"{name}.json")
+        lock_file = _acquire(os.path.join(lock_dir, f"{name}.lock"), time.monotonic() + lock_timeout)
+        try:
+            handed_off = _read_result(result_path)
+            if handed_off is not None:
+                self.shared += 1
+                return handed_off[0]
+            value = fn()
+            self.computed += 1
+            if lock_file is not None:
+                _write_result(result_path, value)
+                self._prune(lock_dir)
+            return value
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    def _prune(self, lock_dir: str) -> None:
+        """Remove hand-off results and idle lock files of keys nobody asked for in a while."""
+        now = time.time()
+        if now - self._last_prune < _PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        for entry in os.scandir(lock_dir):
+            try:
+                if now - entry.stat().st_mtime <= _PRUNE_INTERVAL:
+                    continue
+                if not entry.name.endswith('.lock'):
+                    os.unlink(entry.path)
+                    continue
+                with open(entry.path, 'a+') as f:
+                    # Only unlink a lock nobody holds; waiters notice the unlink (see _acquire).
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+
+def _acquire(path: str, deadline: float):
+    """The open, exclusively locked lock file, or None once ``deadline`` has passed."""
+    while True:
+        lock_file = open(path, 'a+')
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    lock_file.close()
+                    return None
+                time.sleep(0.02)
+        try:
+            if os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                os.utime(path)
+                return lock_file
+        except FileNotFoundError:
+            pass
+        # Pruned while we waited: lock the new file instead.
+        lock_file.close()
+
+
+def _read_result(path: str) -> Optional[tuple]:
+    try:
+        if time.time() - os.path.getmtime(path) > HANDOFF_SECONDS:
+            return None
+        with open(path) as f:
+            return (json.load(f),)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_result(path: str, value: Any) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(value, f)
+    os.replace(tmp, path)
+
+
+_flights = SingleFlight()
+
+
+def single_flight(key: Hashable, fn: Callable[[], Any], lock_dir: Optional[str] = None,
+                  lock_timeout: float = 10.0) -> Any:
+    return _flights.do(key, fn, lock_dir, lock_timeout)
@@ -0,0 +1,117 @@
+"""
+Local stand-in SMTP server that accepts every message and keeps it.
+
+Run from project root:
+  python -m home.smtp_sink                         # listen on localhost:1025
+  python -m home.smtp_sink --port 2525 --mbox instance/sent.mbox
+
+Then start the app with MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=0.
+Each message is appended to the mbox file and summarised on stdout. Speaks
+just enough SMTP for smtplib/Flask-Mail (no TLS, no AUTH); never expose it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import mailbox
+import socketserver
+import threading
+from email import message_from_bytes
+from email.policy import default as default_policy
+from typing import Optional
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self) -> None:
+        self.reply('220 fundflow-sink ESMTP ready')
+        mail_from, rcpt_to = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.wfile.write(b'250-fundflow-sink\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n')
+            elif verb == 'HELO':
+                self.reply('250 fundflow-sink')
+            elif verb == 'MAIL':
+                mail_from, rcpt_to = command[10:].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                rcpt_to.append(command[8:].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                self.server.store(mail_from, rcpt_to, self.read_data())
+                mail_from, rcpt_to = None, []
+                self.reply('250 OK: queued')
+            elif verb == 'RSET':
+                mail_from, rcpt_to = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+    def read_data(self) -> bytes:
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                break
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        return b''.join(lines)
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, mbox_path: Optional[str] = None, quiet: bool = False):
+        super().__init__(address, SMTPSinkHandler)
+        self.mbox_path = mbox_path
+        self.quiet = quiet
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def store(self, mail_from, rcpt_to, data: bytes) -> None:
+        message = message_from_bytes(data, policy=default_policy)
+        with self._lock:
+            self.messages.append(message)
+            if self.mbox_path:
+                box = mailbox.mbox(self.mbox_path)
+                try:
+                    box.lock()
+                    box.add(message)
+                    box.flush()
+                finally:
+                    box.unlock()
+                    box.close()
+        if not self.quiet:
+            print(f"{mail_from} -> {', '.join(rcpt_to)}: {message['Subject']}", flush=True)
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description='Accept and store outgoing mail locally')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--mbox', default=None, help='Append received messages to this mbox file')
+    args = parser.parse_args(argv)
+
+    with SMTPSink((args.host, args.port), mbox_path=args.mbox) as server:
+        print(f"SMTP sink listening on {args.host}:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+// Fills in analytics from the JSON API after the page has rendered (see home/api.py).
+//
+// <div data-analytics-src="/api/v1/...">
+//   <p data-analytics-loading>Loading...</p>
+//   <p data-analytics-error hidden>Unavailable</p>
+//   <div data-analytics-scope="account" hidden> ... </div>
+//   <div data-analytics-scope="goal" data-goal-id="3" hidden> ... </div>
+// </div>
+//
+// Inside a scope, data-field="name" is replaced by the value (data-format="amount"
+// for two decimals) and data-show-if="name", "!name" or "name>0" hides the
+// element unless the condition holds.
+(function () {
+    function condition(expr, data) {
+        if (expr.charAt(0) === '!') {
+            return !condition(expr.slice(1), data);
+        }
+        var parts = expr.split('>');
+        var value = data[parts[0]];
+        if (parts.length > 1) {
+            return value !== null && value !== undefined && value > parseFloat(parts[1]);
+        }
+        return Boolean(value);
+    }
+
+    function format(value, kind) {
+        if (value === null || value === undefined) {
+            return '';
+        }
+        return kind === 'amount' ? Number(value).toFixed(2) : String(value);
+    }
+
+    function fill(scope, data) {
+        scope.querySelectorAll('[data-show-if]').forEach(function (el) {
+            el.hidden = !condition(el.getAttribute('data-show-if'), data);
+        });
+        scope.querySelectorAll('[data-field]').forEach(function (el) {
+            el.textContent = format(data[el.getAttribute('data-field')], el.getAttribute('data-format'));
+        });
+        scope.hidden = false;
+    }
+
+    function show(container, selector, visible) {
+        container.querySelectorAll(selector).forEach(function (el) {
+            el.hidden = !visible;
+        });
+    }
+
+    function load(container) {
+        fetch(container.getAttribute('data-analytics-src'), {headers: {'Accept': 'application/json'}})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(function (payload) {
+                var goals = payload.goal ? [payload.goal] : (payload.goals || []);
+                var byId = {};
+                goals.forEach(function (goal) {
+                    byId[goal.id] = goal.analytics;
+                });
+                container.querySelectorAll('[data-analytics-scope]').forEach(function (scope) {
+                    var data = scope.getAttribute('data-analytics-scope') === 'account'
+                        ? payload.account : byId[scope.getAttribute('data-goal-id')];
+                    if (data) {
+                        fill(scope, data);
+                    }
+                });
+                show(container, '[data-analytics-loading]', false);
+            })
+            .catch(function () {
+                show(container, '[data-analytics-loading]', false);
+                show(container, '[data-analytics-error]', true);
+            });
+    }
+
+    document.querySelectorAll('[data-analytics-src]').forEach(load);
+})();
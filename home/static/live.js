@@ -0,0 +1,132 @@
+// Keeps a group page current from its Server-Sent Events stream (see home/live.py).
+//
+// <div data-live-src="/groups/1/events" data-live-user="7">
+//   <span data-live-balance data-currency="USD">USD 10.00</span>
+//   <div data-live-list="transaction" data-live-status="pending">
+//     <div data-live-id="12"> ... </div>
+//   </div>
+//   <template data-live-template="transaction"> ... </template>
+//   <span data-live-count="transaction"></span>
+//   <div data-live-nonempty="transaction"> ... </div>
+//   <div data-live-empty="transaction"> ... </div>
+//   <div data-live-stale hidden> ... </div>
+// </div>
+//
+// An event whose status matches a list's data-live-status adds a row cloned
+// from the matching template (data-field, data-format and data-show-if as in
+// analytics.js, "{id}" in form actions replaced by the row id); any other
+// status removes the row. "resync" shows the data-live-stale element.
+(function () {
+    var RETRY_UNAVAILABLE_MS = 60000;
+
+    function condition(expr, data) {
+        if (expr.charAt(0) === '!') {
+            return !condition(expr.slice(1), data);
+        }
+        var parts = expr.split('>');
+        var value = data[parts[0]];
+        if (parts.length > 1) {
+            return value !== null && value !== undefined && value > parseFloat(parts[1]);
+        }
+        return Boolean(value);
+    }
+
+    function format(value, kind) {
+        if (value === null || value === undefined) {
+            return '';
+        }
+        if (kind === 'amount') {
+            return Number(value).toFixed(2);
+        }
+        if (kind === 'datetime') {
+            return String(value).slice(0, 16).replace('T', ' ');
+        }
+        return String(value);
+    }
+
+    function render(template, data) {
+        var row = template.content.firstElementChild.cloneNode(true);
+        var nodes = [row].concat(Array.prototype.slice.call(row.querySelectorAll('*')));
+        nodes.forEach(function (el) {
+            if (el.hasAttribute('data-show-if')) {
+                el.hidden = !condition(el.getAttribute('data-show-if'), data);
+            }
+            if (el.hasAttribute('data-field')) {
+                el.textContent = format(data[el.getAttribute('data-field')], el.getAttribute('data-format'));
+            }
+            if (el.hasAttribute('action')) {
+                el.setAttribute('action', el.getAttribute('action').replace('{id}', data.id));
+            }
+        });
+        row.setAttribute('data-live-id', data.id);
+        return row;
+    }
+
+    function refreshCounts(root, type) {
+        var count = 0;
+        root.querySelectorAll('[data-live-list="' + type + '"]').forEach(function (list) {
+            count += list.querySelectorAll('[data-live-id]').length;
+        });
+        root.querySelectorAll('[data-live-count="' + type + '"]').forEach(function (el) {
+            el.textContent = count;
+        });
+        root.querySelectorAll('[data-live-nonempty~="' + type + '"]').forEach(function (el) {
+            var types = el.getAttribute('data-live-nonempty').split(' ');
+            el.hidden = !types.some(function (t) {
+                return root.querySelector('[data-live-list="' + t + '"] [data-live-id]');
+            });
+        });
+        root.querySelectorAll('[data-live-empty="' + type + '"]').forEach(function (el) {
+            el.hidden = count > 0;
+        });
+    }
+
+    function apply(root, type, data) {
+        data.mine = String(data.user_id || data.proposer_id) === root.getAttribute('data-live-user');
+        data.abs_amount = Math.abs(data.amount || 0);
+        var template = root.querySelector('template[data-live-template="' + type + '"]');
+        root.querySelectorAll('[data-live-list="' + type + '"]').forEach(function (list) {
+            var existing = list.querySelector('[data-live-id="' + data.id + '"]');
+            if (existing) {
+                existing.remove();
+            }
+            if (template && data.status === list.getAttribute('data-live-status')) {
+                list.insertBefore(render(template, data), list.firstChild);
+            }
+        });
+        refreshCounts(root, type);
+    }
+
+    function connect(root) {
+        var source = new EventSource(root.getAttribute('data-live-src'));
+        ['transaction', 'goal', 'join_request'].forEach(function (type) {
+            source.addEventListener(type, function (e) {
+                apply(root, type, JSON.parse(e.data));
+            });
+        });
+        source.addEventListener('balance', function (e) {
+            var balance = JSON.parse(e.data).balance;
+            root.querySelectorAll('[data-live-balance]').forEach(function (el) {
+                el.textContent = el.getAttribute('data-currency') + ' ' + format(balance, 'amount');
+            });
+        });
+        source.addEventListener('resync', function () {
+            root.querySelectorAll('[data-live-stale]').forEach(function (el) {
+                el.hidden = false;
+            });
+        });
+        source.onerror = function () {
+            // EventSource retries on its own after a dropped connection, but
+            // gives up on an error status (503 when the server is out of slots).
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(function () {
+                    connect(root);
+                }, RETRY_UNAVAILABLE_MS);
+            }
+        };
+    }
+
+    if (window.EventSource) {
+        document.querySelectorAll('[data-live-src]').forEach(connect);
+    }
+})();
@@ -0,0 +1,247 @@
+"""
+Bulk, idempotent group transaction submission.
+
+``submit_group_transactions`` writes a batch of entries for one member of a
+group. Every entry carries a client-chosen idempotency key, unique per
+(group, user) through the uq_group_transaction_idempotency index, so a retried
+batch (timeout, lost response, double tap) cannot create duplicates:
+
+- rows go in with INSERT ... ON CONFLICT DO NOTHING RETURNING, executed as a
+  few multi-row statements by SQLAlchemy's insertmanyvalues batching rather
+  than one statement per entry;
+- only the rows that were actually inserted come back from RETURNING, so for
+  admin-approved entries the balance delta is their sum, applied with a
+  single ``UPDATE group SET balance = balance + :delta`` in the same
+  transaction. A replay inserts nothing and moves the balance by zero.
+
+Entries from admins are approved on the spot, like the form; everyone
+else's wait for approval. Keys are remembered for as long as the row is live
+(home.retention eventually archives approved rows).
+
+ON CONFLICT ... RETURNING is used on SQLite 3.35+ and PostgreSQL. Other
+backends look up the keys already taken and insert the rest one by one, each
+in a savepoint, so a key inserted concurrently in between fails on the unique
+index and is reported as a duplicate.
+"""
+
+from __future__ import annotations
+
+import math
+from collections import namedtuple
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from home import db, live
+from home.events import GroupChanged, GroupLedgerChanged, emit
+from home.db_models import Group, GroupTransaction
+
+MAX_KEY_LENGTH = 64
+MAX_DESCRIPTION_LENGTH = 2000
+_LOOKUP_CHUNK = 500
+# Larger batches are announced to live group pages as one resync, not row by row.
+_LIVE_EVENT_ROWS = 50
+
+
+class InvalidEntries(ValueError):
+    """The batch was rejected as a whole; ``errors`` maps entry index -> message."""
+
+    def __init__(self, errors: Dict[int, str]):
+        super().__init__(f'{len(errors)} invalid entries')
+        self.errors = errors
+
+
+@dataclass
+class SubmitResult:
+    """Per-entry outcome in input order, plus the balance change this call applied."""
+    entries: List[dict] = field(default_factory=list)
+    created: int = 0
+    duplicates: int = 0
+    balance_delta: float = 0.0
+    balance: Optional[float] = None
+
+
+Inserted = namedtuple('Inserted', ['id', 'idempotency_key', 'amount', 'status'])
+
+
+def _insert(dialect: str):
+    """The dialect's INSERT with on_conflict_do_nothing, or None."""
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+
+def _lookup(group_id: int, user_id: int, keys: List[str]) -> dict:
+    """idempotency_key -> (id, idempotency_key, status) of the member's rows holding ``keys``."""
+    table = GroupTransaction.__table__
+    found = {}
+    for start in range(0, len(keys), _LOOKUP_CHUNK):
+        for row in db.session.execute(
+                select(table.c.id, table.c.idempotency_key, table.c.status)
+                .where(table.c.group_id == group_id, table.c.user_id == user_id,
+                       table.c.idempotency_key.in_(keys[start:start + _LOOKUP_CHUNK]))):
+            found[row.idempotency_key] = row
+    return found
+
+
+def _insert_new(group_id: int, user_id: int, rows: List[dict]) -> Dict[str, Inserted]:
+    """Insert the rows whose key is not taken yet; idempotency_key -> Inserted for those."""
+    table = GroupTransaction.__table__
+    dialect = db.session.get_bind(mapper=GroupTransaction).dialect
+    insert = _insert(dialect.name)
+    if insert is not None and dialect.insert_returning:
+        stmt = insert(table).on_conflict_do_nothing(
+            index_elements=['group_id', 'user_id', 'idempotency_key']
+        ).returning(table.c.id, table.c.idempotency_key, table.c.amount, table.c.status)
+        return {row.idempotency_key: Inserted(*row) for row in db.session.execute(stmt, rows)}
+    taken = _lookup(group_id, user_id, [row['idempotency_key'] for row in rows])
+    inserted = {}
+    for row in rows:
+        if row['idempotency_key'] in taken:
+            continue
+        try:
+            # A savepoint per row, so a key taken concurrently since the lookup is a duplicate, not an error.
+            with db.session.begin_nested():
+                new_id = db.session.execute(table.insert().values(**row)).inserted_primary_key[0]
+        except IntegrityError:
+            continue
+        inserted[row['idempotency_key']] = Inserted(new_id, row['idempotency_key'], row['amount'], row['status'])
+    return inserted
+
+
+def _parse_occurred_at(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    occurred_at = datetime.fromisoformat(value)
+    if occurred_at.tzinfo is not None:
+        # Stored naive UTC, like the rest of the ledger.
+        occurred_at = datetime.utcfromtimestamp(occurred_at.timestamp())
+    return occurred_at
+
+
+def _add_to_balance(group_id: int, delta: float) -> float:
+    """Add ``delta`` to the group's balance in one UPDATE; the new balance."""
+    table = Group.__table__
+    stmt = update(table).where(table.c.id == group_id).values(balance=table.c.balance + delta)
+    if db.session.get_bind(mapper=Group).dialect.update_returning:
+        return float(db.session.execute(stmt.returning(table.c.balance)).scalar_one())
+    db.session.execute(stmt)
+    return float(db.session.execute(select(table.c.balance).where(table.c.id == group_id)).scalar_one())
+
+
+def validate_entries(entries) -> List[dict]:
+    """
+    Check a list of {"idempotency_key", "amount", "description", "occurred_at"?}
+    entries and return them normalized. Raises InvalidEntries listing every bad entry.
+    """
+    errors: Dict[int, str] = {}
+    rows: List[dict] = []
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            errors[i] = 'Entry must be an object.'
+            continue
+        key = entry.get('idempotency_key')
+        amount = entry.get('amount')
+        description = entry.get('description')
+        if not isinstance(key, str) or not 0 < len(key) <= MAX_KEY_LENGTH:
+            errors[i] = f'idempotency_key must be a string of 1 to {MAX_KEY_LENGTH} characters.'
+        elif isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount) \
+                or amount < 0.01:
+            errors[i] = 'amount must be a number of at least 0.01.'
+        elif not isinstance(description, str) or not description.strip() \
+                or len(description) > MAX_DESCRIPTION_LENGTH:
+            errors[i] = f'description is required (at most {MAX_DESCRIPTION_LENGTH} characters).'
+        else:
+            try:
+                occurred_at = _parse_occurred_at(entry.get('occurred_at'))
+            except (TypeError, ValueError):
+                errors[i] = 'occurred_at must be an ISO 8601 date and time.'
+                continue
+            rows.append({'idempotency_key': key, 'amount': float(amount), 'description': description,
+                         'occurred_at': occurred_at})
+    if errors:
+        raise InvalidEntries(errors)
+    return rows
+
+
+def _record_live_events(group_id: int, rows: List[dict], inserted: dict) -> None:
+    # Core inserts bypass the flush, where home.live collects row events.
+    if len(inserted) > _LIVE_EVENT_ROWS:
+        live.record(db.session, group_id, {'type': 'resync', 'data': {}})
+        return
+    for row in rows:
+        if row['idempotency_key'] in inserted:
+            tx = GroupTransaction(**row, id=inserted[row['idempotency_key']].id)
+            live.record(db.session, group_id, live.transaction_event(tx))
+
+
+def submit_group_transactions(group: Group, user_id: int, entries: List[dict], approve: bool) -> SubmitResult:
+    """
+    Insert validated ``entries`` for ``user_id`` in ``group`` and commit.
+
+    Entries whose key was seen before (in an earlier call or earlier in this
+    batch) are reported as duplicates with the id and status of the row that
+    holds the key; nothing about them changes.
+    """
+    now = datetime.utcnow()
+    rows = []
+    seen = set()
+    for entry in entries:
+        if entry['idempotency_key'] in seen:
+            continue
+        seen.add(entry['idempotency_key'])
+        rows.append({
+            'group_id': group.id,
+            'user_id': user_id,
+            'amount': entry['amount'],
+            'description': entry['description'],
+            'occurred_at': entry['occurred_at'] or now,
+            'status': 'approved' if approve else 'pending',
+            'approved_by_id': user_id if approve else None,
+            'approved_at': now if approve else None,
+            'idempotency_key': entry['idempotency_key'],
+        })
+
+    result = SubmitResult()
+    try:
+        inserted = {}
+        if rows:
+            inserted = _insert_new(group.id, user_id, rows)
+            if inserted:
+                emit(db.session, GroupLedgerChanged(group.id))
+            if approve and inserted:
+                result.balance_delta = float(sum(row.amount for row in inserted.values()))
+                result.balance = _add_to_balance(group.id, result.balance_delta)
+                emit(db.session, GroupChanged(group.id))
+                live.record(db.session, group.id, live.balance_event(result.balance))
+            _record_live_events(group.id, rows, inserted)
+
+        existing = _lookup(group.id, user_id, [key for key in seen if key not in inserted])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    reported = set()
+    for entry in entries:
+        key = entry['idempotency_key']
+        created = key in inserted and key not in reported
+        reported.add(key)
+        row = inserted.get(key) or existing.get(key)
+        result.entries.append({'idempotency_key': key, 'created': created,
+                               'id': row.id if row is not None else None,
+                               'status': row.status if row is not None else None})
+        if created:
+            result.created += 1
+        else:
+            result.duplicates += 1
+    if result.balance is None:
+        result.balance = float(group.balance or 0.0)
+    return result
@@ -0,0 +1,401 @@
+"""
+Production server: a pre-forking master with threaded workers.
+
+Run from project root:
+  python serve.py --bind 0.0.0.0:8000 --workers 4 --threads 8
+  python serve.py --workers 4 --preload --max-requests 2000
+
+The master binds the listening socket and forks --workers processes that all
+accept on it. Each worker serves up to --threads requests at once from a
+thread pool; a worker whose threads are all busy stops accepting, so new
+connections go to an idle sibling. Workers are plain WSGI servers built on
+werkzeug's request handler (HTTP/1.1 with keep-alive), so nothing beyond the
+app's own dependencies is needed.
+
+--preload creates the app once in the master before forking. Imports,
+compiled templates and the static file manifest are then shared copy-on-write
+by all workers, and an app that fails to start fails before any worker is
+forked. Without it every worker creates its own app and the master never
+imports the application code.
+
+--max-requests recycles a worker after that many requests (plus a random
+0..--max-requests-jitter, so workers do not restart together): it stops
+accepting, finishes its in-flight requests and exits, and the master forks a
+replacement. This bounds slow memory growth.
+
+Signals to the master:
+  HUP        Zero-downtime reload. A new generation of workers is started with
+             the code on disk; the old workers are stopped gracefully once all
+             new ones are serving. If they do not come up within --timeout
+             the old ones are kept. With --preload the master first re-executes
+             itself (same pid, same listening socket, fresh code and options;
+             --bind is kept) and then does the same.
+  TERM, INT  Graceful shutdown: workers finish in-flight requests, waiting at
+             most --graceful-timeout seconds, then exit.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import os
+import random
+import select
+import selectors
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+LISTEN_FD_ENV = 'FUNDFLOW_LISTEN_FD'
+OLD_WORKERS_ENV = 'FUNDFLOW_OLD_WORKERS'
+
+log = logging.getLogger('serve')
+
+
+class RequestHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def handle_one_request(self):
+        self.raw_requestline = b''
+        super().handle_one_request()
+        if self.raw_requestline and self.server.request_done():
+            # Retiring or shutting down: do not wait for another request on this connection.
+            self.close_connection = True
+
+    def log_request(self, code='-', size='-'):
+        if self.server.access_log:
+            super().log_request(code, size)
+
+    def log_error(self, format, *args):
+        # An idle keep-alive connection running into its timeout is not an error.
+        if not format.startswith('Request timed out'):
+            super().log_error(format, *args)
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Serves the inherited listening socket with a fixed number of threads."""
+
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, sock: socket.socket, app, threads: int, max_requests: int = 0,
+                 keep_alive: float = 5.0, access_log: bool = False):
+        host, port = sock.getsockname()[:2]
+        handler = type('Handler', (RequestHandler,), {'timeout': keep_alive})
+        super().__init__(host, port, app, handler=handler, fd=sock.fileno())
+        # Siblings accept on the same socket: a connection another worker took must not block us.
+        self.socket.setblocking(False)
+        self.max_requests = max_requests
+        self.access_log = access_log
+        self.stopping = False
+        self.handled = 0
+        self._count_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(threads)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+
+    def request_done(self) -> bool:
+        """Count a served request; True once the worker should stop taking more."""
+        with self._count_lock:
+            self.handled += 1
+            if self.max_requests and self.handled >= self.max_requests and not self.stopping:
+                log.info('Worker %d served %d requests, recycling', os.getpid(), self.handled)
+                self.stopping = True
+        return self.stopping
+
+    def process_request(self, request, client_address):
+        # Blocks the accept loop while every thread is busy, leaving the connection to a sibling.
+        self._slots.acquire()
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def serve(self) -> None:
+        parent = os.getppid()
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.socket, selectors.EVENT_READ)
+            while not self.stopping:
+                if selector.select(0.5):
+                    try:
+                        request, client_address = self.get_request()
+                    except (BlockingIOError, InterruptedError):
+                        continue   # a sibling was faster
+                    self.process_request(request, client_address)
+                if os.getppid() != parent:
+                    log.warning('Master %d went away, worker %d stopping', parent, os.getpid())
+                    self.stopping = True
+        self._pool.shutdown(wait=True)
+        self.server_close()
+
+
+def parse_bind(bind: str) -> Tuple[str, int]:
+    host, _, port = bind.rpartition(':')
+    return host.strip('[]') or '127.0.0.1', int(port)
+
+
+def listen(bind: str, backlog: int) -> socket.socket:
+    """The listening socket, inherited from the previous master after a reload."""
+    if os.environ.get(LISTEN_FD_ENV):
+        sock = socket.socket(fileno=int(os.environ.pop(LISTEN_FD_ENV)))
+    else:
+        host, port = parse_bind(bind)
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        sock = socket.create_server((host, port), family=family, backlog=backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def load_app():
+    from home import create_app
+    return create_app()
+
+
+def run_worker(sock: socket.socket, app, args, ready_fd: int) -> int:
+    random.seed()
+    try:
+        if app is None:
+            app = load_app()
+        max_requests = args.max_requests + random.randint(0, args.max_requests_jitter) if args.max_requests else 0
+        server = PooledWSGIServer(sock, app, args.threads, max_requests, args.keep_alive, args.access_log)
+    except Exception:
+        log.exception('Worker %d failed to start', os.getpid())
+        return 1
+
+    def _stop(signum, frame):
+        server.stopping = True
+    signal.signal(signal.SIGTERM, _stop)
+
+    os.write(ready_fd, b'.')
+    os.close(ready_fd)
+    server.serve()
+    return 0
+
+
+class Master:
+    def __init__(self, args, sock: socket.socket):
+        self.args = args
+        self.sock = sock
+        self.app = None
+        self.generation = 0
+        self.workers: Dict[int, Tuple[int, float]] = {}   # pid -> (generation, started at)
+        self.stopping = False
+        self.reload_requested = False
+        self.spawn_failures = 0
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+
+    # -- signals -------------------------------------------------------------
+
+    def _on_signal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self.reload_requested = True
+        elif signum in (signal.SIGTERM, signal.SIGINT):
+            self.stopping = True
+        try:
+            os.write(self._wakeup_w, b'!')
+        except BlockingIOError:
+            pass
+
+    def install_signals(self) -> None:
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+
+    # -- workers -------------------------------------------------------------
+
+    def spawn(self, ready_w: Optional[int] = None) -> int:
+        # Replacements for recycled workers report readiness to nobody.
+        own_fd = ready_w is None
+        if own_fd:
+            ready_w = os.open(os.devnull, os.O_WRONLY)
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl-C reaches the master, which sends TERM
+                signal.signal(signal.SIGHUP, signal.SIG_IGN)
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                os.close(self._wakeup_r)
+                os.close(self._wakeup_w)
+                code = run_worker(self.sock, self.app, self.args, ready_w)
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        if own_fd:
+            os.close(ready_w)
+        self.workers[pid] = (self.generation, time.monotonic())
+        return pid
+
+    def start_generation(self) -> bool:
+        """Fork a full set of workers; True once all of them are serving."""
+        self.generation += 1
+        ready_r, ready_w = os.pipe()
+        for _ in range(self.args.workers):
+            self.spawn(ready_w)
+        os.close(ready_w)
+        ready = 0
+        deadline = time.monotonic() + self.args.timeout
+        try:
+            while ready < self.args.workers and time.monotonic() < deadline and not self.stopping:
+                readable, _, _ = select.select([ready_r], [], [], 0.2)
+                if readable:
+                    data = os.read(ready_r, 64)
+                    if not data:
+                        break   # every new worker exited or is serving
+                    ready += len(data)
+                self.reap(respawn=False)
+        finally:
+            os.close(ready_r)
+        if ready < self.args.workers:
+            log.error('Only %d of %d workers of generation %d started; keeping the previous workers',
+                      ready, self.args.workers, self.generation)
+            self.stop_workers(lambda gen: gen == self.generation)
+            self.generation -= 1
+            return False
+        log.info('Generation %d serving with %d workers x %d threads',
+                 self.generation, self.args.workers, self.args.threads)
+        self.stop_workers(lambda gen: gen < self.generation, wait=False)
+        return True
+
+    def stop_workers(self, which, wait: bool = True) -> None:
+        pids = [pid for pid, (gen, _) in self.workers.items() if which(gen)]
+        for pid in pids:
+            self._kill(pid, signal.SIGTERM)
+        if not wait:
+            return
+        deadline = time.monotonic() + self.args.graceful_timeout
+        while any(pid in self.workers for pid in pids) and time.monotonic() < deadline:
+            self.reap(respawn=False)
+            time.sleep(0.05)
+        for pid in pids:
+            if pid in self.workers:
+                log.warning('Worker %d did not stop in time, killing it', pid)
+                self._kill(pid, signal.SIGKILL)
+        while any(pid in self.workers for pid in pids):
+            self.reap(respawn=False)
+            time.sleep(0.05)
+
+    def _kill(self, pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            self.workers.pop(pid, None)
+
+    def reap(self, respawn: bool = True) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation, started = self.workers.pop(pid, (None, 0.0))
+            if generation != self.generation or not respawn or self.stopping:
+                continue
+            # Replace recycled or crashed workers of the current generation.
+            if status != 0 and time.monotonic() - started < 1.0:
+                self.spawn_failures += 1
+                log.warning('Worker %d exited right after starting (status %d)', pid, status)
+                time.sleep(min(self.spawn_failures, 10))
+            else:
+                self.spawn_failures = 0
+            self.spawn()
+
+    # -- main loop -----------------------------------------------------------
+
+    def adopt_previous_workers(self) -> None:
+        """Workers of the master we were re-executed from are still our children."""
+        pids = os.environ.pop(OLD_WORKERS_ENV, '')
+        for pid in filter(None, pids.split(',')):
+            self.workers[int(pid)] = (self.generation, 0.0)
+
+    def preload(self) -> bool:
+        try:
+            self.app = load_app()
+        except Exception:
+            log.exception('Could not preload the app')
+            return False
+        # Keep the preloaded objects out of the collector so workers do not copy the pages they live on.
+        gc.collect()
+        gc.freeze()
+        return True
+
+    def reexec(self) -> None:
+        log.info('Re-executing the master to load new code')
+        env = dict(os.environ)
+        env[LISTEN_FD_ENV] = str(self.sock.fileno())
+        env[OLD_WORKERS_ENV] = ','.join(str(pid) for pid in self.workers)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execve(sys.executable, [sys.executable] + sys.argv, env)
+
+    def run(self) -> int:
+        self.install_signals()
+        self.adopt_previous_workers()
+        if self.args.preload and not self.preload():
+            if not self.workers:
+                return 1
+            log.error('Keeping the previous workers; fix the app and send HUP again')
+        elif not self.start_generation() and not self.workers:
+            return 1
+
+        while not self.stopping:
+            select.select([self._wakeup_r], [], [], 1.0)
+            try:
+                os.read(self._wakeup_r, 64)
+            except BlockingIOError:
+                pass
+            if self.reload_requested and not self.stopping:
+                self.reload_requested = False
+                if self.args.preload:
+                    self.reexec()
+                self.start_generation()
+            self.reap(respawn=self.app is not None or not self.args.preload)
+
+        log.info('Shutting down %d workers', len(self.workers))
+        self.stop_workers(lambda gen: True)
+        return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Serve FundFlow with pre-forked, threaded workers')
+    parser.add_argument('--bind', default=os.environ.get('BIND', '127.0.0.1:8000'), help='host:port to listen on')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1)),
+                        help='Worker processes (default: WEB_CONCURRENCY or the CPU count)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 8)),
+                        help='Requests served concurrently per worker')
+    parser.add_argument('--preload', action='store_true', help='Create the app in the master before forking')
+    parser.add_argument('--max-requests', type=int, default=0, help='Recycle a worker after this many requests (0: never)')
+    parser.add_argument('--max-requests-jitter', type=int, default=0, help='Random extra requests per worker')
+    parser.add_argument('--keep-alive', type=float, default=5.0, help='Seconds to wait for the next request on a connection')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Seconds new workers get to start serving')
+    parser.add_argument('--graceful-timeout', type=float, default=30.0, help='Seconds workers get to finish on stop')
+    parser.add_argument('--backlog', type=int, default=2048, help='Listen backlog')
+    parser.add_argument('--access-log', action='store_true', help='Log every request')
+    args = parser.parse_args(argv)
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s [%(process)d] %(message)s'))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    sock = listen(args.bind, args.backlog)
+    log.info('Listening on %s:%s', *sock.getsockname()[:2])
+    return Master(args, sock).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Fixtures for app level tests: a full app on a primary SQLite file with a
+replica file (see home.database), holding one group with an admin, a member
+and a pending transaction. Everything the app writes goes under tmp_path.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from collections import defaultdict
+
+import pytest
+from sqlalchemy import event
+
+from home import create_app, db
+from home.database import REPLICA_BIND
+from home.db_models import Group, GroupMember, GroupTransaction, User
+from home.passwords import hash_password
+from home.replica import sync_replica
+
+PASSWORD = 'password'
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {'primary': str(tmp_path / 'primary.db'), 'replica': str(tmp_path / 'replica.db')}
+
+
+@pytest.fixture
+def app_config():
+    """Config overrides for the app; override this fixture in a test module to change them."""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, paths, app_config):
+    app = create_app({
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{paths['primary']}",
+        'SQLALCHEMY_BINDS': {REPLICA_BIND: f"sqlite:///{paths['replica']}"},
+        'BCRYPT_LOG_ROUNDS': 4,
+        'MAIL_OUTBOX_WORKER': False,
+        'RATE_LIMITS': '',
+        'RATE_LIMITS_GLOBAL': '',
+        'RATE_LIMIT_DB': str(tmp_path / 'ratelimit.db'),
+        'LOAD_SHED_INFLIGHT': 0,
+        'ANALYTICS_CACHE': 'none',
+        'ANALYTICS_CACHE_DB': str(tmp_path / 'analytics_cache.db'),
+        'ANALYTICS_LOCK_DIR': '',
+        'LEDGER_ARCHIVE_DIR': str(tmp_path / 'archive'),
+        'PROFILE_PICTURE_SPOOL': str(tmp_path / 'picture_queue'),
+        'ASSET_CACHE_DIR': str(tmp_path / 'assets'),
+        **app_config,
+    })
+    with app.app_context():
+        db.create_all(bind_key=None)
+        password = hash_password(PASSWORD, rounds=4)
+        admin = User(username='admin', email='admin@example.com', password=password, savings=100.0)
+        member = User(username='member', email='member@example.com', password=password, savings=50.0)
+        group = Group(name='Trip', balance=0.0)
+        db.session.add_all([admin, member, group])
+        db.session.flush()
+        db.session.add_all([
+            GroupMember(group_id=group.id, user_id=admin.id, role='admin'),
+            GroupMember(group_id=group.id, user_id=member.id, role='member'),
+            GroupTransaction(group_id=group.id, user_id=member.id, amount=20.0, status='pending'),
+        ])
+        db.session.commit()
+        db.session.remove()
+    sync_replica(paths['primary'], paths['replica'])
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def ids(app):
+    with app.app_context():
+        group = Group.query.one()
+        return {
+            'group': group.id,
+            'admin': User.query.filter_by(username='admin').one().id,
+            'member': User.query.filter_by(username='member').one().id,
+            'member_row': GroupMember.query.filter_by(role='member').one().id,
+            'transaction': GroupTransaction.query.one().id,
+        }
+
+
+@pytest.fixture
+def statements(app):
+    """Bind name ('primary' or 'replica') -> SQL statements run on it since the last clear()."""
+    seen = defaultdict(list)
+    with app.app_context():
+        for key, engine in db.engines.items():
+            name = REPLICA_BIND if key == REPLICA_BIND else 'primary'
+            event.listen(engine, 'before_cursor_execute',
+                         lambda conn, cursor, statement, *args, name=name: seen[name].append(statement))
+    return seen
+
+
+class Files:
+    """Direct access to the database files, to change them behind the app's back like another worker would."""
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def execute(self, name, sql, *params):
+        conn = sqlite3.connect(self.paths[name])
+        try:
+            conn.execute(sql, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def fetch(self, name, sql, *params):
+        conn = sqlite3.connect(self.paths[name])
+        try:
+            return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    def sync(self):
+        sync_replica(self.paths['primary'], self.paths['replica'])
+
+
+@pytest.fixture
+def files(paths):
+    return Files(paths)
+
+
+@pytest.fixture
+def login(app):
+    def login(email):
+        client = app.test_client()
+        # Following the redirect home also shows (and clears) the login flash.
+        response = client.post('/login', data={'email': email, 'password': PASSWORD}, follow_redirects=True)
+        assert response.request.path == '/'
+        return client
+    return login
@@ -0,0 +1,62 @@
+"""The per-app user and membership caches are never trusted for writes and are dropped on change."""
+
+from __future__ import annotations
+
+from home.db_models import user_cache
+from home.permissions import membership_cache
+
+SAVINGS = 'SELECT savings FROM user WHERE username = ?'
+
+
+def test_write_reloads_cached_user(login, files):
+    client = login('member@example.com')
+    client.get('/dashboard')
+    # Another worker changes the row after this one cached it.
+    files.execute('primary', "UPDATE user SET savings = 1000 WHERE username = 'member'")
+
+    client.post('/adjust_savings', data={'amount': '10', 'operation': 'add'})
+
+    assert files.fetch('primary', SAVINGS, 'member') == (1010.0,)
+
+
+def test_user_change_drops_cached_user(app, login, ids):
+    client = login('member@example.com')
+    client.get('/dashboard')
+    with app.app_context():
+        assert user_cache.get(ids['member'])['savings'] == 50.0
+
+    client.post('/adjust_savings', data={'amount': '10', 'operation': 'add'})
+    with app.app_context():
+        assert user_cache.get(ids['member']) is None
+
+    client.get('/dashboard')
+    with app.app_context():
+        assert user_cache.get(ids['member'])['savings'] == 60.0
+
+
+def test_demoted_admin_loses_admin_rights(login, files, ids):
+    client = login('admin@example.com')
+    group_id = ids['group']
+    assert client.get(f'/groups/{group_id}').status_code == 200
+    assert client.get(f'/groups/{group_id}/join-requests').status_code == 200
+    # Demoted by another worker; the demotion has reached the replica too.
+    for name in ('primary', 'replica'):
+        files.execute(name, "UPDATE group_member SET role = 'member' WHERE user_id = ?", ids['admin'])
+
+    assert client.get(f'/groups/{group_id}/join-requests').status_code == 403
+    assert client.post(f"/groups/{group_id}/transactions/{ids['transaction']}/approve").status_code == 403
+    assert files.fetch('primary', 'SELECT status FROM group_transaction WHERE id = ?',
+                       ids['transaction']) == ('pending',)
+
+
+def test_membership_change_drops_cached_membership(app, login, ids):
+    member = login('member@example.com')
+    admin = login('admin@example.com')
+    group_id = ids['group']
+    assert member.get(f'/groups/{group_id}').status_code == 200
+    with app.app_context():
+        assert membership_cache.get((ids['member'], group_id))['is_active']
+
+    assert admin.post(f"/groups/{group_id}/members/{ids['member_row']}/remove").status_code == 302
+    with app.app_context():
+        assert membership_cache.get((ids['member'], group_id)) is None
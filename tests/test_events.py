@@ -0,0 +1,65 @@
+"""Commit-time change events (home.events) across savepoints."""
+
+from __future__ import annotations
+
+import pytest
+
+from home import db, events, live
+from home.db_models import GroupTransaction, User
+from home.events import GroupLedgerChanged, UserChanged
+
+
+@pytest.fixture
+def received(app, monkeypatch):
+    seen = []
+    monkeypatch.setattr(events, '_subscribers', list(events._subscribers))
+    events.subscribe(events.Event, seen.append)
+    with app.app_context():
+        yield seen
+        db.session.remove()
+
+
+def add_transaction(ids):
+    db.session.add(GroupTransaction(group_id=ids['group'], user_id=ids['member'], amount=5.0))
+    db.session.flush()
+
+
+def test_savepoint_rollback_keeps_outer_events(ids, received):
+    sub, _ = live.broker.subscribe(ids['group'], admin=True)
+    add_transaction(ids)
+    db.session.begin_nested().rollback()
+    db.session.commit()
+
+    assert GroupLedgerChanged(ids['group']) in received
+    assert sub.queue.get_nowait()['type'] == 'transaction'
+    sub.close()
+
+
+def test_savepoint_rollback_drops_its_own_events(ids, received):
+    add_transaction(ids)
+    savepoint = db.session.begin_nested()
+    db.session.get(User, ids['member']).savings = 1.0
+    db.session.flush()
+    savepoint.rollback()
+    db.session.commit()
+
+    assert GroupLedgerChanged(ids['group']) in received
+    assert UserChanged(ids['member']) not in received
+
+
+def test_released_savepoint_events_wait_for_commit(ids, received):
+    with db.session.begin_nested():
+        db.session.get(User, ids['member']).savings = 1.0
+    assert received == []
+
+    db.session.commit()
+    assert UserChanged(ids['member']) in received
+
+
+def test_rollback_drops_released_savepoint_events(ids, received):
+    with db.session.begin_nested():
+        db.session.get(User, ids['member']).savings = 1.0
+    db.session.rollback()
+    db.session.commit()
+
+    assert received == []
@@ -0,0 +1,112 @@
+"""Idempotent bulk submission of group transactions (home.transactions, POST /api/v1/groups/<id>/transactions)."""
+
+from __future__ import annotations
+
+import pytest
+
+from home import live, transactions
+
+BALANCE = 'SELECT balance FROM "group" WHERE id = ?'
+ROWS = 'SELECT count(*) FROM group_transaction WHERE group_id = ?'
+
+
+@pytest.fixture(params=['on_conflict', 'fallback'])
+def insert_path(request, monkeypatch):
+    """Run the test with ON CONFLICT and with the lookup-then-insert path other backends get."""
+    if request.param == 'fallback':
+        monkeypatch.setattr(transactions, '_insert', lambda dialect: None)
+    return request.param
+
+
+def entry(key, amount=10.0):
+    return {'idempotency_key': key, 'amount': amount, 'description': f'Payment {key}'}
+
+
+def submit(client, ids, *entries):
+    return client.post(f"/api/v1/groups/{ids['group']}/transactions", json={'transactions': list(entries)})
+
+
+def test_admin_entries_are_approved(insert_path, login, files, ids):
+    response = submit(login('admin@example.com'), ids, entry('a', 30), entry('b', 20))
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert (body['created'], body['duplicates']) == (2, 0)
+    assert body['balance_delta'] == 50.0 and isinstance(body['balance_delta'], float)
+    assert body['balance'] == 50.0 and isinstance(body['balance'], float)
+    assert [t['status'] for t in body['transactions']] == ['approved', 'approved']
+    assert files.fetch('primary', BALANCE, ids['group']) == (50.0,)
+    assert files.fetch('primary', ROWS, ids['group']) == (3,)
+
+
+def test_replayed_batch_changes_nothing(insert_path, login, files, ids):
+    client = login('admin@example.com')
+    first = submit(client, ids, entry('a'), entry('b')).get_json()
+
+    response = submit(client, ids, entry('a'), entry('b'))
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['created'], body['duplicates'], body['balance_delta']) == (0, 2, 0.0)
+    assert body['balance'] == 20.0
+    assert [t['id'] for t in body['transactions']] == [t['id'] for t in first['transactions']]
+    assert not any(t['created'] for t in body['transactions'])
+    assert files.fetch('primary', BALANCE, ids['group']) == (20.0,)
+    assert files.fetch('primary', ROWS, ids['group']) == (3,)
+
+
+def test_duplicate_key_in_batch_is_reported_once(insert_path, login, files, ids):
+    response = submit(login('admin@example.com'), ids, entry('a'), entry('b'), entry('a', 99))
+
+    body = response.get_json()
+    assert (body['created'], body['duplicates'], body['balance_delta']) == (2, 1, 20.0)
+    assert [(t['idempotency_key'], t['created']) for t in body['transactions']] == [
+        ('a', True), ('b', True), ('a', False)]
+    assert body['transactions'][0]['id'] == body['transactions'][2]['id']
+    assert files.fetch('primary', ROWS, ids['group']) == (3,)
+
+
+def test_invalid_entry_saves_nothing(insert_path, login, files, ids):
+    response = submit(login('admin@example.com'), ids, entry('a'), entry('', 5), entry('c', -1))
+
+    assert response.status_code == 422
+    assert set(response.get_json()['entries']) == {'1', '2'}
+    assert files.fetch('primary', BALANCE, ids['group']) == (0.0,)
+    assert files.fetch('primary', ROWS, ids['group']) == (1,)
+
+
+def test_member_entries_stay_pending(insert_path, login, files, ids):
+    response = submit(login('member@example.com'), ids, entry('a', 15))
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['transactions'][0]['status'] == 'pending'
+    assert body['balance_delta'] == 0.0
+    assert body['balance'] == 0.0 and isinstance(body['balance'], float)
+    assert files.fetch('primary', BALANCE, ids['group']) == (0.0,)
+
+
+def test_fallback_reports_key_taken_since_lookup_as_duplicate(app, login, files, ids, monkeypatch):
+    client = login('admin@example.com')
+    first = submit(client, ids, entry('a')).get_json()
+    monkeypatch.setattr(transactions, '_insert', lambda dialect: None)
+    lookups = [lambda *args: {}, transactions._lookup]
+
+    def lookup(*args):
+        # The first lookup misses 'a', as if another request inserted it just after.
+        return lookups.pop(0)(*args) if len(lookups) > 1 else lookups[0](*args)
+
+    monkeypatch.setattr(transactions, '_lookup', lookup)
+    with app.app_context():
+        sub, _ = live.broker.subscribe(ids['group'], admin=True)
+
+    response = submit(client, ids, entry('b', 5), entry('a'))
+
+    body = response.get_json()
+    assert (body['created'], body['duplicates'], body['balance_delta']) == (1, 1, 5.0)
+    assert body['transactions'][1]['id'] == first['transactions'][0]['id']
+    assert files.fetch('primary', BALANCE, ids['group']) == (15.0,)
+    # The rolled back savepoint must not take the batch's change events with it.
+    delivered = [sub.queue.get_nowait()['type'] for _ in range(sub.queue.qsize())]
+    assert delivered == ['transaction', 'balance']
+    sub.close()
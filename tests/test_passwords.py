@@ -0,0 +1,68 @@
+"""Password hashing on the bounded pool (home.passwords)."""
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+from flask import Flask
+
+from home.passwords import PasswordHashingBusy, check_password, hash_password, hash_pool
+
+
+def make_app(workers, queue, wait=0.05):
+    app = Flask(__name__)
+    app.config.update(BCRYPT_LOG_ROUNDS=4, PASSWORD_HASH_POOL='thread', PASSWORD_HASH_WORKERS=workers,
+                      PASSWORD_HASH_QUEUE=queue, PASSWORD_HASH_WAIT_SECONDS=wait)
+    return app
+
+
+def test_hashes_on_the_pool():
+    with make_app(2, 4).app_context():
+        pw_hash = hash_password('secret')
+        assert check_password(pw_hash, 'secret')
+        assert not check_password(pw_hash, 'other')
+        assert not check_password('not-a-hash', 'secret')
+
+
+def test_each_app_has_its_own_pool():
+    small, large = make_app(1, 0), make_app(2, 6)
+    with small.app_context():
+        small_pool = hash_pool.get()
+    with large.app_context():
+        large_pool = hash_pool.get()
+
+    assert small_pool[0] is not large_pool[0]
+    assert small_pool[0]._max_workers == 1 and large_pool[0]._max_workers == 2
+    assert small_pool[1]._initial_value == 1 and large_pool[1]._initial_value == 8
+
+
+def test_full_pool_fails_fast():
+    app = make_app(1, 0)
+    with app.app_context():
+        _, slots = hash_pool.get()
+        assert slots.acquire(blocking=False)
+        try:
+            with pytest.raises(PasswordHashingBusy):
+                hash_password('secret')
+        finally:
+            slots.release()
+        assert check_password(hash_password('secret'), 'secret')
+
+
+def test_other_app_is_not_blocked_by_a_full_pool():
+    busy, idle = make_app(1, 0), make_app(1, 0)
+    with busy.app_context():
+        _, slots = hash_pool.get()
+        slots.acquire()
+    results = []
+
+    def login():
+        with idle.app_context():
+            results.append(check_password(hash_password('secret'), 'secret'))
+
+    thread = threading.Thread(target=login)
+    thread.start()
+    thread.join()
+    slots.release()
+    assert results == [True]
@@ -0,0 +1,113 @@
+"""Rate limits, their stores and load shedding (home.ratelimit)."""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from home.ratelimit import MemoryStore, SQLiteStore, parse_limits
+
+
+@pytest.fixture
+def app_config():
+    return {'RATE_LIMITS': 'api.group_analytics=2/60'}
+
+
+def analytics(client, ids, **kwargs):
+    return client.get(f"/api/v1/groups/{ids['group']}/analytics", **kwargs)
+
+
+def test_parse_limits():
+    assert parse_limits(' a.b=10/60, c.d=5 ,') == {'a.b': (10.0, 60.0), 'c.d': (5.0, 1.0)}
+    with pytest.raises(ValueError):
+        parse_limits('a.b=ten/60')
+
+
+def test_per_user_bucket(login, ids):
+    admin, member = login('admin@example.com'), login('member@example.com')
+    assert [analytics(admin, ids).status_code for _ in range(2)] == [200, 200]
+
+    response = analytics(admin, ids)
+
+    assert response.status_code == 429
+    # 2 per 60 seconds: the next token is due in 30.
+    assert response.headers['Retry-After'] == '30'
+    assert response.get_json()['retry_after'] == 30
+    assert analytics(member, ids).status_code == 200
+    assert admin.get('/api/v1/me').status_code == 200
+
+
+@pytest.mark.parametrize('app_config', [{'RATE_LIMITS': '', 'RATE_LIMITS_GLOBAL': 'api.group_analytics=2/60'}])
+def test_global_bucket(login, ids):
+    admin, member = login('admin@example.com'), login('member@example.com')
+    assert analytics(admin, ids).status_code == 200
+    assert analytics(member, ids).status_code == 200
+
+    assert analytics(admin, ids).status_code == 429
+    assert analytics(member, ids).status_code == 429
+
+
+def test_batch_draws_from_addressed_endpoint(login, ids):
+    client = login('admin@example.com')
+    path = f"/api/v1/groups/{ids['group']}/analytics"
+    requests = [{'id': i, 'path': path} for i in range(3)] + [{'id': 'me', 'path': '/api/v1/me'}]
+
+    response = client.post('/api/v1/batch', json={'requests': requests})
+
+    assert response.status_code == 200
+    statuses = {r['id']: r['status'] for r in response.get_json()['responses']}
+    assert statuses == {0: 200, 1: 200, 2: 429, 'me': 200}
+    assert response.get_json()['responses'][2]['body']['retry_after'] == 30
+    assert analytics(client, ids).status_code == 429
+
+
+@pytest.mark.parametrize('app_config', [{'RATE_LIMITS': 'api.group_analytics=2/60', 'RATE_LIMIT_STORE': 'sqlite'}])
+def test_sqlite_store_app(login, ids):
+    client = login('admin@example.com')
+    assert [analytics(client, ids).status_code for _ in range(3)] == [200, 200, 429]
+
+
+@pytest.mark.parametrize('shared', ['memory', 'sqlite'])
+def test_store_refills(shared, tmp_path):
+    if shared == 'memory':
+        first = second = MemoryStore()
+    else:
+        # Two stores on one file stand for two workers.
+        first, second = SQLiteStore(str(tmp_path / 'buckets.db')), SQLiteStore(str(tmp_path / 'buckets.db'))
+    now = time.time()
+
+    assert first.take('k', 2, 60, now) == 0
+    assert second.take('k', 2, 60, now) == 0
+    assert first.take('k', 2, 60, now) == pytest.approx(30.0)
+    assert second.take('other', 2, 60, now) == 0
+    # Half a token refilled after 15 seconds, a whole one after 30.
+    assert second.take('k', 2, 60, now + 15) == pytest.approx(15.0)
+    assert first.take('k', 2, 60, now + 30) == 0
+
+
+@pytest.mark.parametrize('app_config', [{'RATE_LIMITS': '', 'LOAD_SHED_QUEUE_MS': 1000}])
+def test_overloaded_serves_last_rate_without_etag(login, files, ids):
+    client = login('member@example.com')
+    first = analytics(client, ids)
+    assert first.get_json()['account']['rate_per_day'] is None
+    assert first.headers.get('ETag')
+    # Approved contributions arrive (and replicate); the rate now has data.
+    for day in range(1, 4):
+        for name in ('primary', 'replica'):
+            files.execute(name, "INSERT INTO group_transaction (group_id, user_id, amount, occurred_at, status, "
+                                "approved_at) VALUES (?, ?, 30, ?, 'approved', ?)",
+                          ids['group'], ids['member'], f'2026-01-0{day} 12:00:00', f'2026-01-0{day} 13:00:00')
+    queued = {'X-Request-Start': f't={int((time.time() - 5) * 1000)}'}
+
+    stale = analytics(client, ids, headers=queued)
+
+    assert stale.status_code == 200
+    assert stale.get_json()['account']['rate_per_day'] is None
+    assert 'ETag' not in stale.headers
+    assert stale.headers['Warning'] == '110 - "Response is Stale"'
+    assert 'no-store' in stale.headers['Cache-Control']
+
+    fresh = analytics(client, ids)
+    assert fresh.get_json()['account']['rate_per_day'] > 0
+    assert fresh.headers.get('ETag') and 'Warning' not in fresh.headers
@@ -0,0 +1,72 @@
+"""Read/write routing between the primary and the replica (home.database.RoutingSession)."""
+
+from __future__ import annotations
+
+import time
+
+SAVINGS = 'SELECT savings FROM user WHERE username = ?'
+
+
+def test_get_reads_from_replica(login, statements):
+    client = login('member@example.com')
+    statements.clear()
+
+    assert client.get('/dashboard').status_code == 200
+    assert statements['replica']
+    assert not statements['primary']
+
+
+def test_write_goes_to_primary(login, statements, files):
+    client = login('member@example.com')
+    statements.clear()
+
+    response = client.post('/adjust_savings', data={'amount': '10', 'operation': 'add'})
+
+    assert response.status_code == 302
+    assert statements['primary']
+    assert not statements['replica']
+    assert files.fetch('primary', SAVINGS, 'member') == (60.0,)
+    assert files.fetch('replica', SAVINGS, 'member') == (50.0,)
+
+
+def test_write_pins_session_to_primary(app, login, statements):
+    client = login('member@example.com')
+    other = login('admin@example.com')
+    client.post('/adjust_savings', data={'amount': '10', 'operation': 'add'})
+    with client.session_transaction() as sess:
+        assert sess['_primary_until'] > time.time()
+
+    statements.clear()
+    assert client.get('/dashboard').status_code == 200
+    assert statements['primary']
+    assert not statements['replica']
+
+    statements.clear()
+    other.get('/dashboard')
+    assert statements['replica']
+    assert not statements['primary']
+
+    with client.session_transaction() as sess:
+        sess['_primary_until'] = time.time() - 1
+    statements.clear()
+    client.get('/dashboard')
+    assert statements['replica']
+    assert not statements['primary']
+
+
+def test_reads_do_not_pin(login):
+    client = login('member@example.com')
+    client.get('/dashboard')
+    with client.session_transaction() as sess:
+        assert '_primary_until' not in sess
+
+
+def test_use_primary_view_reads_from_primary(login, statements, ids):
+    client = login('member@example.com')
+    statements.clear()
+
+    # Members are redirected from the preferences page, after the membership check.
+    assert client.get(f"/groups/{ids['group']}/preferences").status_code == 302
+    # login_required loads the user before the view is pinned; the view's own reads are not.
+    assert any('group_member' in statement for statement in statements['primary'])
+    assert not any('group_member' in statement for statement in statements['replica'])
@@ -0,0 +1,139 @@
+"""The analytics cache backends (home.sharedcache)."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+
+import pytest
+
+from home import sharedcache
+from home.sharedcache import MISSING, MemoryBackend, SQLiteBackend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sharedcache.time, 'time', clock)
+    return clock
+
+
+def stored(path):
+    conn = sqlite3.connect(path)
+    try:
+        keys = {row[0] for row in conn.execute('SELECT key FROM entry')}
+        total = conn.execute('SELECT total(size) FROM entry').fetchone()[0]
+        usage = conn.execute('SELECT bytes FROM usage WHERE id = 1').fetchone()[0]
+        return keys, int(total), usage
+    finally:
+        conn.close()
+
+
+def value(n):
+    # 100 bytes of JSON each.
+    return 'x' * 98 if n is None else f'{n:02d}' + 'x' * 96
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_round_trip(backend, tmp_path):
+    cache = MemoryBackend(16, 60) if backend == 'memory' else SQLiteBackend(str(tmp_path / 'c.db'), 10_000, 60)
+    assert cache.get(('rate', 1), MISSING) is MISSING
+    cache.set(('rate', 1), [1.5, {'eta': None}])
+    assert cache.get(('rate', 1), MISSING) == [1.5, {'eta': None}]
+    cache.clear()
+    assert cache.get(('rate', 1), MISSING) is MISSING
+
+
+def test_entries_expire(tmp_path, clock):
+    cache = SQLiteBackend(str(tmp_path / 'c.db'), 10_000, ttl=60)
+    cache.set('k', 1)
+    clock.now += 61
+    assert cache.get('k', MISSING) is MISSING
+
+
+def test_sizes_are_bytes(tmp_path):
+    path = str(tmp_path / 'c.db')
+    cache = SQLiteBackend(path, 10_000, 60)
+    cache.set('k', 'é' * 10)
+    assert stored(path)[1] == len(json.dumps('é' * 10).encode('utf-8'))
+
+
+def test_eviction_keeps_usage_and_drops_least_recently_used(tmp_path, clock):
+    path = str(tmp_path / 'c.db')
+    cache = SQLiteBackend(path, max_bytes=1000, ttl=3600)
+    for n in range(10):
+        cache.set(n, value(n))
+        clock.now += 1
+    assert stored(path)[1:] == (1000, 1000)
+    # Reading an entry after TOUCH_SECONDS makes it the most recently used.
+    clock.now += SQLiteBackend.TOUCH_SECONDS + 1
+    assert cache.get(0) == value(0)
+    clock.now += 1
+
+    cache.set(10, value(10))
+
+    keys, total, usage = stored(path)
+    assert usage == total
+    assert total <= 900
+    assert {sharedcache._digest(n) for n in (0, 10)} <= keys
+    assert sharedcache._digest(1) not in keys and sharedcache._digest(2) not in keys
+    assert cache.get(9) == value(9)
+
+
+def test_replacing_an_entry_keeps_usage(tmp_path):
+    path = str(tmp_path / 'c.db')
+    cache = SQLiteBackend(path, max_bytes=10_000, ttl=3600)
+    cache.set('k', 'short')
+    cache.set('k', 'a much longer value')
+    cache.set('other', 1)
+    keys, total, usage = stored(path)
+    assert len(keys) == 2 and usage == total
+
+
+def test_expired_entries_are_evicted_first(tmp_path, clock):
+    path = str(tmp_path / 'c.db')
+    cache = SQLiteBackend(path, max_bytes=1000, ttl=60)
+    cache.set('old', value(None))
+    clock.now += 30
+    for n in range(8):
+        cache.set(n, value(n))
+    clock.now += 31
+    cache.get(0)
+    cache.set(8, value(8))
+    cache.set(9, value(9))
+
+    keys, total, usage = stored(path)
+    assert sharedcache._digest('old') not in keys
+    assert usage == total
+
+
+def test_backend_error_reads_as_a_miss(tmp_path):
+    # A directory where the database file should be: every operation fails.
+    cache = SQLiteBackend(str(tmp_path), 10_000, 60)
+    cache.set('k', 1)
+    assert cache.get('k', MISSING) is MISSING
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {'ANALYTICS_CACHE': 'sqlite', 'ANALYTICS_CACHE_DB': str(tmp_path)}
+
+
+def test_analytics_recomputed_when_backend_fails(app, login, ids, caplog):
+    client = login('member@example.com')
+    with app.app_context():
+        assert isinstance(sharedcache.analytics_cache.backend, SQLiteBackend)
+
+    responses = [client.get(f"/api/v1/groups/{ids['group']}/analytics") for _ in range(2)]
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[0].get_json() == responses[1].get_json()
+    assert 'Analytics cache read' in caplog.text and 'Analytics cache write' in caplog.text
@@ -0,0 +1,131 @@
+"""Single-flight computations within a process and across processes (home.singleflight)."""
+
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from home.singleflight import SingleFlight, fcntl
+
+needs_fcntl = pytest.mark.skipif(fcntl is None, reason='no fcntl locks on this platform')
+
+
+def run_concurrently(flight, key, fn, callers=8):
+    """Call flight.do(key, fn) from ``callers`` threads; fn is released once all but the leader wait."""
+    release = threading.Event()
+    outcomes = []
+
+    def gated():
+        release.wait(5)
+        return fn()
+
+    def call():
+        try:
+            outcomes.append(('value', flight.do(key, gated)))
+        except Exception as e:
+            outcomes.append(('error', e))
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.shared < callers - 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_concurrent_callers_compute_once():
+    flight = SingleFlight()
+    calls = []
+
+    outcomes = run_concurrently(flight, ('rate', 1), lambda: calls.append(1) or 4.2)
+
+    assert calls == [1]
+    assert outcomes == [('value', 4.2)] * 8
+    assert (flight.computed, flight.shared) == (1, 7)
+
+
+def test_waiters_get_the_leaders_exception():
+    flight = SingleFlight()
+    error = ValueError('no data')
+
+    def fail():
+        raise error
+
+    outcomes = run_concurrently(flight, ('rate', 1), fail)
+
+    assert outcomes == [('error', error)] * 8
+
+
+def test_nothing_is_kept_after_the_call():
+    flight = SingleFlight()
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.do('key', lambda: 2) == 2
+
+
+def _lead(lock_dir, started):
+    def slow():
+        started.set()
+        time.sleep(0.5)
+        return {'rate': 1.5}
+    SingleFlight().do(('rate', 7), slow, lock_dir=lock_dir)
+
+
+@needs_fcntl
+def test_waiting_process_reads_the_leaders_result(tmp_path):
+    context = multiprocessing.get_context('fork')
+    started = context.Event()
+    leader = context.Process(target=_lead, args=(str(tmp_path), started))
+    leader.start()
+    assert started.wait(10)
+    flight = SingleFlight()
+
+    value = flight.do(('rate', 7), lambda: pytest.fail('computed again'), lock_dir=str(tmp_path))
+
+    leader.join(10)
+    assert value == {'rate': 1.5}
+    assert (flight.computed, flight.shared) == (0, 1)
+
+
+@needs_fcntl
+def test_prune_leaves_held_locks_alone(tmp_path):
+    old = time.time() - 3600
+
+    def make(name):
+        path = tmp_path / name
+        path.write_text('{}')
+        os.utime(path, (old, old))
+        return path
+
+    held, idle, stale_result = make('held.lock'), make('idle.lock'), make('stale.json')
+    fresh = tmp_path / 'fresh.lock'
+    fresh.write_text('')
+    flight = SingleFlight()
+    with open(held, 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        flight._prune(str(tmp_path))
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+    assert held.exists() and fresh.exists()
+    assert not idle.exists() and not stale_result.exists()
+
+
+@needs_fcntl
+def test_locked_result_is_handed_off_only_while_fresh(tmp_path):
+    flight = SingleFlight()
+    key = ('rate', 3)
+    assert flight.do(key, lambda: 1.0, lock_dir=str(tmp_path)) == 1.0
+    assert flight.do(key, lambda: 2.0, lock_dir=str(tmp_path)) == 1.0
+
+    name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    old = time.time() - 3600
+    os.utime(tmp_path / f'{name}.json', (old, old))
+    assert flight.do(key, lambda: 3.0, lock_dir=str(tmp_path)) == 3.0